@@ -6,6 +6,7 @@ Uses Brevo's REST API instead of SMTP to bypass port blocking on Render.com
 import os
 import logging
 from typing import List, Optional
+from django.conf import settings
 from django.core.mail.backends.base import BaseEmailBackend
 from django.core.mail.message import EmailMessage, EmailMultiAlternatives
 import httpx
@@ -32,10 +33,33 @@ class BrevoEmailBackend(BaseEmailBackend):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.api_key = os.getenv('BREVO_API_KEY')
+        self.api_key = getattr(settings, 'BREVO_API_KEY', None) or os.getenv('BREVO_API_KEY')
         if not self.api_key:
             logger.warning("BREVO_API_KEY not found in environment variables")
-        self.api_url = "https://api.brevo.com/v3/smtp/email"
+        self.api_url = getattr(settings, 'BREVO_API_URL', "https://api.brevo.com/v3/smtp/email")
+        self.client: Optional[httpx.Client] = None
+    
+    def open(self) -> bool:
+        """
+        Open a pooled HTTP client (kept alive between messages).
+        Returns True if a new client was created, like Django's SMTP backend.
+        """
+        if self.client is not None:
+            return False
+        self.client = httpx.Client(
+            timeout=getattr(settings, 'EMAIL_TIMEOUT', None) or 10.0,
+            headers={
+                "accept": "application/json",
+                "content-type": "application/json",
+                "api-key": self.api_key or "",
+            },
+        )
+        return True
+    
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
     
     def send_messages(self, email_messages: List[EmailMessage]) -> int:
         """
@@ -45,19 +69,22 @@ class BrevoEmailBackend(BaseEmailBackend):
             logger.error("Cannot send email: BREVO_API_KEY not configured")
             return 0
         
-        # Log how many messages are being sent
-        logger.info(f"Brevo backend received {len(email_messages)} email message(s) to send")
+        logger.debug(f"Brevo backend received {len(email_messages)} email message(s) to send")
         
+        new_client = self.open()
         num_sent = 0
-        for idx, message in enumerate(email_messages, 1):
-            try:
-                logger.info(f"Processing email {idx}/{len(email_messages)}: To={message.to}, Subject='{message.subject}'")
-                if self._send_message(message):
-                    num_sent += 1
-            except Exception as e:
-                logger.exception(f"Error sending email via Brevo: {e}")
-                if not self.fail_silently:
-                    raise
+        try:
+            for message in email_messages:
+                try:
+                    if self._send_message(message):
+                        num_sent += 1
+                except Exception as e:
+                    logger.exception(f"Error sending email via Brevo: {e}")
+                    if not self.fail_silently:
+                        raise
+        finally:
+            if new_client:
+                self.close()
         
         logger.info(f"Brevo backend sent {num_sent}/{len(email_messages)} emails successfully")
         return num_sent
@@ -94,6 +121,11 @@ class BrevoEmailBackend(BaseEmailBackend):
         if hasattr(message, 'reply_to') and message.reply_to:
             email_data["replyTo"] = {"email": message.reply_to[0]}
         
+        # Brevo drops a second send carrying the same idempotency key
+        idempotency_key = message.extra_headers.get('Idempotency-Key')
+        if idempotency_key:
+            email_data["headers"] = {"idempotencyKey": idempotency_key}
+        
         # Handle HTML and text content
         if isinstance(message, EmailMultiAlternatives):
             # Check for HTML alternative
@@ -131,31 +163,20 @@ class BrevoEmailBackend(BaseEmailBackend):
                         "content": content_b64
                     })
         
-        # Send the request to Brevo API
-        headers = {
-            "accept": "application/json",
-            "content-type": "application/json",
-            "api-key": self.api_key
-        }
-        
+        # Send the request to Brevo API over the pooled client
         try:
-            with httpx.Client(timeout=10.0) as client:
-                response = client.post(
-                    self.api_url,
-                    json=email_data,
-                    headers=headers
+            response = self.client.post(self.api_url, json=email_data)
+            
+            if response.status_code in [200, 201]:
+                logger.debug(f"Email sent successfully via Brevo to {message.to}")
+                return True
+            else:
+                logger.error(
+                    f"Brevo API error (status {response.status_code}): {response.text}"
                 )
-                
-                if response.status_code in [200, 201]:
-                    logger.info(f"Email sent successfully via Brevo to {message.to}")
-                    return True
-                else:
-                    logger.error(
-                        f"Brevo API error (status {response.status_code}): {response.text}"
-                    )
-                    if not self.fail_silently:
-                        raise Exception(f"Brevo API returned status {response.status_code}: {response.text}")
-                    return False
+                if not self.fail_silently:
+                    raise Exception(f"Brevo API returned status {response.status_code}: {response.text}")
+                return False
                     
         except httpx.TimeoutException:
             logger.error("Brevo API request timed out")
@@ -0,0 +1,49 @@
+"""
+Minimal client for the Resend REST API (https://resend.com/docs/api-reference)
+
+Replaces the `resend` SDK, which imports the PyPI `requests` package; inside
+this project `requests` is our own Django app, and the SDK only worked after
+rewriting sys.modules and sys.path at import time. This client uses httpx
+(already a dependency for the Brevo backend) and keeps one pooled connection.
+"""
+import httpx
+
+
+class ResendError(Exception):
+    def __init__(self, status_code, message):
+        super().__init__(f"Resend API returned status {status_code}: {message}")
+        self.status_code = status_code
+
+
+class ResendClient:
+    def __init__(self, api_key, base_url='https://api.resend.com', timeout=10.0):
+        self.http = httpx.Client(
+            base_url=base_url.rstrip('/'),
+            timeout=timeout,
+            headers={'Authorization': f'Bearer {api_key}', 'User-Agent': 'healthbridge'},
+        )
+
+    def _post(self, path, payload, headers):
+        response = self.http.post(path, json=payload, headers=headers)
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise ResendError(response.status_code, message)
+        return response.json()
+
+    def send(self, params, idempotency_key=None):
+        """POST /emails; returns {'id': ...}"""
+        headers = {'Idempotency-Key': idempotency_key} if idempotency_key else {}
+        return self._post('/emails', params, headers)
+
+    def send_batch(self, params_list, idempotency_key=None, validation='permissive'):
+        """POST /emails/batch (up to 100 emails); returns {'data': [...], 'errors': [...]}"""
+        headers = {'x-batch-validation': validation}
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+        return self._post('/emails/batch', params_list, headers)
+
+    def close(self):
+        self.http.close()
@@ -2,45 +2,19 @@
 Custom email backend for Resend API
 Uses HTTP API instead of SMTP to bypass port blocking on Render
 """
-import os
+import hashlib
 import logging
-import sys
+from concurrent.futures import ThreadPoolExecutor
 from django.core.mail.backends.base import BaseEmailBackend
 from django.conf import settings
 
-# CRITICAL FIX: Your Django app is named 'requests' which shadows the Python requests package
-# We need to ensure the real requests package is imported by resend, not your Django app
+from HealthBridge.resend_api import ResendClient
 
-# Get the project root
-project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-# Clean up any cached imports of the Django 'requests' app
-modules_to_remove = []
-for module_name in sys.modules:
-    if module_name == 'requests' or module_name.startswith('requests.'):
-        module = sys.modules[module_name]
-        # Check if it's the Django app by looking at its file path
-        if hasattr(module, '__file__') and module.__file__:
-            if project_root in module.__file__:
-                modules_to_remove.append(module_name)
-
-for module_name in modules_to_remove:
-    del sys.modules[module_name]
-
-# Temporarily manipulate sys.path to ensure site-packages is prioritized
-original_sys_path = sys.path.copy()
-# Move all paths containing the project root to the end
-project_paths = [p for p in sys.path if project_root in os.path.abspath(p)]
-other_paths = [p for p in sys.path if project_root not in os.path.abspath(p)]
-sys.path = other_paths + project_paths
-
-# Import resend (which needs the real requests package)
-import resend
+logger = logging.getLogger(__name__)
 
-# Restore original sys.path
-sys.path = original_sys_path
 
-logger = logging.getLogger(__name__)
+class ResendRejected(Exception):
+    """Resend refused this one message (validation error); the rest of its batch went out"""
 
 
 class ResendEmailBackend(BaseEmailBackend):
@@ -57,13 +31,32 @@ class ResendEmailBackend(BaseEmailBackend):
             if not fail_silently:
                 raise ValueError("RESEND_API_KEY not found in settings")
             logger.warning("RESEND_API_KEY not configured")
-        else:
-            resend.api_key = self.api_key
+        self.client = None
+    
+    def open(self):
+        """Open a pooled API client; returns True if a new one was created"""
+        if self.client is not None:
+            return False
+        self.client = ResendClient(
+            self.api_key,
+            base_url=getattr(settings, 'RESEND_API_URL', 'https://api.resend.com'),
+            timeout=getattr(settings, 'EMAIL_TIMEOUT', None) or 10.0,
+        )
+        return True
+    
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
     
     def send_messages(self, email_messages):
         """
         Send one or more EmailMessage objects and return the number of email
         messages sent.
+        
+        Messages go out in Resend batch calls of up to RESEND_BATCH_SIZE (100),
+        with chunks sent concurrently on a bounded thread pool. A single message
+        uses the plain send endpoint so its own idempotency key is honoured.
         """
         if not email_messages:
             return 0
@@ -72,52 +65,122 @@ class ResendEmailBackend(BaseEmailBackend):
             logger.error("Cannot send emails: RESEND_API_KEY not configured")
             return 0
         
-        num_sent = 0
-        for message in email_messages:
-            try:
-                sent = self._send(message)
-                if sent:
-                    num_sent += 1
-            except Exception as e:
-                logger.error(f"Failed to send email via Resend: {str(e)}")
-                if not self.fail_silently:
-                    raise
+        results = self.send_each([m for m in email_messages if m.recipients()])
+        errors = [e for e in results if e is not None and not isinstance(e, ResendRejected)]
+        if errors and not self.fail_silently:
+            raise errors[0]
+        return results.count(None)
+    
+    def send_each(self, email_messages):
+        """
+        Send the messages and return one result per message, in order: None if
+        Resend accepted it, otherwise the exception (ResendRejected when Resend
+        refused that message alone). Lets the outbox worker mark each row.
+        """
+        if not self.api_key:
+            return [ValueError("RESEND_API_KEY not configured")] * len(email_messages)
+        
+        results = [None] * len(email_messages)
+        indexes = []
+        for index, message in enumerate(email_messages):
+            if message.recipients():
+                indexes.append(index)
+            else:
+                results[index] = ResendRejected("Message has no recipients")
+        messages = [email_messages[i] for i in indexes]
+        
+        new_client = self.open()
+        try:
+            if len(messages) == 1:
+                sent = self._send_each_single(messages[0])
+            else:
+                sent = self._send_chunked(messages)
+        finally:
+            if new_client:
+                self.close()
+        for index, result in zip(indexes, sent):
+            results[index] = result
+        return results
+    
+    def _send_each_single(self, message):
+        try:
+            if self._send(message, raise_errors=True):
+                return [None]
+            return [RuntimeError("Resend API returned an unexpected response")]
+        except Exception as e:
+            return [e]
+    
+    def _send_chunked(self, messages):
+        if not messages:
+            return []
+        batch_size = getattr(settings, 'RESEND_BATCH_SIZE', 100)
+        chunks = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+        workers = min(len(chunks), getattr(settings, 'RESEND_BATCH_CONCURRENCY', 4))
+        
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for chunk_results in pool.map(self._send_batch, chunks):
+                results.extend(chunk_results)
+        
+        logger.info(f"Resend batch sent {results.count(None)}/{len(messages)} emails in {len(chunks)} call(s)")
+        return results
+    
+    def _send_batch(self, chunk):
+        """
+        Send one chunk through /emails/batch and return a result per message.
+        A failed call fails the whole chunk; per-message validation errors
+        are reported by index (permissive mode) and only those are ResendRejected.
+        """
+        keys = [m.extra_headers.get('Idempotency-Key') for m in chunk]
+        batch_key = "batch-" + hashlib.sha256("\n".join(keys).encode()).hexdigest() if all(keys) else None
+        try:
+            response = self.client.send_batch([self._build_params(m) for m in chunk], idempotency_key=batch_key)
+        except Exception as e:
+            logger.error(f"Resend batch of {len(chunk)} emails failed: {str(e)}")
+            return [e] * len(chunk)
+        
+        failed = {error["index"]: error["message"] for error in (response or {}).get("errors") or []}
+        for index, reason in failed.items():
+            logger.error(f"Resend rejected email to {chunk[index].to}: {reason}")
+        return [ResendRejected(failed[i]) if i in failed else None for i in range(len(chunk))]
+    
+    def _build_params(self, message):
+        """Map a Django EmailMessage onto Resend's send parameters"""
+        params = {
+            "from": message.from_email or settings.DEFAULT_FROM_EMAIL,
+            "to": message.to,
+            "subject": message.subject,
+        }
+        
+        # Add CC and BCC if present
+        if message.cc:
+            params["cc"] = message.cc
+        if message.bcc:
+            params["bcc"] = message.bcc
+        
+        # Handle HTML and plain text content
+        if message.content_subtype == 'html':
+            params["html"] = message.body
+        else:
+            params["text"] = message.body
         
-        return num_sent
+        # If both HTML and text alternatives exist
+        if hasattr(message, 'alternatives') and message.alternatives:
+            for alternative_content, mimetype in message.alternatives:
+                if mimetype == 'text/html':
+                    params["html"] = alternative_content
+        return params
     
-    def _send(self, message):
+    def _send(self, message, raise_errors=False):
         """Send a single email message via Resend API"""
         if not message.recipients():
             return False
         
         try:
-            # Prepare email data for Resend API
-            params = {
-                "from": message.from_email or settings.DEFAULT_FROM_EMAIL,
-                "to": message.to,
-                "subject": message.subject,
-            }
-            
-            # Add CC and BCC if present
-            if message.cc:
-                params["cc"] = message.cc
-            if message.bcc:
-                params["bcc"] = message.bcc
-            
-            # Handle HTML and plain text content
-            if message.content_subtype == 'html':
-                params["html"] = message.body
-            else:
-                params["text"] = message.body
-            
-            # If both HTML and text alternatives exist
-            if hasattr(message, 'alternatives') and message.alternatives:
-                for alternative_content, mimetype in message.alternatives:
-                    if mimetype == 'text/html':
-                        params["html"] = alternative_content
+            params = self._build_params(message)
             
-            # Send via Resend API
-            response = resend.Emails.send(params)
+            # Send via Resend API; a repeated idempotency key is not delivered twice
+            response = self.client.send(params, idempotency_key=message.extra_headers.get('Idempotency-Key'))
             
             if response and response.get('id'):
                 logger.info(f"Email sent successfully via Resend: {response.get('id')}")
@@ -128,6 +191,6 @@ class ResendEmailBackend(BaseEmailBackend):
                 
         except Exception as e:
             logger.error(f"Error sending email via Resend: {str(e)}")
-            if not self.fail_silently:
+            if raise_errors or not self.fail_silently:
                 raise
             return False
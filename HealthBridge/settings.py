@@ -87,6 +87,7 @@ import importlib
 # packages installed (e.g., system Python).
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',  # Re-enabled - will only enforce HTTPS when DEBUG=False
+    'healthbridge_app.instrumentation.QueryInstrumentationMiddleware',  # Per-view query count / latency metrics
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -150,7 +151,8 @@ DATABASES = {
 
 
 # Session Configuration - Enhanced Security & Performance
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Database-backed sessions (scalable for production)
+# cached_db only with a shared cache (REDIS_URL): with per-process LocMemCache a logout in one worker leaves the others serving the session
+SESSION_ENGINE = os.getenv('SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db' if os.getenv('REDIS_URL') else 'django.contrib.sessions.backends.db')
 SESSION_COOKIE_AGE = 1209600  # 2 weeks (1,209,600 seconds)
 SESSION_COOKIE_HTTPONLY = True  # Prevent JavaScript access (XSS protection)
 SESSION_COOKIE_SECURE = not DEBUG  # HTTPS only in production (man-in-the-middle protection)
@@ -196,16 +198,28 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]  # Look for static files in project root
 STATIC_ROOT = BASE_DIR / "staticfiles"
 # Cache configuration for faster autocomplete
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'healthbridge-cache',
-        'TIMEOUT': 300,  # 5 minutes default timeout
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000
+# REDIS_URL (e.g. redis://localhost:6379/0, needs the redis package) gives all workers one cache,
+# which single-flight leases (healthbridge_app.singleflight) need to collapse misses across processes
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,  # 5 minutes default timeout
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'healthbridge-cache',
+            'TIMEOUT': 300,  # 5 minutes default timeout
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000
+            }
         }
     }
-}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -256,6 +270,9 @@ elif os.getenv('RESEND_API_KEY'):
     EMAIL_BACKEND = 'HealthBridge.resend_backend.ResendEmailBackend'
     RESEND_API_KEY = os.getenv('RESEND_API_KEY')
     DEFAULT_FROM_EMAIL = os.getenv('RESEND_FROM_EMAIL', 'onboarding@resend.dev')
+    RESEND_API_URL = os.getenv('RESEND_API_URL', 'https://api.resend.com')
+    RESEND_BATCH_SIZE = 100  # Resend's per-call limit for /emails/batch
+    RESEND_BATCH_CONCURRENCY = int(os.getenv('RESEND_BATCH_CONCURRENCY', 4))  # Batch calls in flight
     if os.environ.get('RUN_MAIN') == 'true':
         print("✓ Using Resend email backend (HTTP API)")
 # Gmail configuration (works locally with app passwords)
@@ -288,6 +305,77 @@ SERVER_EMAIL = DEFAULT_FROM_EMAIL
 EMAIL_TIMEOUT = 10  # Reduced from 30 to prevent worker timeout
 EMAIL_SSL_CERTFILE = None
 EMAIL_SSL_KEYFILE = None
+BREVO_API_URL = os.getenv('BREVO_API_URL', 'https://api.brevo.com/v3/smtp/email')
+
+# Durable email outbox (notifications.outbox). When enabled, EMAIL_BACKEND only
+# queues rows and the send_outbox worker (Procfile: worker) delivers them through
+# EMAIL_DELIVERY_BACKEND; enable it only where that worker runs. When disabled,
+# mail is sent directly and rows queued with enqueue_email() are sent on commit.
+EMAIL_DELIVERY_BACKEND = EMAIL_BACKEND
+EMAIL_OUTBOX_ENABLED = os.getenv('EMAIL_OUTBOX_ENABLED', 'False') == 'True'
+if EMAIL_OUTBOX_ENABLED:
+    EMAIL_BACKEND = 'notifications.outbox.OutboxEmailBackend'
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))  # Rows claimed per worker iteration
+EMAIL_OUTBOX_RATE_LIMIT = float(os.getenv('EMAIL_OUTBOX_RATE_LIMIT', 10))  # Messages per second, 0 = unlimited
+EMAIL_OUTBOX_CONCURRENCY = int(os.getenv('EMAIL_OUTBOX_CONCURRENCY', 4))  # Parallel HTTP sends per worker
+EMAIL_OUTBOX_MAX_ATTEMPTS = 6
+EMAIL_OUTBOX_LEASE_SECONDS = 300  # A claimed row is re-sent if its worker has not finished by then
+EMAIL_OUTBOX_BACKOFF_BASE = 30  # Seconds before the first retry, doubled per attempt
+EMAIL_OUTBOX_BACKOFF_MAX = 3600
+
+# Days before expiry on which a donor gets an expiry alert (kept in Donation.next_alert_on)
+EXPIRY_ALERT_THRESHOLDS = [int(d) for d in os.getenv('EXPIRY_ALERT_THRESHOLDS', '10,7,3,1,0').split(',')]
+EXPIRY_ALERT_HOUR = int(os.getenv('EXPIRY_ALERT_HOUR', 8))  # Hour (TIME_ZONE) run_scheduler sends the day's alerts
+
+# Job scheduler (manage.py run_scheduler, jobs in healthbridge_app/tasks.py)
+CLEANUP_EXPIRED_SCHEDULE = os.getenv('CLEANUP_EXPIRED_SCHEDULE', '0 0 * * 0')  # Cron spec, Sundays at midnight
+CLEAR_SESSIONS_SCHEDULE = os.getenv('CLEAR_SESSIONS_SCHEDULE', '30 3 * * *')  # Cron spec, daily
+SCHEDULER_LEASE_SECONDS = 300  # A standby scheduler takes over this long after the active one dies
+SCHEDULER_POLL_SECONDS = int(os.getenv('SCHEDULER_POLL_SECONDS', 60))  # Re-check interval without PostgreSQL LISTEN
+SCHEDULER_RETRY_SECONDS = 300  # Delay before a failed job runs again
+
+# Reservations: how long a request may hold its allocation of a donation (per urgency in the admin, ReservationPolicy)
+RESERVATION_TTL_HOURS = int(os.getenv('RESERVATION_TTL_HOURS', 72))  # Urgencies without a ReservationPolicy row
+RESERVATION_CLAIM_GRACE_DAYS = int(os.getenv('RESERVATION_CLAIM_GRACE_DAYS', 2))  # Approved requests hold until claim date + this
+RELEASE_RESERVATIONS_SCHEDULE = os.getenv('RELEASE_RESERVATIONS_SCHEDULE', '*/15 * * * *')  # Cron spec for the sweeper
+
+# Medicine subscriptions: recipients are notified when a matching donation is approved (notifications.subscriptions)
+MEDICINE_SUBSCRIPTION_LIMIT = int(os.getenv('MEDICINE_SUBSCRIPTION_LIMIT', 20))  # Saved searches per user
+
+# Medicine search (donations.search): result ids and facet counts of a search are cached briefly
+SEARCH_RESULT_CACHE_SECONDS = int(os.getenv('SEARCH_RESULT_CACHE_SECONDS', 30))  # How long a repeated search reuses them
+SEARCH_RESULT_CACHE_MAX_IDS = int(os.getenv('SEARCH_RESULT_CACHE_MAX_IDS', 2000))  # Ids cached per search; later pages query the database
+
+# "Did you mean" spelling index (healthbridge_app.spelling), one per process
+SPELLING_MAX_WORDS = int(os.getenv('SPELLING_MAX_WORDS', 50000))  # About 2 KB each; words past this are ignored until a rebuild
+SPELLING_INDEX_MAX_AGE = int(os.getenv('SPELLING_INDEX_MAX_AGE', 3600))  # Seconds before the index is rebuilt from the database
+
+# Single-flight caching (healthbridge_app.singleflight): one computation per cache miss across threads and workers
+SINGLEFLIGHT_LEASE_SECONDS = int(os.getenv('SINGLEFLIGHT_LEASE_SECONDS', 10))  # Longest other callers wait for a computation
+DASHBOARD_STATS_SECONDS = int(os.getenv('DASHBOARD_STATS_SECONDS', 60))  # Admin totals and the recipient dashboard's available medicines
+
+# Signed-in users are cached per user (healthbridge_app.usercache) and, with REDIS_URL, sessions use cached_db,
+# so requests skip both queries. Off by default without REDIS_URL: other workers would keep a changed user.
+AUTH_USER_CACHE_SECONDS = int(os.getenv('AUTH_USER_CACHE_SECONDS', 300 if REDIS_URL else 0))  # Longest a queryset.update() to a user goes unseen; 0 turns it off
+
+# Rate limiting (healthbridge_app.ratelimit): token buckets in the cache, rates are "burst/seconds"
+RATELIMIT_ENABLED = os.getenv('RATELIMIT_ENABLED', 'True') == 'True'
+RATELIMIT_PROXY_COUNT = int(os.getenv('RATELIMIT_PROXY_COUNT', 1 if RENDER_EXTERNAL_HOSTNAME else 0))  # Proxies in front of the app (Render's is one): client IPs come from X-Forwarded-For
+RATELIMIT_AUTOCOMPLETE = os.getenv('RATELIMIT_AUTOCOMPLETE', '30/10')  # Per IP: a burst of 30 keystrokes, then 3 a second
+RATELIMIT_SEARCH = os.getenv('RATELIMIT_SEARCH', '30/60')  # Per user, or per IP when signed out
+RATELIMIT_LOGIN = os.getenv('RATELIMIT_LOGIN', '20/300')  # Login attempts per IP
+RATELIMIT_LOGIN_EMAIL = os.getenv('RATELIMIT_LOGIN_EMAIL', '5/300')  # Login attempts per account from one IP
+
+# Per-request query and latency instrumentation (healthbridge_app.instrumentation)
+QUERY_INSTRUMENTATION_ENABLED = os.getenv('QUERY_INSTRUMENTATION_ENABLED', str(DEBUG)) == 'True'
+QUERY_INSTRUMENTATION_SERVER_TIMING = os.getenv('QUERY_INSTRUMENTATION_SERVER_TIMING', str(DEBUG)) == 'True'  # Server-Timing header for everyone; otherwise staff only
+QUERY_INSTRUMENTATION_BUFFER_SIZE = int(os.getenv('QUERY_INSTRUMENTATION_BUFFER_SIZE', 500))  # Recent requests kept in memory
+QUERY_INSTRUMENTATION_SLOW_QUERIES = 3  # Slowest statements recorded per request
+QUERY_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD = 5  # Same SQL shape this many times in one request is flagged
+
+# Structured event log (healthbridge_app.events) - JSON lines written off the request thread
+EVENT_LOG_LEVEL = os.getenv('EVENT_LOG_LEVEL', 'INFO')
+EVENT_LOG_DEBUG_SAMPLE_RATE = float(os.getenv('EVENT_LOG_DEBUG_SAMPLE_RATE', 0.01))  # Fraction of DEBUG events kept
 
 # Logging configuration
 LOGGING = {
@@ -304,6 +392,10 @@ LOGGING = {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
         },
+        'events': {
+            'class': 'healthbridge_app.events.AsyncQueueHandler',
+            'stream': 'ext://sys.stdout',
+        },
     },
     'root': {
         'handlers': ['console'],
@@ -330,5 +422,10 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'healthbridge_app.events': {
+            'handlers': ['events'],
+            'level': EVENT_LOG_LEVEL,
+            'propagate': False,
+        },
     },
 }
\ No newline at end of file
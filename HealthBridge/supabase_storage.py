@@ -1,12 +1,15 @@
 """
 Custom Django storage backend for Supabase Storage
 """
+import logging
 import os
 from io import BytesIO
 from django.core.files.storage import Storage
 from django.conf import settings
-from supabase import create_client, Client
-from urllib.parse import urljoin
+from django.utils.functional import cached_property
+from urllib.parse import quote, urljoin
+
+from healthbridge_app.events import log_event
 
 
 class SupabaseStorage(Storage):
@@ -19,8 +22,20 @@ class SupabaseStorage(Storage):
         self.supabase_url = settings.SUPABASE_URL
         self.supabase_key = settings.SUPABASE_KEY
         self.bucket_name = settings.SUPABASE_BUCKET_NAME
-        self.client: Client = create_client(self.supabase_url, self.supabase_key)
+        self.public_url_prefix = f"{self.supabase_url.rstrip('/')}/storage/v1/object/public/{self.bucket_name}/"
+        
+    @cached_property
+    def client(self):
+        """
+        Supabase client, created on first use.
         
+        The SDK (auth, realtime, postgrest, storage3) takes a few hundred ms to
+        import; rendering image URLs never needs it, so web workers only pay
+        that cost when they actually upload, download or delete a file.
+        """
+        from supabase import create_client
+        return create_client(self.supabase_url, self.supabase_key)
+    
     def _open(self, name, mode='rb'):
         """
         Open a file from Supabase Storage.
@@ -40,36 +55,33 @@ class SupabaseStorage(Storage):
         """
         # Normalize path to use forward slashes for Supabase (Windows compatibility)
         name = name.replace('\\', '/')
-        print(f"🔵 SupabaseStorage._save() called for: {name}")
+        content_type = content.content_type if hasattr(content, 'content_type') else "application/octet-stream"
         try:
             # Read file content
             file_content = content.read()
-            print(f"🔵 File size: {len(file_content)} bytes")
             
             # Upload to Supabase Storage
-            print(f"🔵 Uploading to bucket: {self.bucket_name}")
             self.client.storage.from_(self.bucket_name).upload(
                 path=name,
                 file=file_content,
-                file_options={"content-type": content.content_type if hasattr(content, 'content_type') else "application/octet-stream"}
+                file_options={"content-type": content_type}
             )
             
-            print(f"✅ Successfully uploaded to Supabase: {name}")
+            log_event('storage.uploaded', name=name, bucket=self.bucket_name, size=len(file_content))
             return name
         except Exception as e:
-            print(f"❌ Error uploading to Supabase: {str(e)}")
+            log_event('storage.upload_failed', level=logging.WARNING, name=name, bucket=self.bucket_name, error=str(e))
             # If file exists, try to update it
             try:
-                print(f"🔄 Attempting to update existing file...")
                 self.client.storage.from_(self.bucket_name).update(
                     path=name,
                     file=file_content,
-                    file_options={"content-type": content.content_type if hasattr(content, 'content_type') else "application/octet-stream"}
+                    file_options={"content-type": content_type}
                 )
-                print(f"✅ Successfully updated file in Supabase: {name}")
+                log_event('storage.updated', name=name, bucket=self.bucket_name, size=len(file_content))
                 return name
             except Exception as update_error:
-                print(f"❌ Update also failed: {str(update_error)}")
+                log_event('storage.update_failed', level=logging.ERROR, name=name, bucket=self.bucket_name, error=str(update_error))
                 raise IOError(f"Error saving file {name}: {str(e)} | Update attempt: {str(update_error)}")
     
     def delete(self, name):
@@ -101,16 +113,13 @@ class SupabaseStorage(Storage):
     def url(self, name):
         """
         Return the public URL for the file.
+        
+        Public bucket URLs are a pure function of the object path, so they are
+        built locally instead of going through the storage SDK on every call.
         """
         # Normalize path to use forward slashes for Supabase (Windows compatibility)
         name = name.replace('\\', '/')
-        try:
-            # Get public URL from Supabase
-            public_url = self.client.storage.from_(self.bucket_name).get_public_url(name)
-            return public_url
-        except Exception as e:
-            # Fallback: construct URL manually
-            return f"{self.supabase_url}/storage/v1/object/public/{self.bucket_name}/{name}"
+        return f"{self.public_url_prefix}{quote(name)}"
     
     def size(self, name):
         """
@@ -0,0 +1,109 @@
+"""
+Precompiled payload schemas for the admin dashboard detail API.
+
+Each schema is declared once as a list of ``(key, source, formatter, fallback)``
+entries and compiled at import time into plain getter callables, so building a
+payload is a single pass of attribute lookups with no per-request parsing.
+"""
+from operator import attrgetter, methodcaller
+
+
+LONG_DATE = methodcaller('strftime', '%B %d, %Y')
+LONG_DATETIME = methodcaller('strftime', '%B %d, %Y at %I:%M %p')
+
+
+def call(value):
+    """Formatter for bound methods such as ``get_full_name``"""
+    return value()
+
+
+def file_url(value):
+    """Formatter for FieldFile values (``None`` when no file is attached)"""
+    return value.url if value else None
+
+
+class Schema:
+    """A compiled list of fields that turns a model instance into a dict."""
+
+    def __init__(self, *fields):
+        self._fields = []
+        for key, source, formatter, fallback in fields:
+            getter = source if callable(source) else attrgetter(source)
+            self._fields.append((key, getter, formatter, fallback))
+
+    def dump(self, obj):
+        data = {}
+        for key, getter, formatter, fallback in self._fields:
+            try:
+                value = getter(obj)
+            except AttributeError:
+                # A nullable relation along the path (e.g. an anonymous donor)
+                value = None
+            if value is not None and formatter is not None:
+                value = formatter(value)
+            data[key] = fallback if value is None or value == '' else value
+        return data
+
+
+DONATION_SCHEMA = Schema(
+    ('id', 'id', None, None),
+    ('name', 'name', None, None),
+    ('quantity', 'quantity', None, None),
+    ('expiry_date', 'expiry_date', LONG_DATE, None),
+    ('tracking_code', 'tracking_code', None, None),
+    ('status', 'get_status_display', call, None),
+    ('approval_status', 'get_approval_status_display', call, None),
+    ('donated_at', 'donated_at', LONG_DATETIME, None),
+    ('notes', 'notes', None, 'No additional notes'),
+    ('image_url', 'image', file_url, None),
+    ('days_until_expiry', 'days_until_expiry', None, None),
+)
+
+DONOR_SCHEMA = Schema(
+    ('id', 'donor.id', None, None),
+    ('full_name', 'donor.get_full_name', call, 'Anonymous'),
+    ('username', 'donor.username', None, 'N/A'),
+    ('email', 'donor.email', None, 'N/A'),
+    ('phone', 'donor.phone_number', None, 'Not provided'),
+    ('address', 'donor.address', None, 'Not provided'),
+    ('user_type', 'donor.get_user_type_display', call, 'N/A'),
+    ('date_joined', 'donor.date_joined', LONG_DATE, 'N/A'),
+)
+
+REQUEST_SCHEMA = Schema(
+    ('id', 'id', None, None),
+    ('medicine_name', 'medicine_name', None, None),
+    ('quantity', 'quantity', None, None),
+    ('urgency', 'get_urgency_display', call, None),
+    ('urgency_class', 'urgency', None, None),
+    ('reason', 'reason', None, 'No reason provided'),
+    ('notes', 'notes', None, 'No additional notes'),
+    ('tracking_code', 'tracking_code', None, None),
+    ('status', 'get_status_display', call, None),
+    ('approval_status', 'get_approval_status_display', call, None),
+    ('created_at', 'created_at', LONG_DATETIME, None),
+    ('claim_ready_date', 'claim_ready_date', LONG_DATE, 'Not set'),
+    ('days_since_request', 'days_since_request', None, None),
+)
+
+RECIPIENT_SCHEMA = Schema(
+    ('id', 'recipient.id', None, None),
+    ('full_name', 'recipient.get_full_name', call, None),
+    ('username', 'recipient.username', None, None),
+    ('email', 'recipient.email', None, None),
+    ('phone', 'recipient.phone_number', None, 'Not provided'),
+    ('address', 'recipient.address', None, 'Not provided'),
+    ('user_type', 'recipient.get_user_type_display', call, 'N/A'),
+    ('date_joined', 'recipient.date_joined', LONG_DATE, None),
+)
+
+MATCHED_DONATION_SCHEMA = Schema(
+    ('id', 'id', None, None),
+    ('name', 'name', None, None),
+    ('quantity', 'quantity', None, None),
+    ('tracking_code', 'tracking_code', None, None),
+    ('image_url', 'image', file_url, None),
+    ('donor_name', 'donor.get_full_name', call, 'Anonymous'),
+    ('donor_email', 'donor.email', None, 'N/A'),
+    ('donor_phone', 'donor.phone_number', None, 'Not provided'),
+)
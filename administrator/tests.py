@@ -1,3 +1,146 @@
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from donations.models import Donation
+from notifications.models import Notification
+from requests.models import Allocation, MedicineRequest, ReservationPolicy
+from requests.reservations import claim_deadline, release_expired_reservations, reserve
+
+User = get_user_model()
+
+
+class DetailETagTests(TestCase):
+    def setUp(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.test', password='pw', first_name='A', last_name='A',
+        )
+        self.donor = User.objects.create_user(
+            username='donor', email='donor@example.test', password='pw', phone_number='0917 000 0001',
+        )
+        self.recipient = User.objects.create_user(
+            username='recipient', email='recipient@example.test', password='pw', phone_number='0917 000 0002',
+        )
+        self.donation = Donation.objects.create(
+            name='Cetirizine', quantity=5, donor=self.donor, expiry_date=date.today() + timedelta(days=90),
+        )
+        self.medicine_request = MedicineRequest.objects.create(
+            recipient=self.recipient, medicine_name='Cetirizine', quantity=1, matched_donation=self.donation,
+        )
+        self.client.force_login(admin)
+
+    def revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        return first['ETag']
+
+    def assert_contact_edit_busts_etag(self, url, user, key):
+        etag = self.revalidate(url)
+        user.phone_number = '0917 999 9999'
+        user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(key(response.json()), '0917 999 9999')
+
+    def test_if_modified_since_alone_does_not_hide_a_profile_edit(self):
+        url = reverse('get_donation_details', args=[self.donation.pk])
+        first = self.client.get(url)
+        self.assertNotIn('Last-Modified', first)
+        self.donor.phone_number = '0917 999 9999'
+        self.donor.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['donor']['phone'], '0917 999 9999')
+
+    def test_donation_details_follow_donor_profile_edits(self):
+        url = reverse('get_donation_details', args=[self.donation.pk])
+        self.assert_contact_edit_busts_etag(url, self.donor, lambda data: data['donor']['phone'])
+
+    def test_request_details_follow_recipient_profile_edits(self):
+        url = reverse('get_request_details', args=[self.medicine_request.pk])
+        self.assert_contact_edit_busts_etag(url, self.recipient, lambda data: data['recipient']['phone'])
+
+    def test_request_details_follow_matched_donor_profile_edits(self):
+        url = reverse('get_request_details', args=[self.medicine_request.pk])
+        self.assert_contact_edit_busts_etag(url, self.donor, lambda data: data['matched_donation']['donor_phone'])
+
+
+class ApproveRequestTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.test', password='pw', first_name='A', last_name='A',
+        )
+        self.donor = User.objects.create_user(username='donor', email='donor@example.test', password='pw')
+        self.recipient = User.objects.create_user(username='recipient', email='recipient@example.test', password='pw')
+        self.donation = Donation.objects.create(
+            name='Paracetamol', quantity=30, donor=self.donor, expiry_date=date.today() + timedelta(days=365),
+            approval_status=Donation.ApprovalStatus.APPROVED,
+        )
+        self.client.force_login(admin)
+
+    def matched_request(self, urgency='medium'):
+        medicine_request = MedicineRequest.objects.create(
+            recipient=self.recipient, medicine_name='Paracetamol', quantity=10, urgency=urgency,
+            matched_donation=self.donation, status=MedicineRequest.Status.MATCHED,
+        )
+        self.assertIsNotNone(reserve(self.donation.pk, medicine_request, 10))
+        return medicine_request
+
+    def expire(self, medicine_request):
+        medicine_request.allocations.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        release_expired_reservations()
+
+    def approve(self, medicine_request, claim_date):
+        return self.client.post(
+            reverse('approve_request', args=[medicine_request.pk]),
+            {'claim_ready_date': claim_date.isoformat()},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        ).json()
+
+    def assert_not_approved(self, medicine_request):
+        self.assertFalse(self.approve(medicine_request, date.today() + timedelta(days=3))['success'])
+        medicine_request.refresh_from_db()
+        self.assertEqual(medicine_request.approval_status, MedicineRequest.ApprovalStatus.PENDING)
+        self.assertFalse(Notification.objects.filter(notification_type=Notification.Type.REQUEST_APPROVED).exists())
+
+    def test_approval_holds_the_allocation_until_the_claim_date(self):
+        medicine_request = self.matched_request()
+        claim_date = date.today() + timedelta(days=3)
+        self.assertTrue(self.approve(medicine_request, claim_date)['success'])
+        medicine_request.refresh_from_db()
+        self.assertEqual(medicine_request.approval_status, MedicineRequest.ApprovalStatus.APPROVED)
+        self.assertEqual(medicine_request.allocations.get().reserved_until, claim_deadline(claim_date))
+        self.assertEqual(Notification.objects.filter(notification_type=Notification.Type.REQUEST_APPROVED).count(), 2)
+
+    def test_request_cancelled_by_the_sweeper_is_not_approved(self):
+        medicine_request = self.matched_request()
+        self.expire(medicine_request)
+        self.assert_not_approved(medicine_request)
+        self.assertEqual(medicine_request.allocations.get().state, Allocation.State.RELEASED)
+
+    def test_requeued_request_is_not_approved(self):
+        ReservationPolicy.objects.update_or_create(
+            urgency='critical', defaults={'ttl_hours': 1, 'on_expiry': ReservationPolicy.OnExpiry.REQUEUE},
+        )
+        medicine_request = self.matched_request(urgency='critical')
+        self.expire(medicine_request)
+        medicine_request.refresh_from_db()
+        self.assertEqual(
+            (medicine_request.status, medicine_request.matched_donation), (MedicineRequest.Status.PENDING, None),
+        )
+        self.assert_not_approved(medicine_request)
 
-# Create your tests here.
+    def test_dashboard_leaves_out_cancelled_requests(self):
+        cancelled = self.matched_request()
+        waiting = self.matched_request()
+        self.expire(cancelled)
+        pending = self.client.get(reverse('admin_dashboard')).context['pending_requests']
+        self.assertEqual([r.pk for r in pending], [waiting.pk])
@@ -9,4 +9,5 @@ urlpatterns = [
     path('reject-request/<int:request_id>/', views.reject_request, name='reject_request'),
     path('api/donation/<int:donation_id>/', views.get_donation_details, name='get_donation_details'),
     path('api/request/<int:request_id>/', views.get_request_details, name='get_request_details'),
+    path('api/metrics/', views.request_metrics, name='request_metrics'),
 ]
@@ -1,25 +1,51 @@
+import hashlib
 from datetime import date
+from django.conf import settings
 from django.contrib.auth.decorators import user_passes_test
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.utils import timezone
 from django.http import JsonResponse
-from django.db import models
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.db import models, transaction
 from django.db.models import Q, Count, Case, When
 import logging
 
 from donations.models import Donation
-from requests.models import MedicineRequest
+from requests.models import Allocation, MedicineRequest
+from requests.reservations import OPEN_STATUSES, claim_deadline, release_allocations
 from notifications.models import Notification
+from notifications.subscriptions import notify_subscribers
+from healthbridge_app import singleflight
+from healthbridge_app.instrumentation import metrics_buffer
+from .serializers import (
+    DONATION_SCHEMA, DONOR_SCHEMA, REQUEST_SCHEMA, RECIPIENT_SCHEMA, MATCHED_DONATION_SCHEMA,
+)
 
 logger = logging.getLogger(__name__)
 
+SITE_TOTALS_KEY = 'admin-dashboard:totals'
+
 
 def is_admin(user):
     """Check if user is a superuser/admin"""
     return user.is_authenticated and user.is_superuser
 
 
+def site_totals():
+    """Donation and request totals for the admin dashboard, one aggregate query per table"""
+    return {
+        **Donation.objects.aggregate(
+            total_donations=Count('pk'),
+            approved_donations=Count('pk', filter=Q(approval_status=Donation.ApprovalStatus.APPROVED)),
+        ),
+        **MedicineRequest.objects.aggregate(
+            total_requests=Count('pk'),
+            approved_requests=Count('pk', filter=Q(approval_status=MedicineRequest.ApprovalStatus.APPROVED)),
+        ),
+    }
+
+
 @user_passes_test(is_admin, login_url='/login/')
 def admin_dashboard(request):
     """Main admin dashboard showing pending approvals and statistics"""
@@ -30,9 +56,10 @@ def admin_dashboard(request):
     ).select_related('donor').order_by('-donated_at')
     
     # Get pending requests - sorted by urgency (critical first), then by date
+    # Requests the reservation sweeper cancelled keep approval_status PENDING; leave them out
     pending_requests = MedicineRequest.objects.filter(
-        approval_status=MedicineRequest.ApprovalStatus.PENDING
-    ).select_related('recipient', 'matched_donation__donor').order_by(
+        approval_status=MedicineRequest.ApprovalStatus.PENDING, status__in=OPEN_STATUSES
+    ).with_stock().select_related('recipient', 'matched_donation__donor').order_by(
         # Custom urgency ordering: critical -> high -> medium -> low
         Case(
             When(urgency='critical', then=1),
@@ -45,16 +72,8 @@ def admin_dashboard(request):
         'created_at'  # Within same urgency, oldest first (FIFO)
     )
     
-    # Get statistics
-    total_donations = Donation.objects.count()
-    approved_donations = Donation.objects.filter(
-        approval_status=Donation.ApprovalStatus.APPROVED
-    ).count()
-    
-    total_requests = MedicineRequest.objects.count()
-    approved_requests = MedicineRequest.objects.filter(
-        approval_status=MedicineRequest.ApprovalStatus.APPROVED
-    ).count()
+    # Get statistics (shared by all admins for a minute, recounted once when it runs out)
+    totals = singleflight.cached(SITE_TOTALS_KEY, site_totals, settings.DASHBOARD_STATS_SECONDS)
     
     # Get recent approvals
     recent_approved_donations = Donation.objects.filter(
@@ -91,11 +110,11 @@ def admin_dashboard(request):
         'pending_donations_count': pending_donations.count(),
         'pending_requests_count': pending_requests.count(),
         
-        'total_donations': total_donations,
-        'approved_donations': approved_donations,
+        'total_donations': totals['total_donations'],
+        'approved_donations': totals['approved_donations'],
         
-        'total_requests': total_requests,
-        'approved_requests': approved_requests,
+        'total_requests': totals['total_requests'],
+        'approved_requests': totals['approved_requests'],
         
         'recent_approved_donations': recent_approved_donations,
         'recent_approved_requests': recent_approved_requests,
@@ -118,6 +137,7 @@ def approve_donation(request, donation_id):
             donation.reviewed_by = request.user
             donation.reviewed_at = timezone.now()
             donation.save()
+            singleflight.invalidate(SITE_TOTALS_KEY)
             
             # Create notification for donor
             if donation.donor:
@@ -129,6 +149,10 @@ def approve_donation(request, donation_id):
                     donation_id=donation.id
                 )
             
+            # Push to recipients waiting for this medicine
+            if donation.status == Donation.Status.AVAILABLE and not donation.is_expired:
+                notify_subscribers(donation)
+            
             messages.success(request, f'Donation "{donation.name}" has been approved!')
             logger.info(f'Admin {request.user.email} approved donation {donation.tracking_code}')
             
@@ -226,12 +250,30 @@ def approve_request(request, request_id):
                     return JsonResponse({'success': False, 'error': 'Invalid date format'})
                 return redirect('admin_dashboard')
             
-            medicine_request.approval_status = MedicineRequest.ApprovalStatus.APPROVED
-            medicine_request.reviewed_by = request.user
-            medicine_request.reviewed_at = timezone.now()
-            medicine_request.claim_ready_date = claim_date
-            
-            medicine_request.save()
+            with transaction.atomic():
+                # Same lock order as the reservation sweeper and deliver_medicine: allocations, then the request
+                held = Allocation.objects.filter(
+                    request_id=medicine_request.id, state=Allocation.State.ACTIVE
+                ).select_for_update()
+                held_ids = list(held.values_list('id', flat=True))
+                medicine_request = MedicineRequest.objects.select_for_update().get(id=medicine_request.id)
+                
+                # The sweeper may have cancelled or requeued it since the dashboard was loaded
+                if medicine_request.status != MedicineRequest.Status.MATCHED or not held_ids:
+                    messages.error(request, 'This request no longer has medicine reserved for it and cannot be approved.')
+                    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                        return JsonResponse({'success': False, 'error': 'Request no longer has medicine reserved'})
+                    return redirect('admin_dashboard')
+                
+                medicine_request.approval_status = MedicineRequest.ApprovalStatus.APPROVED
+                medicine_request.reviewed_by = request.user
+                medicine_request.reviewed_at = timezone.now()
+                medicine_request.claim_ready_date = claim_date
+                medicine_request.save()
+                
+                # Hold the allocated units until the claim date instead of the approval TTL
+                Allocation.objects.filter(id__in=held_ids).update(reserved_until=claim_deadline(claim_date))
+            singleflight.invalidate(SITE_TOTALS_KEY)
             
             # Create notification for recipient (claim_date is now always available)
             if medicine_request.recipient:
@@ -303,7 +345,6 @@ def reject_request(request, request_id):
             quantity = medicine_request.quantity
             recipient_user = medicine_request.recipient
             tracking_code = medicine_request.tracking_code
-            matched_donation = medicine_request.matched_donation
             
             # Create notification for recipient before deleting
             if recipient_user:
@@ -314,10 +355,8 @@ def reject_request(request, request_id):
                     message=f'Your request for {quantity}x {medicine_name} was rejected and removed. Reason: {reason}'
                 )
             
-            # If the request was matched to a donation, set that donation back to AVAILABLE
-            if matched_donation:
-                matched_donation.status = Donation.Status.AVAILABLE
-                matched_donation.save()
+            # Give the units allocated to the request back to the donation
+            release_allocations(medicine_request.allocations.all())
             
             # Delete the request from database
             medicine_request.delete()
@@ -339,89 +378,103 @@ def reject_request(request, request_id):
     return redirect('admin_dashboard')
 
 
+# CustomUser fields the detail payloads embed (DONOR_SCHEMA, RECIPIENT_SCHEMA, MATCHED_DONATION_SCHEMA)
+CONTACT_FIELDS = ('first_name', 'last_name', 'username', 'email', 'phone_number', 'address', 'user_type')
+
+
+def _contact_version(user):
+    """
+    ETag part for a user's embedded contact details: CustomUser has no
+    modification timestamp, so a profile edit shows up as a new hash
+    """
+    if user is None:
+        return 'none'
+    fields = '\x1f'.join(str(getattr(user, name)) for name in CONTACT_FIELDS)
+    return f"{user.pk}-{hashlib.sha1(fields.encode()).hexdigest()[:12]}"
+
+
+def _detail_response(request, payload_builder, etag_parts):
+    """
+    Return a JSON detail payload with an ETag validator.
+
+    The ETag is derived from the row timestamps and contact hashes, so a repeat
+    open of an unchanged record is answered with a 304 before the payload is
+    built. ``date.today()`` is part of it because the payload carries day
+    counts. There is no Last-Modified: user rows have no timestamp, so a date
+    could not see a contact edit.
+    """
+    etag = quote_etag(':'.join(str(part) for part in (*etag_parts, date.today())))
+    
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(payload_builder())
+    
+    response['ETag'] = etag
+    # Let the browser keep the payload but revalidate on every open
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 @user_passes_test(is_admin, login_url='/login/')
 def get_donation_details(request, donation_id):
     """API endpoint to get full donation details"""
-    donation = get_object_or_404(Donation, id=donation_id)
+    donation = get_object_or_404(Donation.objects.select_related('donor'), id=donation_id)
     
-    donor = donation.donor
-    data = {
-        'donation': {
-            'id': donation.id,
-            'name': donation.name,
-            'quantity': donation.quantity,
-            'expiry_date': donation.expiry_date.strftime('%B %d, %Y'),
-            'tracking_code': donation.tracking_code,
-            'status': donation.get_status_display(),
-            'approval_status': donation.get_approval_status_display(),
-            'donated_at': donation.donated_at.strftime('%B %d, %Y at %I:%M %p'),
-            'notes': donation.notes or 'No additional notes',
-            'image_url': donation.image.url if donation.image else None,
-            'days_until_expiry': donation.days_until_expiry,
-        },
-        'donor': {
-            'id': donor.id if donor else None,
-            'full_name': donor.get_full_name() if donor else 'Anonymous',
-            'username': donor.username if donor else 'N/A',
-            'email': donor.email if donor else 'N/A',
-            'phone': donor.phone_number or 'Not provided',
-            'address': donor.address or 'Not provided',
-            'user_type': donor.get_user_type_display() if donor and donor.user_type else 'N/A',
-            'date_joined': donor.date_joined.strftime('%B %d, %Y') if donor else 'N/A',
+    def build():
+        return {
+            'donation': DONATION_SCHEMA.dump(donation),
+            'donor': DONOR_SCHEMA.dump(donation),
         }
-    }
     
-    return JsonResponse(data)
+    return _detail_response(
+        request, build,
+        etag_parts=('donation', donation.id, donation.last_update.timestamp(), _contact_version(donation.donor)),
+    )
 
 
 @user_passes_test(is_admin, login_url='/login/')
 def get_request_details(request, request_id):
     """API endpoint to get full request details"""
-    medicine_request = get_object_or_404(MedicineRequest, id=request_id)
-    
-    recipient = medicine_request.recipient
+    medicine_request = get_object_or_404(
+        MedicineRequest.objects.select_related('recipient', 'matched_donation__donor'),
+        id=request_id
+    )
     matched_donation = medicine_request.matched_donation
     
-    data = {
-        'request': {
-            'id': medicine_request.id,
-            'medicine_name': medicine_request.medicine_name,
-            'quantity': medicine_request.quantity,
-            'urgency': medicine_request.get_urgency_display(),
-            'urgency_class': medicine_request.urgency,
-            'reason': medicine_request.reason or 'No reason provided',
-            'notes': medicine_request.notes or 'No additional notes',
-            'tracking_code': medicine_request.tracking_code,
-            'status': medicine_request.get_status_display(),
-            'approval_status': medicine_request.get_approval_status_display(),
-            'created_at': medicine_request.created_at.strftime('%B %d, %Y at %I:%M %p'),
-            'claim_ready_date': medicine_request.claim_ready_date.strftime('%B %d, %Y') if medicine_request.claim_ready_date else 'Not set',
-            'days_since_request': medicine_request.days_since_request,
-        },
-        'recipient': {
-            'id': recipient.id,
-            'full_name': recipient.get_full_name(),
-            'username': recipient.username,
-            'email': recipient.email,
-            'phone': recipient.phone_number or 'Not provided',
-            'address': recipient.address or 'Not provided',
-            'user_type': recipient.get_user_type_display() if recipient.user_type else 'N/A',
-            'date_joined': recipient.date_joined.strftime('%B %d, %Y'),
-        },
-        'matched_donation': None
-    }
+    def build():
+        return {
+            'request': REQUEST_SCHEMA.dump(medicine_request),
+            'recipient': RECIPIENT_SCHEMA.dump(medicine_request),
+            'matched_donation': MATCHED_DONATION_SCHEMA.dump(matched_donation) if matched_donation else None,
+        }
     
+    # The payload embeds the matched donation and both users' contact details, so their changes must bust the ETag too
+    etag_parts = [
+        'request', medicine_request.id, medicine_request.updated_at.timestamp(),
+        _contact_version(medicine_request.recipient),
+    ]
     if matched_donation:
-        donor = matched_donation.donor
-        data['matched_donation'] = {
-            'id': matched_donation.id,
-            'name': matched_donation.name,
-            'quantity': matched_donation.quantity,
-            'tracking_code': matched_donation.tracking_code,
-            'image_url': matched_donation.image.url if matched_donation.image else None,
-            'donor_name': donor.get_full_name() if donor else 'Anonymous',
-            'donor_email': donor.email if donor else 'N/A',
-            'donor_phone': donor.phone_number if donor else 'Not provided',
-        }
+        etag_parts += [
+            matched_donation.id, matched_donation.last_update.timestamp(), _contact_version(matched_donation.donor),
+        ]
+    
+    return _detail_response(request, build, etag_parts)
+
+
+@user_passes_test(is_admin, login_url='/login/')
+def request_metrics(request):
+    """API endpoint exposing recent per-view query count and latency samples"""
+    if request.method == 'POST' and request.POST.get('action') == 'clear':
+        metrics_buffer.clear()
+    
+    samples = metrics_buffer.samples()
+    try:
+        limit = max(0, int(request.GET.get('limit', 50)))
+    except ValueError:
+        limit = 50
     
-    return JsonResponse(data)
+    return JsonResponse({
+        'views': metrics_buffer.summary(),
+        'recent': samples[-limit:][::-1] if limit else [],
+        'buffered': len(samples),
+    })
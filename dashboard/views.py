@@ -1,10 +1,12 @@
 from datetime import date, timedelta
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
 from django.utils import timezone
 import logging
 
-from donations.models import Donation, ExpiryAlert
+from donations.models import Donation, ExpiryAlert, Urgency
+from healthbridge_app import singleflight
 from requests.models import MedicineRequest
 
 logger = logging.getLogger(__name__)
@@ -26,7 +28,7 @@ def dashboard(request):
     
     # Expiring donations warning
     user_expiring = Donation.objects.expiring_within(days=10).filter(donor=request.user)
-    critical_donations = user_expiring.filter(expiry_date__lte=date.today() + timedelta(days=3))
+    critical_donations = user_expiring.with_urgency().filter(urgency_rank__lte=Urgency.HIGH)
     
     context.update({
         'total_donations': total_donations,
@@ -54,22 +56,13 @@ def dashboard(request):
     
     # Admin features (if staff)
     if request.user.is_staff:
-        all_expiring = Donation.objects.expiring_within(days=14)
-        
-        context['critical_donations'] = all_expiring.filter(expiry_date__lte=date.today() + timedelta(days=1))
-        context['high_priority_donations'] = all_expiring.filter(
-            expiry_date__gt=date.today() + timedelta(days=1),
-            expiry_date__lte=date.today() + timedelta(days=3)
-        )
-        context['medium_priority_donations'] = all_expiring.filter(
-            expiry_date__gt=date.today() + timedelta(days=3),
-            expiry_date__lte=date.today() + timedelta(days=7)
-        )
-        context['low_priority_donations'] = all_expiring.filter(
-            expiry_date__gt=date.today() + timedelta(days=7)
-        )
-        
-        context['total_expiring_count'] = all_expiring.count()
+        # Group by urgency in one query instead of a query per bucket
+        buckets = Donation.objects.expiring_within(days=14).urgency_buckets()
+        context['critical_donations'] = buckets['critical']
+        context['high_priority_donations'] = buckets['high']
+        context['medium_priority_donations'] = buckets['medium']
+        context['low_priority_donations'] = buckets['low']
+        context['total_expiring_count'] = sum(len(bucket) for bucket in buckets.values())
         context['recent_alerts'] = ExpiryAlert.objects.filter(
             alert_sent_at__gte=timezone.now() - timedelta(days=7)
         ).select_related('donation')[:10]
@@ -134,7 +127,7 @@ def donor_dashboard(request):
     
     # Expiring donations warning
     user_expiring = Donation.objects.expiring_within(days=10).filter(donor=request.user)
-    critical_donations = user_expiring.filter(expiry_date__lte=date.today() + timedelta(days=3))
+    critical_donations = user_expiring.with_urgency().filter(urgency_rank__lte=Urgency.HIGH)
     
     # Pending requests (matched but not yet claimed) - only show APPROVED requests
     pending_requests = MedicineRequest.objects.filter(
@@ -213,24 +206,10 @@ def recipient_dashboard(request):
         status=MedicineRequest.Status.CLAIMED
     ).count()
     
-    # Recently donated medicines (most recent first, only show APPROVED available ones with quantity > 0)
-    available_medicines = Donation.objects.filter(
-        status=Donation.Status.AVAILABLE,
-        approval_status=Donation.ApprovalStatus.APPROVED,  # Only show approved donations
-        quantity__gt=0
-    ).order_by('-donated_at')[:3]
-    available_medicines_count = Donation.objects.filter(
-        status=Donation.Status.AVAILABLE,
-        approval_status=Donation.ApprovalStatus.APPROVED,  # Only show approved donations
-        quantity__gt=0
-    ).count()
-    
-    # All available medicines for browse modal (only APPROVED)
-    all_available_medicines = Donation.objects.filter(
-        status=Donation.Status.AVAILABLE,
-        approval_status=Donation.ApprovalStatus.APPROVED,  # Only show approved donations
-        quantity__gt=0
-    ).prefetch_related('matched_requests__recipient').order_by('-donated_at')[:50]
+    # Available medicines are the same for every recipient: shared for a minute, built once when it runs out
+    available = singleflight.cached(
+        'recipient-dashboard:available', available_medicines_fragment, settings.DASHBOARD_STATS_SECONDS,
+    )
     
     # Recent requests (only approved ones that are pending, matched, or fulfilled)
     recent_requests = user_requests.filter(
@@ -257,9 +236,7 @@ def recipient_dashboard(request):
         'pending_requests': pending_requests,
         'fulfilled_requests': fulfilled_requests,
         'claimed_count': claimed_count,
-        'available_medicines': available_medicines,
-        'all_available_medicines': all_available_medicines,
-        'available_medicines_count': available_medicines_count,
+        **available,
         'recent_requests': recent_requests,
         'ready_to_claim': ready_to_claim,
         'ready_to_claim_count': ready_to_claim.count(),
@@ -267,3 +244,21 @@ def recipient_dashboard(request):
     })
     
     return render(request, "dashboard/recipient_dashboard.html", context)
+
+
+def available_medicines_fragment():
+    """The recipient dashboard's available medicines: 3 most recent, 50 to browse, and the total"""
+    # Only show APPROVED available ones with quantity > 0, most recent first
+    available = Donation.objects.filter(
+        status=Donation.Status.AVAILABLE,
+        approval_status=Donation.ApprovalStatus.APPROVED,
+        quantity__gt=0
+    )
+    browse = list(
+        available.select_related('donor').prefetch_related('matched_requests__recipient').order_by('-donated_at')[:50]
+    )
+    return {
+        'available_medicines': browse[:3],
+        'all_available_medicines': browse,
+        'available_medicines_count': available.count(),
+    }
@@ -7,7 +7,7 @@ class DonationAdmin(admin.ModelAdmin):
     list_display = ['name', 'quantity', 'expiry_date', 'status', 'donor', 'tracking_code', 'donated_at']
     list_filter = ['status', 'expiry_date', 'donated_at']
     search_fields = ['name', 'tracking_code', 'donor__email']
-    readonly_fields = ['tracking_code', 'donated_at', 'last_update']
+    readonly_fields = ['tracking_code', 'allocated_qty', 'donated_at', 'last_update']
     
     fieldsets = (
         ('Medicine Information', {
@@ -17,7 +17,7 @@ class DonationAdmin(admin.ModelAdmin):
             'fields': ('donor',)
         }),
         ('Status & Tracking', {
-            'fields': ('status', 'tracking_code', 'notes')
+            'fields': ('status', 'allocated_qty', 'tracking_code', 'notes')
         }),
         ('Timestamps', {
             'fields': ('donated_at', 'last_update'),
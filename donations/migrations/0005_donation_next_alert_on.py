@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.db import migrations, models
+
+from donations.models import ALERTABLE_STATUSES, next_alert_date
+
+
+def backfill_next_alert_on(apps, schema_editor):
+    """Schedule the first alert for stock that has not expired yet, one UPDATE per expiry date"""
+    Donation = apps.get_model('donations', 'Donation')
+    upcoming = Donation.objects.filter(status__in=ALERTABLE_STATUSES, expiry_date__gte=date.today())
+    for expiry_date in list(upcoming.order_by().values_list('expiry_date', flat=True).distinct()):
+        upcoming.filter(expiry_date=expiry_date).update(next_alert_on=next_alert_date(expiry_date))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0004_set_all_to_pending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='next_alert_on',
+            field=models.DateField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_next_alert_on, migrations.RunPython.noop),
+    ]
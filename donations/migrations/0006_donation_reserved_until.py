@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_reserved_until(apps, schema_editor):
+    """Give reservations made before the deadline existed one default TTL from now"""
+    Donation = apps.get_model('donations', 'Donation')
+    deadline = timezone.now() + timedelta(hours=getattr(settings, 'RESERVATION_TTL_HOURS', 72))
+    Donation.objects.filter(status='reserved').update(reserved_until=deadline)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0005_donation_next_alert_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='reserved_until',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_reserved_until, migrations.RunPython.noop),
+    ]
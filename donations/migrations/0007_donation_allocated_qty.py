@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0006_donation_reserved_until'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='allocated_qty',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
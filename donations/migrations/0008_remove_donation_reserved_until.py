@@ -0,0 +1,16 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0007_donation_allocated_qty'),
+        ('requests', '0006_allocation'),  # deadlines are copied onto the allocations first
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='donation',
+            name='reserved_until',
+        ),
+    ]
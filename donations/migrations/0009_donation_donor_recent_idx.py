@@ -0,0 +1,17 @@
+# Generated manually: index for the keyset-paginated my_donations list
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0008_remove_donation_reserved_until'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['donor', '-donated_at', '-id'], name='donation_donor_recent_idx'),
+        ),
+    ]
@@ -5,8 +5,96 @@ from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
+DEFAULT_ALERT_THRESHOLDS = [10, 7, 3, 1, 0]
+ALERTABLE_STATUSES = ["available", "reserved"]
 
-class DonationManager(models.Manager):
+
+def alert_thresholds():
+    """Configured alert thresholds in days before expiry, largest first"""
+    return sorted(set(getattr(settings, 'EXPIRY_ALERT_THRESHOLDS', DEFAULT_ALERT_THRESHOLDS)), reverse=True)
+
+
+def next_alert_date(expiry_date, after=None):
+    """
+    Day the next expiry alert is due for a donation expiring on expiry_date.
+
+    Without `after` this is the first alert: today if the donation is already
+    inside the alert window, otherwise its largest threshold. With `after` (the
+    day an alert went out) it is the next threshold date strictly later.
+    Returns None once no alert is left to send.
+    """
+    today = date.today()
+    if expiry_date is None or expiry_date < today:
+        return None
+    thresholds = alert_thresholds()
+    if after is None:
+        return max(today, expiry_date - timedelta(days=thresholds[0]))
+    upcoming = [expiry_date - timedelta(days=days) for days in thresholds]
+    return min((day for day in upcoming if day > after), default=None)
+
+
+class Urgency(models.IntegerChoices):
+    """Expiry urgency as an orderable rank; labels match Donation.urgency_level"""
+    EXPIRED = 0, "expired"
+    CRITICAL = 1, "critical"  # expires today
+    HIGH = 2, "high"          # expires in 1-3 days
+    MEDIUM = 3, "medium"      # expires in 4-7 days
+    LOW = 4, "low"            # expires in 8-14 days
+    NORMAL = 5, "normal"      # expires in 15+ days
+
+
+class DaysUntil(models.Func):
+    """Whole days from `today` until a date expression (negative once it has passed), computed in SQL"""
+    function = 'DATEDIFF'
+    output_field = models.IntegerField()
+
+    def __init__(self, expression, today=None, **extra):
+        today = models.Value(today or date.today(), output_field=models.DateField())
+        super().__init__(expression, today, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(%(expressions)s) AS INTEGER)', arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        # date - date is an integer number of days
+        return self.as_sql(compiler, connection, template='(%(expressions)s)', arg_joiner=' - ', **extra_context)
+
+
+class DonationQuerySet(models.QuerySet):
+    def with_urgency(self, today=None):
+        """
+        Annotate `days_left` and an integer `urgency_rank` (Urgency) in SQL, so
+        urgency can be filtered, ordered and grouped on. Donations loaded this
+        way answer days_until_expiry/urgency_level without calling date.today().
+        """
+        days_left = DaysUntil('expiry_date', today)
+        return self.annotate(
+            days_left=days_left,
+            urgency_rank=models.Case(
+                models.When(expiry_date__isnull=True, then=models.Value(Urgency.NORMAL)),
+                models.When(models.Q(days_left__lt=0), then=models.Value(Urgency.EXPIRED)),
+                models.When(models.Q(days_left=0), then=models.Value(Urgency.CRITICAL)),
+                models.When(models.Q(days_left__lte=3), then=models.Value(Urgency.HIGH)),
+                models.When(models.Q(days_left__lte=7), then=models.Value(Urgency.MEDIUM)),
+                models.When(models.Q(days_left__lte=14), then=models.Value(Urgency.LOW)),
+                default=models.Value(Urgency.NORMAL),
+                output_field=models.IntegerField(),
+            ),
+        )
+
+    def urgency_buckets(self):
+        """{urgency label: [donations]} from one query, soonest expiry first in each bucket"""
+        buckets = {label: [] for label in Urgency.labels}
+        for donation in self.with_urgency().order_by('urgency_rank', 'expiry_date'):
+            buckets[Urgency(donation.urgency_rank).label].append(donation)
+        return buckets
+
+
+class DonationManager(models.Manager.from_queryset(DonationQuerySet)):
     """Custom manager for Donation model with expiry-related methods"""
     
     def expiring_within(self, days=10):
@@ -32,6 +120,78 @@ class DonationManager(models.Manager):
             expiry_date__gte=date.today(),
             status__in=[Donation.Status.AVAILABLE, Donation.Status.RESERVED]
         ).order_by('expiry_date')
+    
+    def alerts_due(self, days=10):
+        """
+        Donations with an expiry alert due today, expiring within `days`.
+        An index range scan on next_alert_on, so the cost follows the number
+        of alerts due rather than the size of the inventory.
+        """
+        today = date.today()
+        return self.filter(
+            next_alert_on__lte=today,
+            expiry_date__gte=today,
+            expiry_date__lte=today + timedelta(days=days),
+            status__in=ALERTABLE_STATUSES,
+        )
+    
+    def advance_alerts(self, queryset):
+        """
+        Move next_alert_on past today for every donation in `queryset`.
+        The next date depends only on expiry_date, so this is one UPDATE per
+        distinct expiry date (at most the largest threshold + 1).
+        """
+        today = date.today()
+        expiry_dates = queryset.order_by().values_list('expiry_date', flat=True).distinct()
+        advanced = 0
+        for expiry_date in list(expiry_dates):
+            advanced += queryset.filter(expiry_date=expiry_date).update(
+                next_alert_on=next_alert_date(expiry_date, after=today)
+            )
+        return advanced
+
+    def schedule_alerts(self, queryset):
+        """
+        Recompute next_alert_on the way save() does, for rows changed with
+        update(): the first alert for stocked donations, None for the rest.
+        Two UPDATEs; the stocked rows get a CASE over their distinct expiry dates.
+        """
+        scheduled = queryset.exclude(status__in=ALERTABLE_STATUSES).update(next_alert_on=None)
+        stocked = queryset.filter(status__in=ALERTABLE_STATUSES)
+        expiry_dates = list(stocked.order_by().values_list('expiry_date', flat=True).distinct())
+        if expiry_dates:
+            scheduled += stocked.update(next_alert_on=models.Case(
+                *[
+                    models.When(expiry_date=expiry_date, then=models.Value(next_alert_date(expiry_date)))
+                    for expiry_date in expiry_dates
+                ],
+                default=models.Value(None),
+                output_field=models.DateField(),
+            ))
+        return scheduled
+
+    def update_stock_status(self, queryset):
+        """
+        Re-derive AVAILABLE / RESERVED / DELIVERED from quantity and
+        allocated_qty after update()s to either: nothing left is DELIVERED,
+        everything left allocated is RESERVED, anything else AVAILABLE.
+        """
+        stocked = queryset.filter(status__in=ALERTABLE_STATUSES)
+        changed = stocked.filter(quantity=0).update(status=Donation.Status.DELIVERED, next_alert_on=None)
+        changed += stocked.filter(
+            status=Donation.Status.AVAILABLE, quantity__gt=0, allocated_qty__gte=models.F('quantity')
+        ).update(status=Donation.Status.RESERVED)
+        changed += stocked.filter(
+            status=Donation.Status.RESERVED, allocated_qty__lt=models.F('quantity')
+        ).update(status=Donation.Status.AVAILABLE)
+        return changed
+
+    def clear_stale_alerts(self):
+        """Drop next_alert_on from donations that expired or left stock (e.g. admin bulk status changes)"""
+        today = date.today()
+        return self.filter(next_alert_on__lte=today).filter(
+            models.Q(expiry_date__lt=today) | ~models.Q(status__in=ALERTABLE_STATUSES)
+        ).update(next_alert_on=None)
 
 
 class Donation(models.Model):
@@ -85,18 +245,54 @@ class Donation(models.Model):
     )
     reviewed_at = models.DateTimeField(null=True, blank=True)
     rejection_reason = models.TextField(blank=True, help_text="Reason for rejection (if rejected)")
+    
+    # Day the next expiry alert is due; maintained in save() and advanced by check_expiry
+    next_alert_on = models.DateField(null=True, blank=True, db_index=True, editable=False)
+    # Sum of the active Allocation rows (requests.Allocation); quantity - allocated_qty is free to request
+    allocated_qty = models.PositiveIntegerField(default=0, editable=False)
 
     objects = DonationManager()  # Custom manager
 
+    class Meta:
+        indexes = [
+            # my_donations pages by (donated_at, id) within a donor
+            models.Index(fields=['donor', '-donated_at', '-id'], name='donation_donor_recent_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        status = instance.__dict__.get('status')
+        instance._alert_state = (instance.__dict__.get('expiry_date'), status in ALERTABLE_STATUSES)
+        return instance
+
     def save(self, *args, **kwargs):
         # create a short unique code like AB12CD34EF
         if not self.tracking_code:
             self.tracking_code = uuid4().hex[:12].upper()
+        # Reschedule expiry alerts when the expiry date changes or the donation starts or stops
+        # being alertable; available <-> reserved keeps the schedule (and the alerts already sent)
+        alert_state = (self.expiry_date, self.status in ALERTABLE_STATUSES)
+        self._alert_rescheduled = alert_state != getattr(self, '_alert_state', None)
+        if self._alert_rescheduled:
+            self.next_alert_on = (
+                next_alert_date(self.expiry_date) if self.status in ALERTABLE_STATUSES else None
+            )
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'next_alert_on'}
         super().save(*args, **kwargs)
+        self._alert_state = alert_state
+
+    @property
+    def available_quantity(self):
+        """Units not yet allocated to a request"""
+        return max(self.quantity - self.allocated_qty, 0)
 
     @property
     def days_until_expiry(self):
         """Calculate days until expiry (negative if already expired)"""
+        if self.__dict__.get('days_left') is not None:
+            return self.days_left  # annotated by with_urgency()
         if not self.expiry_date:
             return None
         delta = self.expiry_date - date.today()
@@ -120,6 +316,8 @@ class Donation(models.Model):
     @property
     def urgency_level(self):
         """Return urgency level based on days until expiry"""
+        if self.__dict__.get('urgency_rank') is not None:
+            return Urgency(self.urgency_rank).label  # annotated by with_urgency()
         if not self.expiry_date:
             return "normal"
         
@@ -0,0 +1,207 @@
+"""
+Medicine search: filters, facet counts and paginated results
+
+SearchParams reads and validates the query string once (name, expiry date
+range, and the urgency / expiry month / availability facets). The search
+covers approved, unexpired donations with units left, soonest expiry first.
+
+facet_counts() answers all three facets with one grouped query over the
+name and date filters: GROUP BY urgency rank, expiry month and availability,
+folded into per-facet counts in Python. Choosing a facet narrows the results
+but not the counts, so every option keeps showing what it would add.
+
+search_page() pages by (expiry_date, id) with the same cursor as
+healthbridge_app.pagination. The ordered result ids (up to
+SEARCH_RESULT_CACHE_MAX_IDS) and the facet counts are cached for
+SEARCH_RESULT_CACHE_SECONDS under the normalized parameters
+(healthbridge_app.singleflight, so simultaneous identical searches run the
+queries once), so paging
+through a search, or the same search from other users, costs one primary
+key lookup per page; pages past the cached ids fall back to a keyset query.
+"""
+import hashlib
+import json
+from bisect import bisect_right
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db.models import Case, CharField, Count, F, Value, When
+from django.db.models.functions import TruncMonth
+
+from healthbridge_app import singleflight
+from healthbridge_app.pagination import KeysetPage, decode_cursor, encode_cursor, keyset_page
+
+from .models import ALERTABLE_STATUSES, Donation, Urgency
+
+AVAILABILITY_LABELS = {'available': 'Units free', 'reserved': 'Fully reserved'}
+
+
+class SearchParams:
+    """The search's query-string parameters, parsed and validated once"""
+
+    def __init__(self, data):
+        self.query = data.get('q', '').strip()
+        self.start_date = data.get('start_date', '').strip()
+        self.end_date = data.get('end_date', '').strip()
+        self.start = self.end = None
+        self.filter_message = None
+        self.filter_error = None
+        self.parse_dates()
+
+        urgency = data.get('urgency', '')
+        self.urgency = next((u for u in Urgency if u.label == urgency and u != Urgency.EXPIRED), None)
+        try:
+            self.month = datetime.strptime(data.get('month', ''), '%Y-%m').date()
+        except ValueError:
+            self.month = None
+        availability = data.get('availability', '')
+        self.availability = availability if availability in AVAILABILITY_LABELS else None
+
+    def parse_dates(self):
+        try:
+            self.start = datetime.strptime(self.start_date, '%Y-%m-%d').date() if self.start_date else None
+            self.end = datetime.strptime(self.end_date, '%Y-%m-%d').date() if self.end_date else None
+        except ValueError:
+            self.start = self.end = None
+            self.filter_error = "Invalid date format. Please use YYYY-MM-DD."
+            return
+        if self.start and self.end and self.start > self.end:
+            self.start = self.end = None
+            self.filter_error = "Start date cannot be after end date."
+        elif self.start and self.end:
+            self.filter_message = f"Showing medicines expiring between {self.start_date} and {self.end_date}"
+        elif self.start:
+            self.filter_message = f"Showing medicines expiring from {self.start_date} onwards"
+        elif self.end:
+            self.filter_message = f"Showing medicines expiring up to {self.end_date}"
+
+    def cache_key(self):
+        normalized = [
+            self.query.lower(), self.start and self.start.isoformat(), self.end and self.end.isoformat(),
+            self.urgency and self.urgency.label, self.month and self.month.isoformat(), self.availability,
+        ]
+        digest = hashlib.md5(json.dumps(normalized).encode()).hexdigest()
+        return f"donation-search:{date.today().isoformat()}:{digest}"
+
+    def base_queryset(self):
+        """Name and date filters: what the facet counts are computed over"""
+        donations = Donation.objects.filter(
+            approval_status=Donation.ApprovalStatus.APPROVED,
+            status__in=ALERTABLE_STATUSES,
+            quantity__gt=0,
+            expiry_date__gte=date.today(),
+        )
+        if self.query:
+            donations = donations.filter(name__icontains=self.query)
+        if self.start:
+            donations = donations.filter(expiry_date__gte=self.start)
+        if self.end:
+            donations = donations.filter(expiry_date__lte=self.end)
+        return donations
+
+    def queryset(self):
+        """base_queryset() narrowed by the chosen facets"""
+        donations = self.base_queryset()
+        if self.urgency is not None:
+            donations = donations.with_urgency().filter(urgency_rank=self.urgency)
+        if self.month:
+            donations = donations.filter(expiry_date__year=self.month.year, expiry_date__month=self.month.month)
+        if self.availability == 'available':
+            donations = donations.filter(allocated_qty__lt=F('quantity'))
+        elif self.availability == 'reserved':
+            donations = donations.filter(allocated_qty__gte=F('quantity'))
+        return donations
+
+
+def facet_counts(queryset):
+    """{'urgency': {label: n}, 'month': {date: n}, 'availability': {key: n}} from one grouped query"""
+    rows = queryset.with_urgency().annotate(
+        month=TruncMonth('expiry_date'),
+        availability=Case(
+            When(allocated_qty__lt=F('quantity'), then=Value('available')),
+            default=Value('reserved'),
+            output_field=CharField(),
+        ),
+    ).order_by().values('urgency_rank', 'month', 'availability').annotate(n=Count('pk'))
+
+    facets = {'urgency': {}, 'month': {}, 'availability': {}}
+    for row in rows:
+        for facet, value in (
+            ('urgency', Urgency(row['urgency_rank']).label), ('month', row['month']), ('availability', row['availability']),
+        ):
+            facets[facet][value] = facets[facet].get(value, 0) + row['n']
+    return facets
+
+
+def facet_groups(query_dict, params, facets):
+    """
+    Facet counts as template rows: (title, [{'label', 'count', 'active',
+    'query'}]), where 'query' is the current query string with that option
+    toggled and the cursor dropped.
+    """
+    def option(name, value, label, count, active):
+        query = query_dict.copy()
+        query.pop('after', None)
+        if active:
+            query.pop(name, None)
+        else:
+            query[name] = value
+        return {'label': label, 'count': count, 'active': active, 'query': query.urlencode()}
+
+    urgency = [
+        option('urgency', u.label, u.label.title(), facets['urgency'][u.label], params.urgency == u)
+        for u in Urgency if u.label in facets['urgency']
+    ]
+    month = [
+        option('month', m.strftime('%Y-%m'), m.strftime('%b %Y'), n, params.month == m)
+        for m, n in sorted(facets['month'].items())
+    ]
+    availability = [
+        option('availability', key, label, facets['availability'][key], params.availability == key)
+        for key, label in AVAILABILITY_LABELS.items() if key in facets['availability']
+    ]
+    return [('Urgency', urgency), ('Expiry month', month), ('Availability', availability)]
+
+
+def cached_search(params):
+    """{'keys': [(expiry iso, pk)...], 'complete': bool, 'total': n, 'facets': ...}, computed once per burst of identical searches"""
+    def compute():
+        limit = settings.SEARCH_RESULT_CACHE_MAX_IDS
+        results = params.queryset()
+        keys = [
+            (expiry_date.isoformat(), pk)
+            for expiry_date, pk in results.order_by('expiry_date', 'pk').values_list('expiry_date', 'pk')[:limit + 1]
+        ]
+        complete = len(keys) <= limit
+        return {
+            'keys': keys[:limit],
+            'complete': complete,
+            'total': len(keys) if complete else results.count(),
+            'facets': facet_counts(params.base_queryset()),
+        }
+
+    return singleflight.cached(params.cache_key(), compute, settings.SEARCH_RESULT_CACHE_SECONDS)
+
+
+def search_page(params, after=None, limit=24):
+    """(KeysetPage of donations, total results, facet counts) for one page of a search"""
+    result = cached_search(params)
+    keys = result['keys']
+    field = Donation._meta.get_field('expiry_date')
+    position = decode_cursor(field, after)
+    start = bisect_right(keys, (position[0].isoformat(), position[1])) if position else 0
+
+    rows = Donation.objects.select_related('donor')
+    if start + limit < len(keys) or result['complete']:
+        ids = [pk for _, pk in keys[start:start + limit]]
+        by_id = rows.in_bulk(ids)
+        items = [by_id[pk] for pk in ids if pk in by_id]
+        next_cursor = None
+        if start + limit < len(keys):
+            expiry, pk = keys[start + limit - 1]
+            next_cursor = encode_cursor(field, Donation(pk=pk, expiry_date=date.fromisoformat(expiry)))
+        page = KeysetPage(items, next_cursor, position is None, limit)
+    else:
+        # Past the cached ids: continue from the cursor in the database
+        page = keyset_page(params.queryset().select_related('donor'), 'expiry_date', after, limit, descending=False)
+    return page, result['total'], result['facets']
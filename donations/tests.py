@@ -1,3 +1,145 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from .models import Donation, next_alert_date
+from .search import SearchParams, facet_counts, search_page
+
+
+class AlertScheduleTests(TestCase):
+    def setUp(self):
+        self.expiry = date.today() + timedelta(days=5)
+        donation = Donation.objects.create(
+            name='Amoxicillin', quantity=10, expiry_date=self.expiry,
+            approval_status=Donation.ApprovalStatus.APPROVED,
+        )
+        # check_expiry sent today's alert and moved the schedule on to the 3-day threshold
+        self.next_alert = self.expiry - timedelta(days=3)
+        Donation.objects.filter(pk=donation.pk).update(next_alert_on=self.next_alert)
+        self.donation = Donation.objects.get(pk=donation.pk)
+
+    def save_with(self, **fields):
+        """The donation as save() left it (the post_save alert check may move the stored schedule on again)"""
+        for name, value in fields.items():
+            setattr(self.donation, name, value)
+        self.donation.save()
+        return self.donation
+
+    def test_reserving_and_releasing_keeps_the_schedule(self):
+        for status in (Donation.Status.RESERVED, Donation.Status.AVAILABLE):
+            donation = self.save_with(status=status)
+            self.assertFalse(donation._alert_rescheduled)
+            self.assertEqual(donation.next_alert_on, self.next_alert)
+
+    def test_leaving_the_alertable_statuses_clears_the_schedule(self):
+        self.assertIsNone(self.save_with(status=Donation.Status.DELIVERED).next_alert_on)
+
+    def test_new_expiry_date_reschedules(self):
+        expiry = date.today() + timedelta(days=30)
+        self.assertEqual(self.save_with(expiry_date=expiry).next_alert_on, expiry - timedelta(days=10))
+
+
+
+@override_settings(EXPIRY_ALERT_THRESHOLDS=[10, 7, 3, 1, 0])
+class NextAlertDateTests(SimpleTestCase):
+    def test_walks_through_the_thresholds(self):
+        today = date.today()
+        expiry = today + timedelta(days=12)
+        first = next_alert_date(expiry)
+        self.assertEqual(first, expiry - timedelta(days=10))
+        schedule = [first]
+        while (following := next_alert_date(expiry, after=schedule[-1])) is not None:
+            schedule.append(following)
+        self.assertEqual([(expiry - day).days for day in schedule], [10, 7, 3, 1, 0])
+
+    def test_inside_the_window_the_first_alert_is_today(self):
+        self.assertEqual(next_alert_date(date.today() + timedelta(days=5)), date.today())
+
+    def test_expired_donations_get_no_alert(self):
+        self.assertIsNone(next_alert_date(date.today() - timedelta(days=1)))
+        self.assertIsNone(next_alert_date(None))
+
+
+class AlertsDueTests(TestCase):
+    def donation(self, days, **fields):
+        # update(): skip save() and the real-time alert it triggers
+        donation = Donation.objects.create(name='Metformin', quantity=5, expiry_date=date.today() + timedelta(days=40))
+        Donation.objects.filter(pk=donation.pk).update(expiry_date=date.today() + timedelta(days=days), **fields)
+        return donation.pk
+
+    def test_only_donations_crossing_a_threshold_are_due(self):
+        today = date.today()
+        due = self.donation(7, next_alert_on=today)
+        overdue = self.donation(3, next_alert_on=today - timedelta(days=2))
+        self.donation(7, next_alert_on=today + timedelta(days=4))
+        self.donation(7, next_alert_on=today, status=Donation.Status.DELIVERED)
+        self.donation(-1, next_alert_on=today)
+        self.donation(30, next_alert_on=today)
+        self.assertEqual(set(Donation.objects.alerts_due().values_list('pk', flat=True)), {due, overdue})
+
+        Donation.objects.advance_alerts(Donation.objects.alerts_due())
+        self.assertFalse(Donation.objects.alerts_due().exists())
+        self.assertEqual(Donation.objects.get(pk=due).next_alert_on, today + timedelta(days=4))
+        self.assertEqual(Donation.objects.get(pk=overdue).next_alert_on, today + timedelta(days=2))
+
+
+class MedicineSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        today = date.today()
+        self.expected = [
+            self.donation('Paracetamol 500mg', today + timedelta(days=days), quantity=10, allocated=allocated)
+            for days, allocated in ((5, 0), (40, 10), (40, 2), (200, 0), (400, 0))
+        ]
+        self.donation('Paracetamol 500mg', today + timedelta(days=10), approval=Donation.ApprovalStatus.PENDING)
+        self.donation('Paracetamol 500mg', today - timedelta(days=1))
+        self.donation('Paracetamol 500mg', today + timedelta(days=10), quantity=0)
+        self.donation('Ibuprofen 200mg', today + timedelta(days=10))
+
+    def donation(self, name, expiry_date, quantity=10, allocated=0, approval=Donation.ApprovalStatus.APPROVED):
+        donation = Donation.objects.create(name=name, quantity=quantity, expiry_date=expiry_date, approval_status=approval)
+        Donation.objects.filter(pk=donation.pk).update(allocated_qty=allocated)
+        return donation
+
+    def params(self, query='paracetamol', **filters):
+        return SearchParams({'q': query, **filters})
+
+    def all_pages(self, params, limit=2):
+        ids, after = [], None
+        while True:
+            page, total, _ = search_page(params, after, limit)
+            ids.extend(donation.pk for donation in page)
+            if not page.has_next:
+                return ids, total
+            after = page.next_cursor
+
+    def test_approved_unexpired_donations_with_units_soonest_first(self):
+        ids, total = self.all_pages(self.params())
+        self.assertEqual(ids, [donation.pk for donation in self.expected])
+        self.assertEqual(total, 5)
+
+    @override_settings(SEARCH_RESULT_CACHE_MAX_IDS=3)
+    def test_pages_past_the_cached_ids_continue_from_the_database(self):
+        ids, total = self.all_pages(self.params())
+        self.assertEqual(ids, [donation.pk for donation in self.expected])
+        self.assertEqual(total, 5)
+
+    def test_repeated_search_is_one_query(self):
+        search_page(self.params(), None, 24)
+        with self.assertNumQueries(1):
+            search_page(self.params(), None, 24)
+
+    def test_facets_count_the_search_without_the_chosen_facet(self):
+        params = self.params(availability='reserved')
+        page, total, facets = search_page(params, None, 24)
+        self.assertEqual([donation.pk for donation in page], [self.expected[1].pk])
+        self.assertEqual(total, 1)
+        self.assertEqual(facets['availability'], {'available': 4, 'reserved': 1})
+        self.assertEqual(facets, facet_counts(self.params().base_queryset()))
+        self.assertEqual(sum(facets['urgency'].values()), 5)
+
+    def test_invalid_date_range_is_reported_and_ignored(self):
+        params = self.params(start_date='2030-02-01', end_date='2030-01-01')
+        self.assertEqual(params.filter_error, 'Start date cannot be after end date.')
+        self.assertEqual(self.all_pages(params)[1], 5)
@@ -1,12 +1,23 @@
 from datetime import datetime, date
+import logging
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from healthbridge_app import singleflight, spelling
+from healthbridge_app.events import log_event
 from healthbridge_app.models import GenericMedicine
+from healthbridge_app.ratelimit import json_too_many_requests, ratelimit, user_or_ip
+from healthbridge_app.pagination import link_pages, page_size, paginate, status_counts
+from notifications.models import MedicineSubscription
+from notifications.subscriptions import normalize
 from .models import Donation
+from .search import SearchParams, facet_groups, search_page
+
+# Columns the donation list renders; notes and rejection_reason stay in the database
+LIST_FIELDS = ['name', 'tracking_code', 'quantity', 'expiry_date', 'status', 'image', 'donated_at']
 
 
 @login_required
@@ -65,9 +76,19 @@ def donate_medicine(request):
 
 @login_required
 def my_donations(request):
-    """View all donations made by the current user"""
-    items = Donation.objects.filter(donor=request.user).order_by("-donated_at")
-    return render(request, "donations/track_requests_list.html", {"items": items})
+    """View the current user's donations, newest first, a page at a time"""
+    donations = Donation.objects.filter(donor=request.user)
+    page = paginate(request, donations.only(*LIST_FIELDS), 'donated_at')
+    for donation in page:
+        # Built from the stored path; the template never touches the FieldFile
+        donation.image_url = default_storage.url(donation.image.name) if donation.image else None
+    return render(request, "donations/track_requests_list.html", {
+        "items": page,
+        "page": page,
+        "status_counts": status_counts(
+            donations, Donation.Status, cache_key=f"donation-status-counts:{request.user.pk}", fresh=page.is_first,
+        ),
+    })
 
 
 @login_required
@@ -96,7 +117,7 @@ def delete_donation(request, pk):
                 messages.info(request, f'Image for "{medicine_name}" was also deleted from storage.')
             except Exception as e:
                 # Log error but don't fail the deletion
-                print(f"Error deleting image from Supabase: {str(e)}")
+                log_event('donation.image_delete_failed', level=logging.WARNING, donation_id=donation.id, error=str(e))
                 messages.warning(request, f'Donation deleted, but there was an issue removing the image.')
         elif has_requests:
             messages.info(request, f'Image preserved because someone has requested this donation.')
@@ -108,56 +129,38 @@ def delete_donation(request, pk):
     return render(request, 'donations/confirm_delete_donation.html', {'donation': donation})
 
 
+@ratelimit('search', key=user_or_ip)
 def medicine_search(request):
-    """Search for available medicines with expiry date range filter"""
-    query = request.GET.get('q', '').strip()
-    start_date = request.GET.get('start_date', '').strip()
-    end_date = request.GET.get('end_date', '').strip()
-    
-    medicines = Donation.objects.all()
-    filter_message = None
-    filter_error = None
+    """Search approved, unexpired medicines with expiry filters, facet counts and a page of results"""
+    params = SearchParams(request.GET)
+    page, total, facets = search_page(params, request.GET.get('after'), page_size(request))
+    link_pages(request, page)
+    for medicine in page:
+        medicine.image_url = default_storage.url(medicine.image.name) if medicine.image else None
 
-    # Apply name search
-    if query:
-        medicines = medicines.filter(name__icontains=query)
+    # Offer a spelling correction when a name search finds nothing
+    did_you_mean = spelling.suggest(params.query) if params.query and not total else None
 
-    # Apply expiry date range filter
-    if start_date or end_date:
-        try:
-            if start_date and end_date:
-                start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                
-                if start > end:
-                    filter_error = "Start date cannot be after end date."
-                else:
-                    medicines = medicines.filter(expiry_date__range=[start, end])
-                    filter_message = f"Showing medicines expiring between {start_date} and {end_date}"
-            
-            elif start_date:
-                start = datetime.strptime(start_date, '%Y-%m-%d').date()
-                medicines = medicines.filter(expiry_date__gte=start)
-                filter_message = f"Showing medicines expiring from {start_date} onwards"
-            
-            elif end_date:
-                end = datetime.strptime(end_date, '%Y-%m-%d').date()
-                medicines = medicines.filter(expiry_date__lte=end)
-                filter_message = f"Showing medicines expiring up to {end_date}"
-                
-        except ValueError:
-            filter_error = "Invalid date format. Please use YYYY-MM-DD."
+    # Offer recipients an alert for the medicine they searched for
+    subscription = None
+    if params.query and request.user.is_authenticated:
+        subscription = MedicineSubscription.objects.filter(user=request.user, normalized=normalize(params.query)).first()
 
     return render(request, 'donations/medicine_search.html', {
-        'medicines': medicines,
-        'query': query,
-        'start_date': start_date,
-        'end_date': end_date,
-        'filter_message': filter_message,
-        'filter_error': filter_error,
+        'medicines': page,
+        'total': total,
+        'facets': facet_groups(request.GET, params, facets),
+        'query': params.query,
+        'did_you_mean': did_you_mean,
+        'subscription': subscription,
+        'start_date': params.start_date,
+        'end_date': params.end_date,
+        'filter_message': params.filter_message,
+        'filter_error': params.filter_error,
     })
 
 
+@ratelimit('autocomplete', response=json_too_many_requests)
 def medicine_autocomplete(request):
     """API endpoint for medicine name autocomplete suggestions with caching"""
     query = request.GET.get('q', '').strip().lower()
@@ -166,12 +169,16 @@ def medicine_autocomplete(request):
     if not query or len(query) < 2:
         return JsonResponse({'suggestions': []})
     
-    # Try to get from cache first (cache for 5 minutes)
-    cache_key = f'autocomplete_{query}'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return JsonResponse({'suggestions': cached_result})
-    
+    # Cached for 5 minutes; concurrent misses for the same prefix share one lookup
+    return autocomplete_response(query, autocomplete_suggestions(query))
+
+
+def autocomplete_suggestions(query):
+    """Up to 10 donation and generic medicine names containing query, cached"""
+    return singleflight.cached(f'autocomplete:{query}', lambda: lookup_suggestions(query), 300)
+
+
+def lookup_suggestions(query):
     # Get unique medicine names from donations
     donation_medicines = Donation.objects.filter(
         name__icontains=query
@@ -184,12 +191,15 @@ def medicine_autocomplete(request):
     
     # Combine and deduplicate
     all_medicines = list(set(list(donation_medicines) + list(generic_medicines)))
-    suggestions = sorted(all_medicines)[:10]  # Limit to 10 suggestions
-    
-    # Cache the result for 5 minutes (300 seconds)
-    cache.set(cache_key, suggestions, 300)
-    
-    return JsonResponse({'suggestions': suggestions})
+    return sorted(all_medicines)[:10]  # Limit to 10 suggestions
+
+
+def autocomplete_response(query, suggestions):
+    """Autocomplete JSON, with a spelling correction when nothing matched"""
+    response = {'suggestions': suggestions}
+    if not suggestions:
+        response['did_you_mean'] = spelling.suggest(query)
+    return JsonResponse(response)
 
 
 @login_required
@@ -208,7 +218,7 @@ def delete_donation(request, donation_id):
                 try:
                     donation.image.delete(save=False)
                 except Exception as e:
-                    print(f"Error deleting image from Supabase: {str(e)}")
+                    log_event('donation.image_delete_failed', level=logging.WARNING, donation_id=donation.id, error=str(e))
             
             donation.delete()
             return JsonResponse({'success': True, 'message': f'Donation "{medicine_name}" deleted successfully'})
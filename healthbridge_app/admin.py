@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import CustomUser, GenericMedicine, BrandMedicine
+from .models import CustomUser, GenericMedicine, BrandMedicine, JobState
 
 # NOTE: Donation, ExpiryAlert, and MedicineRequest are now registered in their
 # respective modular apps (donations/admin.py and requests/admin.py)
@@ -122,6 +122,12 @@ admin.site.register(CustomUser, UserAdmin)
 admin.site.register(GenericMedicine)
 admin.site.register(BrandMedicine)
 
+
+@admin.register(JobState)
+class JobStateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_run_at', 'last_success_at', 'last_duration', 'locked_by', 'locked_until']
+    readonly_fields = ['last_run_at', 'last_success_at', 'last_duration', 'last_error', 'locked_by', 'locked_until']
+
 """
 @admin.register(MedicineRequest)
 class MedicineRequestAdmin(admin.ModelAdmin):
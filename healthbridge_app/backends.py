@@ -1,7 +1,10 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
 import logging
 
+from .usercache import get_cached_user
+
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
@@ -11,14 +14,15 @@ class EmailBackend(ModelBackend):
             return None
         
         try:
-            # Normalize email and handle whitespace
-            email = email.strip().lower()
-            user = User.objects.get(email__iexact=email)
+            # Emails are stored lowercase (CustomUserManager), so an exact match uses the unique index
+            email = User.objects.normalize_email(email)
+            user = User.objects.get(email=email)
         except User.DoesNotExist:
             # Run the default password hasher to reduce timing attacks
             User().set_password(password)
             logger.warning(f"Authentication failed: User not found for email {email}")
-            return None
+            # ModelBackend would look the email up and hash the password again
+            raise PermissionDenied
         except Exception as e:
             logger.error(f"Error during authentication: {str(e)}")
             return None
@@ -30,4 +34,8 @@ class EmailBackend(ModelBackend):
             logger.error(f"Error checking password for user {email}: {str(e)}")
             return None
         
-        return None
\ No newline at end of file
+        raise PermissionDenied  # wrong password: don't let ModelBackend check it a second time
+
+    def get_user(self, user_id):
+        # Called by AuthenticationMiddleware on every request; served from the cache (healthbridge_app.usercache)
+        return get_cached_user(user_id, super().get_user)
@@ -0,0 +1,141 @@
+"""
+Chunked batch processing for management commands
+
+run_batches() walks a queryset in primary-key order, chunk_size rows at a
+time (keyset pagination: WHERE pk > last ORDER BY pk LIMIT n, so every chunk
+is an index range scan and memory stays flat however large the table). Each
+chunk is handed to a callback inside its own transaction, together with a
+checkpoint in JobState, so an interrupted run continues where it stopped with
+resume=True. map_io() fans I/O-bound work (storage uploads and deletes, HTTP
+calls) out to a small thread pool; database writes stay in the caller.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import JobState
+
+
+def iterate_chunks(queryset, chunk_size=500, start_after=None):
+    """Yield lists of model instances in primary-key order, chunk_size at a time"""
+    queryset = queryset.order_by('pk')
+    last_pk = start_after
+    while True:
+        page = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        chunk = list(page[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        last_pk = chunk[-1].pk
+
+
+def map_io(func, items, workers=4):
+    """
+    Call func(item) for every item on up to `workers` threads.
+    Returns [(item, result, error)] in input order; errors are caught per item.
+    """
+    def call(item):
+        try:
+            return item, func(item), None
+        except Exception as e:
+            return item, None, e
+
+    if workers <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+    with ThreadPoolExecutor(max_workers=min(workers, len(items))) as pool:
+        return list(pool.map(call, items))
+
+
+class Progress:
+    """Prints 'label: done/total (pct) rows/s ETA' at most every `interval` seconds"""
+
+    def __init__(self, label, total, stdout=None, interval=5.0, done=0):
+        self.label = label
+        self.total = total
+        self.stdout = stdout
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.first = done  # rows already done by a resumed run don't count towards the rate
+        self.last_report = self.started
+
+    def update(self, done, final=False):
+        now = time.perf_counter()
+        if self.stdout is None or (not final and now - self.last_report < self.interval):
+            return
+        self.last_report = now
+        elapsed = now - self.started
+        rate = (done - self.first) / elapsed if elapsed else 0.0
+        line = f"{self.label}: {done}/{self.total}"
+        if self.total:
+            line += f" ({done / self.total:.0%})"
+        line += f" {rate:,.0f} rows/s"
+        if final:
+            line += f" in {elapsed:.1f}s"
+        elif rate and self.total > done:
+            line += f" ETA {(self.total - done) / rate:.0f}s"
+        self.stdout.write(line)
+
+
+class BatchResult:
+    def __init__(self, processed, chunks, elapsed, resumed_from=None):
+        self.processed = processed
+        self.chunks = chunks
+        self.elapsed = elapsed
+        self.resumed_from = resumed_from
+
+
+def run_batches(queryset, process_chunk, name=None, chunk_size=500, resume=False, atomic=True,
+                stdout=None, label=None):
+    """
+    Run process_chunk(rows) over `queryset` in keyset-ordered chunks.
+
+    With a `name`, progress is checkpointed in the JobState row of that name
+    after every chunk (in the chunk's transaction); resume=True starts after
+    the last checkpointed primary key instead of from the beginning. The
+    checkpoint is cleared when the run completes.
+    """
+    state = None
+    start_after = None
+    processed = 0
+    if name:
+        state, _ = JobState.objects.get_or_create(name=name)
+        if resume and state.checkpoint.get('last_pk') is not None:
+            start_after = state.checkpoint['last_pk']
+            processed = state.checkpoint.get('processed', 0)
+            if stdout is not None:
+                stdout.write(f"Resuming {name} after pk {start_after} ({processed} rows already done)")
+
+    remaining = queryset if start_after is None else queryset.filter(pk__gt=start_after)
+    progress = Progress(label or name or 'batch', processed + remaining.count(), stdout, done=processed)
+    started = timezone.now()
+    start = time.perf_counter()
+    chunks = 0
+    try:
+        for chunk in iterate_chunks(queryset, chunk_size, start_after):
+            with transaction.atomic() if atomic else nullcontext():
+                process_chunk(chunk)
+                processed += len(chunk)
+                if state is not None:
+                    state.checkpoint = {'last_pk': chunk[-1].pk, 'processed': processed}
+                    state.save(update_fields=['checkpoint'])
+            chunks += 1
+            progress.update(processed)
+    except Exception as e:
+        if state is not None:
+            JobState.objects.filter(pk=state.pk).update(last_run_at=started, last_error=repr(e))
+        raise
+
+    elapsed = time.perf_counter() - start
+    if state is not None:
+        state.checkpoint = {}
+        state.last_run_at = state.last_success_at = started
+        state.last_duration = elapsed
+        state.last_error = ''
+        state.save()
+    progress.update(processed, final=True)
+    return BatchResult(processed, chunks, elapsed, resumed_from=start_after)
@@ -0,0 +1,199 @@
+"""
+Donation / MedicineRequest consistency invariants
+
+Every invariant is one query that selects the rows breaking it, and (where
+the right state can be derived) one bulk UPDATE that repairs them, so a check
+costs a handful of index scans and a repair never loads rows into Python or
+fires the post_save expiry signal. Used by ``manage.py consistency_check``.
+
+The lifecycle they encode (requests/views.py, requests/reservations.py):
+  * create_request allocates part of a donation to a MATCHED request and
+    Donation.allocated_qty is the sum of the ACTIVE allocations;
+  * a donation is RESERVED when everything it has left is allocated,
+    DELIVERED when nothing is left and AVAILABLE otherwise;
+  * delivery subtracts the allocation from quantity and allocated_qty;
+    cancelling, rejecting or the reservation lapsing releases it.
+
+Repairs run in list order: the ledger is fixed before the statuses derived
+from it, status repairs clear next_alert_on on the rows they touch and
+missing_alert_schedule, last, schedules alerts again for the donations that
+ended up in stock.
+"""
+import time
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from donations.models import ALERTABLE_STATUSES, Donation
+from requests.models import Allocation, MedicineRequest
+
+from .events import log_event
+from .scheduler import notify_scheduler
+
+OPEN_REQUEST_STATUSES = [MedicineRequest.Status.PENDING, MedicineRequest.Status.MATCHED]
+
+
+def active_allocations():
+    return Allocation.objects.filter(state=Allocation.State.ACTIVE)
+
+
+def allocated_total():
+    """Subquery: the ACTIVE allocation total of the outer donation"""
+    totals = active_allocations().filter(donation=OuterRef('pk')).order_by().values('donation')
+    return Coalesce(Subquery(totals.annotate(total=Sum('quantity')).values('total')), 0)
+
+
+def set_donation_status(queryset, status):
+    return queryset.update(status=status, next_alert_on=None, last_update=timezone.now())
+
+
+class Invariant:
+    """A named rule: violations() selects the offending rows, repair(violations) fixes them (None: report only)"""
+
+    def __init__(self, name, description, violations, repair=None):
+        self.name = name
+        self.description = description
+        self.violations = violations
+        self.repair = repair
+
+
+class CheckResult:
+    def __init__(self, invariant, violations, check_time, repaired=None, repair_time=None):
+        self.invariant = invariant
+        self.violations = violations
+        self.check_time = check_time
+        self.repaired = repaired
+        self.repair_time = repair_time
+
+
+INVARIANTS = [
+    Invariant(
+        'closed_request_allocation',
+        'Active allocations held by a request that is fulfilled, claimed or cancelled',
+        lambda: active_allocations().exclude(request__status__in=OPEN_REQUEST_STATUSES),
+        lambda qs: qs.update(state=Allocation.State.RELEASED, updated_at=timezone.now()),
+    ),
+    Invariant(
+        'allocated_qty_mismatch',
+        'Donations whose allocated_qty differs from the sum of their active allocations',
+        lambda: Donation.objects.alias(ledger=allocated_total()).exclude(allocated_qty=F('ledger')),
+        lambda qs: qs.update(allocated_qty=allocated_total(), last_update=timezone.now()),
+    ),
+    Invariant(
+        'over_allocated',
+        'Donations with more units allocated than they have (needs a person to decide)',
+        lambda: Donation.objects.filter(allocated_qty__gt=F('quantity'), status__in=ALERTABLE_STATUSES),
+    ),
+    Invariant(
+        'delivered_with_stock',
+        'Delivered donations that still have quantity left',
+        lambda: Donation.objects.filter(status=Donation.Status.DELIVERED, quantity__gt=0),
+        lambda qs: set_donation_status(qs, Donation.Status.AVAILABLE),
+    ),
+    Invariant(
+        'in_stock_without_quantity',
+        'Available or reserved donations with quantity 0',
+        lambda: Donation.objects.filter(status__in=ALERTABLE_STATUSES, quantity=0),
+        lambda qs: set_donation_status(qs, Donation.Status.DELIVERED),
+    ),
+    Invariant(
+        'reserved_with_free_units',
+        'Reserved donations with units nobody has allocated',
+        lambda: Donation.objects.filter(status=Donation.Status.RESERVED, allocated_qty__lt=F('quantity')),
+        lambda qs: qs.update(status=Donation.Status.AVAILABLE, last_update=timezone.now()),
+    ),
+    Invariant(
+        'available_fully_allocated',
+        'Available donations whose every unit is allocated',
+        lambda: Donation.objects.filter(
+            status=Donation.Status.AVAILABLE, quantity__gt=0, allocated_qty__gte=F('quantity'),
+        ),
+        lambda qs: qs.update(status=Donation.Status.RESERVED, last_update=timezone.now()),
+    ),
+    Invariant(
+        'matched_without_allocation',
+        'Matched requests on a donation in stock that hold no active allocation (needs a person to decide)',
+        lambda: MedicineRequest.objects.filter(
+            ~Exists(active_allocations().filter(request=OuterRef('pk'))),
+            status=MedicineRequest.Status.MATCHED,
+            matched_donation__status__in=ALERTABLE_STATUSES,
+        ),
+    ),
+    Invariant(
+        'allocation_exceeds_request',
+        'Active allocations holding more units than their request asked for (needs a person to decide)',
+        lambda: active_allocations().filter(quantity__gt=F('request__quantity')),
+    ),
+    Invariant(
+        'open_request_without_quantity',
+        'Pending or matched requests for 0 units, e.g. legacy quantities that were not a number (needs a person to decide)',
+        lambda: MedicineRequest.objects.filter(status__in=OPEN_REQUEST_STATUSES, quantity=0),
+    ),
+    Invariant(
+        'open_request_donation_gone',
+        'Pending or matched requests on a delivered, picked-up or cancelled donation (needs a person to decide)',
+        lambda: MedicineRequest.objects.filter(
+            status__in=OPEN_REQUEST_STATUSES,
+            matched_donation__status__in=[
+                Donation.Status.DELIVERED, Donation.Status.PICKED_UP, Donation.Status.CANCELLED,
+            ],
+        ),
+    ),
+    Invariant(
+        'matched_without_donation',
+        'Matched requests whose donation was deleted',
+        lambda: MedicineRequest.objects.filter(status=MedicineRequest.Status.MATCHED, matched_donation__isnull=True),
+        lambda qs: qs.update(status=MedicineRequest.Status.PENDING, updated_at=timezone.now()),
+    ),
+    Invariant(
+        'stale_alert_schedule',
+        'Expiry alerts scheduled for donations that are out of stock or already expired',
+        lambda: Donation.objects.filter(next_alert_on__isnull=False).filter(
+            ~Q(status__in=ALERTABLE_STATUSES) | Q(expiry_date__lt=date.today())
+        ),
+        lambda qs: qs.update(next_alert_on=None),
+    ),
+    Invariant(
+        'missing_alert_schedule',
+        'Donations in stock, expiring after today, with no expiry alert scheduled',
+        lambda: Donation.objects.filter(
+            status__in=ALERTABLE_STATUSES, expiry_date__gt=date.today(), next_alert_on__isnull=True,
+        ),
+        lambda qs: Donation.objects.schedule_alerts(qs),
+    ),
+]
+
+
+def get_invariants(names=None):
+    if not names:
+        return list(INVARIANTS)
+    known = {invariant.name: invariant for invariant in INVARIANTS}
+    unknown = sorted(set(names) - set(known))
+    if unknown:
+        raise KeyError(', '.join(unknown))
+    return [invariant for invariant in INVARIANTS if invariant.name in names]
+
+
+def run_checks(invariants=None, repair=False):
+    """
+    Count the violations of each invariant and, with repair=True, fix the
+    repairable ones, each in its own transaction. Returns [CheckResult].
+    """
+    results = []
+    for invariant in invariants or INVARIANTS:
+        start = time.perf_counter()
+        violations = invariant.violations().count()
+        result = CheckResult(invariant, violations, time.perf_counter() - start)
+        if repair and violations and invariant.repair is not None:
+            start = time.perf_counter()
+            with transaction.atomic():
+                result.repaired = invariant.repair(invariant.violations())
+            result.repair_time = time.perf_counter() - start
+            log_event('consistency.repaired', invariant=invariant.name, rows=result.repaired)
+        results.append(result)
+    if any(result.repaired for result in results):
+        notify_scheduler()  # alerts were rescheduled without save()
+    return results
@@ -0,0 +1,110 @@
+"""
+Structured event log for hot request paths
+
+``log_event('request.created', request_id=5, donation_id=9)`` emits one JSON
+line on the ``healthbridge_app.events`` logger. Records are handed to
+AsyncQueueHandler, which only enqueues them; formatting and the write to
+stdout happen on a QueueListener thread, so a slow stdout pipe never stalls a
+gunicorn worker. Debug events are sampled (EVENT_LOG_DEBUG_SAMPLE_RATE) and
+are dropped before a LogRecord is even built.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+event_logger = logging.getLogger('healthbridge_app.events')
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+# Keys JSONFormatter writes itself; fields with these names are renamed field_<name>
+RESERVED_KEYS = {'ts', 'level', 'logger', 'event', 'exc'}
+
+
+def log_event(event, level=logging.INFO, exc_info=False, **fields):
+    """Emit a structured event; DEBUG events are sampled"""
+    if level <= logging.DEBUG:
+        rate = getattr(settings, 'EVENT_LOG_DEBUG_SAMPLE_RATE', 0.01)
+        if rate < 1 and random.random() >= rate:
+            return
+    if not event_logger.isEnabledFor(level):
+        return
+    event_logger.log(level, event, exc_info=exc_info, extra={'event_fields': fields})
+
+
+class JSONFormatter(logging.Formatter):
+    """Render a record as a single JSON object per line"""
+
+    def format(self, record):
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        fields = getattr(record, 'event_fields', None)
+        if not fields:
+            # Plain logger calls with ``extra=...`` still get their fields out
+            fields = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+        for key, value in fields.items():
+            # A field named like one of ours (ts=..., logger=...) must not overwrite it
+            payload[f"field_{key}" if key in RESERVED_KEYS else key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Block rather than fail if the queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Non-blocking handler: enqueue on the caller's thread, write on a listener thread.
+
+    The queue is bounded; when the writer cannot keep up, new records are
+    dropped (and counted) rather than blocking the request.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize=maxsize))
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.target.setFormatter(JSONFormatter())
+        self.listener = None
+        self._start_listener()
+        atexit.register(self.stop)
+        # Listener threads do not survive fork (e.g. gunicorn --preload)
+        os.register_at_fork(after_in_child=self._restart_after_fork)
+
+    def _restart_after_fork(self):
+        if self.listener is not None:
+            self._start_listener()
+
+    def _start_listener(self):
+        self.listener = _Listener(self.queue, self.target, respect_handler_level=False)
+        self.listener.start()
+
+    def prepare(self, record):
+        # Formatting is the listener's job; keep the caller's cost to a put()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
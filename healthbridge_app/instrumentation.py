@@ -0,0 +1,181 @@
+"""
+Per-request database and latency instrumentation
+
+QueryInstrumentationMiddleware hooks every database connection with
+``connection.execute_wrapper`` for the duration of a request and records, per
+view name: query count, total SQL time, the slowest statements and the view
+wall time. Each sample is
+
+- emitted as a ``Server-Timing`` response header (to staff only, unless
+  QUERY_INSTRUMENTATION_SERVER_TIMING: it exposes SQL timings to the client),
+- written as one structured log line on the ``healthbridge_app.instrumentation`` logger,
+- kept in an in-process ring buffer served by the admin metrics endpoint.
+
+Statements are reduced to their "shape" (literals and placeholder lists
+collapsed) so that a view running the same query once per row is flagged as a
+likely N+1.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def sql_shape(sql):
+    """Normalize a statement so repeated queries with different values compare equal"""
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = shape.replace('%s', '?')
+    shape = _PLACEHOLDER_LIST.sub('(?...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable that accumulates statistics for one request"""
+
+    def __init__(self, slow_limit=3):
+        self.slow_limit = slow_limit
+        self.count = 0
+        self.total = 0.0
+        self.slowest = []  # min-heap of (duration, sql)
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            self.shapes[sql_shape(sql)] += 1
+            entry = (duration, sql)
+            if len(self.slowest) < self.slow_limit:
+                heapq.heappush(self.slowest, entry)
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def repeated_shapes(self, threshold):
+        """Statement shapes executed at least ``threshold`` times (N+1 suspects)"""
+        return [
+            {'sql': shape, 'count': count}
+            for shape, count in self.shapes.most_common()
+            if count >= threshold
+        ]
+
+
+class MetricsBuffer:
+    """Thread-safe ring buffer of recent request samples"""
+
+    def __init__(self, size):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, sample):
+        with self._lock:
+            self._samples.append(sample)
+
+    def samples(self):
+        with self._lock:
+            return list(self._samples)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self):
+        """Aggregate the buffered samples per view name"""
+        by_view = {}
+        for sample in self.samples():
+            by_view.setdefault(sample['view'], []).append(sample)
+
+        views = []
+        for view, samples in by_view.items():
+            wall = sorted(s['wall_ms'] for s in samples)
+            views.append({
+                'view': view,
+                'requests': len(samples),
+                'avg_wall_ms': round(sum(wall) / len(wall), 2),
+                'p95_wall_ms': wall[min(len(wall) - 1, int(len(wall) * 0.95))],
+                'avg_queries': round(sum(s['queries'] for s in samples) / len(samples), 2),
+                'max_queries': max(s['queries'] for s in samples),
+                'avg_sql_ms': round(sum(s['sql_ms'] for s in samples) / len(samples), 2),
+                'n_plus_one_requests': sum(1 for s in samples if s['n_plus_one']),
+            })
+        views.sort(key=lambda v: v['avg_wall_ms'] * v['requests'], reverse=True)
+        return views
+
+
+metrics_buffer = MetricsBuffer(getattr(settings, 'QUERY_INSTRUMENTATION_BUFFER_SIZE', 500))
+
+
+class QueryInstrumentationMiddleware:
+    """Record query count, SQL time and wall time for every request"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'QUERY_INSTRUMENTATION_ENABLED', settings.DEBUG)
+        self.public_timing = getattr(settings, 'QUERY_INSTRUMENTATION_SERVER_TIMING', settings.DEBUG)
+        self.slow_limit = getattr(settings, 'QUERY_INSTRUMENTATION_SLOW_QUERIES', 3)
+        self.n_plus_one_threshold = getattr(settings, 'QUERY_INSTRUMENTATION_N_PLUS_ONE_THRESHOLD', 5)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(slow_limit=self.slow_limit)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        sample = {
+            'view': match.view_name if match else request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'timestamp': time.time(),
+            'wall_ms': round(wall_ms, 2),
+            'queries': recorder.count,
+            'sql_ms': round(recorder.total * 1000, 2),
+            'slowest': [
+                {'ms': round(duration * 1000, 2), 'sql': sql}
+                for duration, sql in sorted(recorder.slowest, reverse=True)
+            ],
+            'n_plus_one': recorder.repeated_shapes(self.n_plus_one_threshold),
+        }
+        metrics_buffer.record(sample)
+
+        user = getattr(request, 'user', None)
+        if self.public_timing or (user is not None and user.is_staff):
+            response['Server-Timing'] = (
+                f'db;dur={sample["sql_ms"]};desc="{sample["queries"]} queries", '
+                f'app;dur={sample["wall_ms"]}'
+            )
+
+        logger.info(
+            'request view=%s method=%s status=%s wall_ms=%s queries=%s sql_ms=%s',
+            sample['view'], sample['method'], sample['status'],
+            sample['wall_ms'], sample['queries'], sample['sql_ms'],
+        )
+        for suspect in sample['n_plus_one']:
+            logger.warning(
+                'possible N+1 in view=%s: %s queries with shape %s',
+                sample['view'], suspect['count'], suspect['sql'],
+            )
+        return response
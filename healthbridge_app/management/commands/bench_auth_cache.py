@@ -0,0 +1,80 @@
+"""
+Count the queries authentication costs per request, with and without caching.
+Usage: python manage.py bench_auth_cache --requests 200
+
+Signs a user in and polls the notification bell (/notifications/api/unread-count/,
+one query of its own) with database sessions and no user cache, then with
+cached_db sessions and the per-user cache (healthbridge_app.usercache).
+Reports queries and latency per request. That profile edits and password
+changes are seen through the cache is checked in healthbridge_app/tests.py.
+The user and its sessions are deleted afterwards.
+"""
+import statistics
+import time
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from healthbridge_app.instrumentation import QueryRecorder
+
+User = get_user_model()
+
+PASSWORD = 'correct horse 1'
+BELL = '/notifications/api/unread-count/'
+
+
+class Command(BaseCommand):
+    help = 'Show the auth queries saved by cached_db sessions and the per-user cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Bell polls per configuration (default: 200)')
+
+    def handle(self, *args, **options):
+        tag = uuid4().hex[:6]
+        user = User.objects.create_user(
+            username=f"authcache-{tag}", email=f"authcache-{tag}@example.test", password=PASSWORD,
+            first_name='Before', last_name='Bench', user_type=User.UserType.RECIPIENT, role_selected=True,
+        )
+        clients = []
+        try:
+            with override_settings(RATELIMIT_ENABLED=False):
+                for engine, seconds in (('django.contrib.sessions.backends.db', 0),
+                                        ('django.contrib.sessions.backends.cached_db', 300)):
+                    with override_settings(SESSION_ENGINE=engine, AUTH_USER_CACHE_SECONDS=seconds):
+                        clients.append(self.poll(user, engine.rsplit('.', 1)[-1], seconds, options['requests']))
+        finally:
+            keys = [c.session.session_key for c in clients if c.session.session_key]
+            Session.objects.filter(session_key__in=keys).delete()
+            user.delete()
+
+    def signed_in(self, user, password=PASSWORD):
+        client = Client()
+        if not client.login(email=user.email, password=password):
+            raise CommandError(f"Could not sign in as {user.email}")
+        return client
+
+    def poll(self, user, engine, seconds, n):
+        cache.clear()
+        client = self.signed_in(user)
+        client.get(BELL)  # warm: the first request loads session and user either way
+        recorder = QueryRecorder()
+        latencies = []
+        with connection.execute_wrapper(recorder):
+            for _ in range(n):
+                start = time.perf_counter()
+                response = client.get(BELL)
+                latencies.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f"{BELL} answered {response.status_code}")
+        latencies.sort()
+        self.stdout.write(
+            f"{engine:<10} user cache {'on ' if seconds else 'off'}  {recorder.count / n:4.2f} queries/request  "
+            f"p50 {statistics.median(latencies):6.2f} ms  p95 {latencies[int(n * 0.95) - 1]:6.2f} ms"
+        )
+        return client
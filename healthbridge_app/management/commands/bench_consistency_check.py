@@ -0,0 +1,78 @@
+"""
+Time consistency_check against the current database.
+Usage:
+    python manage.py seed_scale --users 100000 --donations 1000000
+    python manage.py bench_consistency_check --violations 1000
+
+Inside a transaction that is rolled back at the end, breaks `--violations`
+rows for each repairable kind of inconsistency (a request marked fulfilled
+whose allocation is still active, allocated_qty drifting from the ledger,
+stock left on a delivered donation, ...), then times the full check, the
+bulk repair and a second check that should find nothing.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from donations.models import Donation
+from healthbridge_app.consistency import run_checks
+from requests.models import MedicineRequest
+
+
+class Rollback(Exception):
+    pass
+
+
+def sample(queryset, n):
+    return queryset.model.objects.filter(pk__in=list(queryset.order_by('?').values_list('pk', flat=True)[:n]))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the set-based consistency check and repair on the seeded dataset'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--violations', type=int, default=1000, help='Rows broken per kind (default: 1000)')
+
+    def handle(self, *args, **options):
+        donations = Donation.objects.count()
+        if not donations:
+            raise CommandError('No donations to check; run seed_scale first')
+        self.stdout.write(f"{donations} donations, {MedicineRequest.objects.count()} requests")
+
+        try:
+            with transaction.atomic():
+                broken = self.break_rows(options['violations'])
+                self.stdout.write(f"Broke {broken} rows\n")
+                for label, repair in (('check', False), ('fix', True), ('re-check', False)):
+                    start = time.perf_counter()
+                    results = run_checks(repair=repair)
+                    elapsed = time.perf_counter() - start
+                    found = sum(r.violations for r in results)
+                    repaired = sum(r.repaired or 0 for r in results)
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{label:<9} {elapsed:7.2f}s  {found} violations"
+                        + (f", {repaired} rows repaired" if repair else '')
+                    ))
+                    for r in results:
+                        line = f"  {r.invariant.name:<30} {r.violations:>7}  {r.check_time * 1000:9.1f} ms"
+                        if r.repair_time is not None:
+                            line += f"  repair {r.repair_time * 1000:9.1f} ms"
+                        self.stdout.write(line)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def break_rows(self, n):
+        matched = MedicineRequest.objects.filter(status=MedicineRequest.Status.MATCHED)
+        broken = 0
+        # Delivery recorded on the request only, allocation still active
+        broken += sample(matched, n).update(status=MedicineRequest.Status.FULFILLED)
+        # Ledger total drifting from the allocations
+        broken += sample(Donation.objects.filter(allocated_qty__gt=0), n).update(allocated_qty=F('allocated_qty') - 1)
+        broken += sample(Donation.objects.filter(status=Donation.Status.DELIVERED), n).update(quantity=5)
+        broken += sample(Donation.objects.filter(status=Donation.Status.AVAILABLE), n).update(
+            status=Donation.Status.RESERVED
+        )
+        return broken
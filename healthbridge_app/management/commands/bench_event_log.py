@@ -0,0 +1,108 @@
+"""
+Microbenchmark for the structured event log.
+Usage: python manage.py bench_event_log --iterations 20000
+
+Compares the per-request logging cost of the old create_request print()
+debugging against log_event() through AsyncQueueHandler. Both write into an OS
+pipe drained by a reader thread, which is how gunicorn workers see stdout.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from healthbridge_app.events import AsyncQueueHandler, event_logger, log_event
+
+
+class PipeSink:
+    """An OS pipe whose read end is drained by a (optionally slow) thread"""
+
+    def __init__(self, reader_delay):
+        read_fd, write_fd = os.pipe()
+        self.reader = os.fdopen(read_fd, 'rb', buffering=0)
+        self.writer = os.fdopen(write_fd, 'w', buffering=1)
+        self.reader_delay = reader_delay
+        self.thread = threading.Thread(target=self._drain, daemon=True)
+        self.thread.start()
+
+    def _drain(self):
+        while self.reader.read(65536):
+            if self.reader_delay:
+                time.sleep(self.reader_delay)
+
+    def close(self):
+        self.writer.close()
+        self.thread.join()
+        self.reader.close()
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request logging overhead of print() and the structured event log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='Simulated requests (default: 20000)')
+        parser.add_argument(
+            '--reader-delay-ms',
+            type=float,
+            default=0.0,
+            help='Delay after each pipe read, to simulate a slow log collector (default: 0)'
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        delay = options['reader_delay_ms'] / 1000
+
+        before = self.run_print(iterations, delay)
+        after = self.run_events(iterations, delay)
+
+        self.stdout.write(f"Simulated create_request calls: {iterations}")
+        self.stdout.write(f"  print() debugging:  {before:8.2f} us/request")
+        self.stdout.write(f"  log_event() queue:  {after:8.2f} us/request")
+        if after:
+            self.stdout.write(self.style.SUCCESS(f"  Speedup: {before / after:.1f}x"))
+
+    def run_print(self, iterations, delay):
+        """The eight print() lines create_request used to emit per call"""
+        sink = PipeSink(delay)
+        out = sink.writer
+        start = time.perf_counter()
+        for i in range(iterations):
+            print("=== CREATE REQUEST DEBUG ===", file=out)
+            print("Medicine: Paracetamol", file=out)
+            print("Quantity: 10", file=out)
+            print("Urgency: medium", file=out)
+            print(f"Donation ID received: {i}", file=out)
+            print(f"Found donation: ID={i}, Name=Paracetamol, Donor=donor, Current Qty: 50", file=out)
+            print("Donation marked as RESERVED - quantity will be subtracted when claimed", file=out)
+            print(f"Request created: ID={i}, Status=matched, Matched Donation={i}", file=out)
+        elapsed = time.perf_counter() - start
+        sink.close()
+        return elapsed / iterations * 1e6
+
+    def run_events(self, iterations, delay):
+        """One sampled debug event plus one info event, as create_request emits now"""
+        sink = PipeSink(delay)
+        handler = AsyncQueueHandler(stream=sink.writer)
+        saved = event_logger.handlers[:], event_logger.level, event_logger.propagate
+        event_logger.handlers = [handler]
+        event_logger.setLevel(logging.DEBUG)
+        event_logger.propagate = False
+        try:
+            start = time.perf_counter()
+            for i in range(iterations):
+                log_event(
+                    'request.create.received', level=logging.DEBUG,
+                    medicine='Paracetamol', quantity='10', urgency='medium', donation_id=i,
+                )
+                log_event('request.created', request_id=i, status='matched', donation_id=i, user_id=1)
+            elapsed = time.perf_counter() - start
+        finally:
+            handler.stop()
+            event_logger.handlers, level, event_logger.propagate = saved
+            event_logger.setLevel(level)
+            sink.close()
+        if handler.dropped:
+            self.stdout.write(self.style.WARNING(f"  Event queue dropped {handler.dropped} records"))
+        return elapsed / iterations * 1e6
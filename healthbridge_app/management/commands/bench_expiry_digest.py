@@ -0,0 +1,94 @@
+"""
+Compare per-donation expiry emails with per-recipient digests.
+Usage: python manage.py bench_expiry_digest --donors 200 --donations 5000 --skew 1.2
+
+Inside a transaction that is rolled back at the end, generates donors whose
+near-expiry donation counts follow a Zipf distribution (a few pharmacy-sized
+donors own most stock), then runs check_expiry in both modes and reports the
+emails queued (= email API calls), database queries and wall time of each.
+"""
+import io
+import random
+import time
+from datetime import date, timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from donations.models import Donation
+from healthbridge_app.instrumentation import QueryRecorder
+from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand
+from healthbridge_app.seeding import DatasetSeeder, MEDICINE_NAMES, zipf_weights
+from notifications.models import OutboundEmail
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark expiry alert emails: one per donation vs one digest per recipient'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=200, help='Donors (default: 200)')
+        parser.add_argument('--donations', type=int, default=5000, help='Near-expiry donations (default: 5000)')
+        parser.add_argument('--skew', type=float, default=1.2, help='Zipf exponent of donations per donor')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+
+    def handle(self, *args, **options):
+        results = {}
+        try:
+            with transaction.atomic():
+                top_share = self.generate(options)
+                for mode in ('per-donation', 'digest'):
+                    results[mode] = self.run_mode(digest=mode == 'digest')
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(
+            f"{options['donations']} expiring donations across {options['donors']} donors "
+            f"(Zipf s={options['skew']}, top donor owns {top_share:.0%})"
+        )
+        for mode, r in results.items():
+            self.stdout.write(f"  {mode:<14} {r['emails']:>6} emails  {r['queries']:>6} queries  {r['elapsed']:6.2f}s")
+        before, after = results['per-donation'], results['digest']
+        if after['emails']:
+            self.stdout.write(self.style.SUCCESS(
+                f"  API calls cut {before['emails'] / after['emails']:.1f}x, queries cut "
+                f"{before['queries'] / max(1, after['queries']):.1f}x"
+            ))
+
+    def generate(self, options):
+        rng = random.Random(options['seed'])
+        seeder = DatasetSeeder(prefix=f"digest-{uuid4().hex[:6]}", seed=options['seed'], donor_share=1.0)
+        donors, _ = seeder.seed_users(options['donors'])
+        owners = rng.choices(donors, cum_weights=zipf_weights(len(donors), s=options['skew']), k=options['donations'])
+        today = date.today()
+        Donation.objects.bulk_create([
+            Donation(
+                name=rng.choice(MEDICINE_NAMES),
+                quantity=rng.randint(1, 50),
+                expiry_date=today + timedelta(days=rng.randint(0, 10)),
+                next_alert_on=today,
+                donor=owner,
+                approval_status=Donation.ApprovalStatus.APPROVED,
+                tracking_code=uuid4().hex[:12].upper(),
+            )
+            for owner in owners
+        ], batch_size=1000)
+        return max(owners.count(d) for d in donors[:5]) / len(owners)
+
+    def run_mode(self, digest):
+        command = ExpiryCommand(stdout=io.StringIO())
+        before = OutboundEmail.objects.count()
+        with transaction.atomic():
+            recorder = QueryRecorder()
+            start = time.perf_counter()
+            with connection.execute_wrapper(recorder):
+                command.handle(days=10, dry_run=False, force=False, critical_only=False, digest=digest)
+            elapsed = time.perf_counter() - start
+            emails = OutboundEmail.objects.count() - before
+            transaction.set_rollback(True)  # each mode starts with no alerts recorded
+        return {'emails': emails, 'queries': recorder.count, 'elapsed': elapsed}
@@ -0,0 +1,109 @@
+"""
+Compare the expiry-window scan with the next_alert_on index lookup.
+Usage: python manage.py bench_expiry_scan --donations 200000 --repeat 5
+
+Inside a transaction that is rolled back at the end, bulk-creates an inventory
+whose expiry dates spread over two years, with next_alert_on in its steady
+state (every alert up to yesterday already sent), then times
+  * window scan: the donations expiring within 10 days, what check_expiry used
+    to load and re-check against ExpiryAlert every day, and
+  * alerts due: Donation.objects.alerts_due(), the donations crossing a
+    threshold today,
+and prints each query plan. The daily run itself is timed last.
+"""
+import io
+import random
+import time
+from datetime import date, timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from donations.models import Donation, next_alert_date
+from healthbridge_app.instrumentation import QueryRecorder
+from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand
+from healthbridge_app.seeding import DatasetSeeder, MEDICINE_NAMES
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the daily expiry alert scan against the next_alert_on index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donations', type=int, default=200000, help='Inventory size (default: 200000)')
+        parser.add_argument('--donors', type=int, default=100, help='Donors (default: 100)')
+        parser.add_argument('--days', type=int, default=720, help='Expiry dates spread over this many days')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query; the fastest is kept')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.generate(options)
+                window = Donation.objects.expiring_within(days=10)
+                due = Donation.objects.alerts_due(days=10)
+                for label, queryset in (('window scan', window), ('alerts due', due)):
+                    rows, elapsed = self.time_query(queryset, options['repeat'])
+                    self.stdout.write(f"  {label:<12} {rows:>7} rows  {elapsed * 1000:8.2f} ms")
+                    for line in queryset.explain().splitlines():
+                        self.stdout.write(f"      {line}")
+                self.time_daily_run()
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generate(self, options):
+        rng = random.Random(options['seed'])
+        seeder = DatasetSeeder(prefix=f"scan-{uuid4().hex[:6]}", seed=options['seed'], donor_share=1.0)
+        donors, _ = seeder.seed_users(options['donors'])
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        start = time.perf_counter()
+        batch = []
+        for _ in range(options['donations']):
+            expiry_date = today + timedelta(days=rng.randint(-30, options['days']))
+            batch.append(Donation(
+                name=rng.choice(MEDICINE_NAMES),
+                quantity=rng.randint(1, 50),
+                expiry_date=expiry_date,
+                next_alert_on=next_alert_date(expiry_date, after=yesterday),
+                donor=rng.choice(donors),
+                approval_status=Donation.ApprovalStatus.APPROVED,
+                tracking_code=uuid4().hex[:12].upper(),
+            ))
+            if len(batch) == 5000:
+                Donation.objects.bulk_create(batch)
+                batch = []
+        Donation.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {connection.ops.quote_name(Donation._meta.db_table)}")
+        self.stdout.write(
+            f"{options['donations']} donations seeded in {time.perf_counter() - start:.1f}s "
+            f"(expiry spread over {options['days']} days)"
+        )
+
+    def time_query(self, queryset, repeat):
+        best = None
+        for _ in range(max(1, repeat)):
+            start = time.perf_counter()
+            rows = len(list(queryset.values_list('pk', 'expiry_date')))
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return rows, best
+
+    def time_daily_run(self):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            ExpiryCommand(stdout=io.StringIO()).handle(
+                days=10, dry_run=False, force=False, critical_only=False, digest=True,
+            )
+        elapsed = time.perf_counter() - start
+        still_due = Donation.objects.alerts_due(days=10).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"  daily run (digest): {elapsed:.2f}s, {recorder.count} queries, {still_due} still due afterwards"
+        ))
@@ -0,0 +1,114 @@
+"""
+Compare the sign-in email lookup before and after emails were stored lowercase.
+Usage: python manage.py bench_login_lookup --users 1000000 --lookups 2000
+
+Tops the user table up to `--users` accounts, then for the old lookup
+(email__iexact, which no plain index can serve) and the new one (an exact
+match on the lowercased email) prints the query plan (EXPLAIN ANALYZE on
+PostgreSQL) and p50/p95 latency over `--lookups` existing emails, typed in
+mixed case as users do. Full logins are timed too: the password hash is
+the same in both, so the difference is the lookup. Runs inside a
+transaction that is rolled back.
+"""
+import random
+import statistics
+import time
+from uuid import uuid4
+
+from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+User = get_user_model()
+
+PASSWORD = 'correct horse'
+
+
+class Rollback(Exception):
+    pass
+
+
+def shout(email):
+    """The email as someone might type it: random letters uppercased"""
+    return ''.join(c.upper() if random.random() < 0.3 else c for c in email)
+
+
+class Command(BaseCommand):
+    help = 'Show the query plan and latency of case-insensitive vs exact email lookups at sign-in'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1_000_000, help='Accounts in the table (default: 1000000)')
+        parser.add_argument('--lookups', type=int, default=2000, help='Lookups timed per variant (default: 2000)')
+        parser.add_argument('--logins', type=int, default=20, help='Full logins timed per variant (default: 20)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                emails = self.seed(options['users'], options['lookups'], options['batch_size'])
+                sample = random.sample(emails, min(options['lookups'], len(emails)))
+                typed = [shout(email) for email in sample]
+                self.stdout.write(f"{User.objects.count()} users, {connection.vendor}\n")
+
+                variants = {
+                    'before: email__iexact': lambda e: User.objects.get(email__iexact=e.strip().lower()),
+                    'after:  exact': lambda e: User.objects.get(email=User.objects.normalize_email(e)),
+                }
+                for name, lookup in variants.items():
+                    self.explain(name, typed[0])
+                    self.report(name, [self.timed(lookup, e) for e in typed])
+
+                logins = typed[:options['logins']]
+                self.report('login before', [self.timed(self.old_login, e) for e in logins])
+                self.report('login after', [self.timed(self.login, e) for e in logins])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, total, at_least, batch_size):
+        """Add accounts until there are `total` (and at least `at_least` new ones); return the new emails"""
+        tag = uuid4().hex[:6]
+        missing = max(at_least, total - User.objects.count())
+        password = make_password(PASSWORD)
+        start = time.perf_counter()
+        for offset in range(0, missing, batch_size):
+            User.objects.bulk_create([
+                User(username=f"login-{tag}-{i}", email=f"login-{tag}-{i}@example.test", password=password,
+                     first_name='Login', last_name='Bench')
+                for i in range(offset, min(missing, offset + batch_size))
+            ])
+        self.stdout.write(f"Added {missing} users in {time.perf_counter() - start:.1f}s")
+        return list(User.objects.filter(username__startswith=f"login-{tag}-").values_list('email', flat=True))
+
+    def explain(self, name, email):
+        queryset = User.objects.filter(email__iexact=email) if 'iexact' in name else \
+            User.objects.filter(email=User.objects.normalize_email(email))
+        plan = queryset.explain(analyze=True) if connection.vendor == 'postgresql' else queryset.explain()
+        self.stdout.write(f"{name} plan:")
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
+
+    def timed(self, fn, email):
+        start = time.perf_counter()
+        fn(email)
+        return (time.perf_counter() - start) * 1000
+
+    def old_login(self, email):
+        """EmailBackend.authenticate as it was, with the case-insensitive lookup"""
+        user = User.objects.get(email__iexact=email.strip().lower())
+        return user.check_password(PASSWORD) and user
+
+    def login(self, email):
+        user = authenticate(None, email=email, password=PASSWORD)
+        if user is None:
+            raise CommandError(f"Login failed for {email}")
+        return user
+
+    def report(self, name, latencies):
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f"{name:<24} p50 {statistics.median(latencies):9.3f} ms  p95 {p95:9.3f} ms  "
+            f"mean {statistics.fmean(latencies):9.3f} ms  ({len(latencies)} runs)\n"
+        )
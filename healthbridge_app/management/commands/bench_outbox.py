@@ -0,0 +1,154 @@
+"""
+Throughput benchmark for the email outbox against a local stub of the Brevo API.
+Usage: python manage.py bench_outbox --messages 500 --latency-ms 20 --failure-rate 0.1
+
+Starts a keep-alive HTTP stub on localhost, then compares
+  * direct: one send_mail-style call per message, a new HTTPS client each time
+    (what callers did before the outbox), and
+  * outbox: enqueue_email() for every message, then OutboxWorker draining the
+    queue over one pooled client and a few sender threads, retrying the stub's
+    injected failures.
+The stub counts idempotency keys, so duplicate deliveries show up in the report.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from HealthBridge.brevo_backend import BrevoEmailBackend
+from notifications.models import OutboundEmail
+from notifications.outbox import OutboxWorker, enqueue_email, to_message
+
+
+class StubBrevo(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, failure_rate):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.delivered = Counter()
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v3/smtp/email"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so pooled clients reuse the socket
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.requests += 1
+            failed = random.random() < self.server.failure_rate
+            if not failed:
+                key = payload.get('headers', {}).get('idempotencyKey') or uuid4().hex
+                self.server.delivered[key] += 1
+        status, body = (503, b'{"message":"stub failure"}') if failed else (201, b'{"messageId":"stub"}')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Measure email outbox throughput against a local Brevo API stub'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Emails to send (default: 500)')
+        parser.add_argument('--latency-ms', type=float, default=20.0, help='Stub response latency (default: 20ms)')
+        parser.add_argument('--failure-rate', type=float, default=0.1, help='Share of stub calls answered 503')
+        parser.add_argument('--batch-size', type=int, default=100, help='Worker batch size (default: 100)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Worker sender threads (default: 8)')
+
+    def handle(self, *args, **options):
+        for name in ('httpx', 'HealthBridge.brevo_backend'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+        stub = StubBrevo(options['latency_ms'] / 1000, options['failure_rate'])
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+        n = options['messages']
+        try:
+            with override_settings(
+                BREVO_API_URL=stub.url,
+                BREVO_API_KEY='bench',
+                EMAIL_DELIVERY_BACKEND='HealthBridge.brevo_backend.BrevoEmailBackend',
+            ):
+                direct = self.run_direct(stub, n)
+                outbox = self.run_outbox(stub, n, options['batch_size'], options['concurrency'])
+        finally:
+            stub.shutdown()
+
+        self.stdout.write(f"{n} emails, stub latency {options['latency_ms']}ms, failure rate {options['failure_rate']}")
+        for label, result in (('direct (client per message)', direct), ('outbox worker (pooled)', outbox)):
+            self.stdout.write(
+                f"  {label:<30} {result['rate']:8.1f} msg/s  delivered {result['delivered']}/{n}"
+                f"  duplicates {result['duplicates']}  http calls {result['calls']}"
+            )
+        self.stdout.write(f"  enqueue cost in the caller: {outbox['enqueue_us']:.0f} us/email")
+
+    def run_direct(self, stub, n):
+        stub.delivered.clear()
+        stub.requests = 0
+        start = time.perf_counter()
+        for i in range(n):
+            message = to_message(OutboundEmail(
+                idempotency_key=f"bench-direct-{uuid4().hex}", subject='Bench', body='Body',
+                from_email='bench@example.test', to=[f'user{i}@example.test'],
+            ))
+            try:
+                BrevoEmailBackend(fail_silently=True).send_messages([message])
+            except Exception:
+                pass  # the old callers gave up on failure
+        elapsed = time.perf_counter() - start
+        return self.result(stub, n, elapsed)
+
+    def run_outbox(self, stub, n, batch_size, concurrency):
+        stub.delivered.clear()
+        stub.requests = 0
+        prefix = f"bench-outbox-{uuid4().hex[:8]}"
+        start = time.perf_counter()
+        for i in range(n):
+            enqueue_email('Bench', 'Body', [f'user{i}@example.test'], 'bench@example.test',
+                          idempotency_key=f"{prefix}-{i}")
+        enqueue_us = (time.perf_counter() - start) / n * 1e6
+
+        worker = OutboxWorker(
+            batch_size=batch_size, rate=0, concurrency=concurrency,
+            max_attempts=20, backoff_base=0.01, backoff_max=0.05,
+        )
+        start = time.perf_counter()
+        try:
+            queued = OutboundEmail.objects.filter(idempotency_key__startswith=prefix)
+            while queued.exclude(status__in=[OutboundEmail.Status.SENT, OutboundEmail.Status.FAILED]).exists():
+                if not worker.run_once():
+                    time.sleep(0.01)  # everything left is waiting out its backoff
+            elapsed = time.perf_counter() - start
+        finally:
+            worker.close()
+            OutboundEmail.objects.filter(idempotency_key__startswith=prefix).delete()
+        result = self.result(stub, n, elapsed)
+        result['enqueue_us'] = enqueue_us
+        return result
+
+    def result(self, stub, n, elapsed):
+        return {
+            'rate': n / elapsed if elapsed else 0,
+            'delivered': len(stub.delivered),
+            'duplicates': sum(count - 1 for count in stub.delivered.values()),
+            'calls': stub.requests,
+        }
@@ -0,0 +1,128 @@
+"""
+Benchmark ResendEmailBackend against a local mock of the Resend API.
+Usage: python manage.py bench_resend_batch --messages 2000 --latency-ms 50
+
+Starts a keep-alive HTTP mock serving POST /emails and POST /emails/batch
+(permissive validation: recipients on the --invalid-domain are reported per
+index), points RESEND_API_URL at it, and sends the same messages
+  * serially, one /emails call per message (the previous behaviour), and
+  * through the batch path: chunks of RESEND_BATCH_SIZE on a bounded pool.
+num_sent must equal the number of valid recipients in both runs.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import uuid4
+
+from django.core.mail import EmailMessage
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from HealthBridge.resend_backend import ResendEmailBackend
+
+
+class MockResend(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency, invalid_domain):
+        super().__init__(('127.0.0.1', 0), MockResendHandler)
+        self.latency = latency
+        self.invalid_domain = invalid_domain
+        self.calls = 0
+        self.accepted = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class MockResendHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.server.latency)
+        emails = payload if self.path == '/emails/batch' else [payload]
+        data, errors = [], []
+        for index, email in enumerate(emails):
+            if any(to.endswith(self.server.invalid_domain) for to in email['to']):
+                errors.append({'index': index, 'message': 'Invalid `to` field.'})
+            else:
+                data.append({'id': uuid4().hex})
+        with self.server.lock:
+            self.server.calls += 1
+            self.server.accepted += len(data)
+
+        if self.path == '/emails/batch':
+            status, body = 200, {'data': data, 'errors': errors}
+        elif errors:
+            status, body = 422, {'statusCode': 422, 'name': 'validation_error', 'message': errors[0]['message']}
+        else:
+            status, body = 200, data[0]
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    help = 'Compare serial and batched Resend sending against a local mock API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=2000, help='Messages to send (default: 2000)')
+        parser.add_argument('--latency-ms', type=float, default=50.0, help='Mock API latency (default: 50ms)')
+        parser.add_argument('--invalid-every', type=int, default=50, help='Every Nth recipient is invalid (default: 50)')
+        parser.add_argument('--invalid-domain', default='@invalid.test', help='Domain the mock rejects')
+
+    def handle(self, *args, **options):
+        n, every = options['messages'], options['invalid_every']
+        messages = [
+            EmailMessage(
+                'Bench', 'Body', 'bench@example.test',
+                [f"user{i}{options['invalid_domain'] if every and i % every == 0 else '@example.test'}"],
+            )
+            for i in range(n)
+        ]
+        expected = sum(1 for m in messages if not m.to[0].endswith(options['invalid_domain']))
+
+        mock = MockResend(options['latency_ms'] / 1000, options['invalid_domain'])
+        threading.Thread(target=mock.serve_forever, daemon=True).start()
+        try:
+            with override_settings(RESEND_API_KEY='re_bench', RESEND_API_URL=mock.url):
+                serial = self.run(mock, messages, batch_size=1, concurrency=1)
+                batched = self.run(mock, messages, batch_size=100, concurrency=4)
+        finally:
+            mock.shutdown()
+
+        self.stdout.write(f"{n} messages, {expected} valid, mock latency {options['latency_ms']}ms")
+        for label, result in (('serial /emails', serial), ('batched /emails/batch', batched)):
+            self.stdout.write(
+                f"  {label:<24} {result['elapsed']:8.2f}s  {result['calls']:>5} calls"
+                f"  num_sent {result['num_sent']}  accepted by API {result['accepted']}"
+            )
+        if batched['num_sent'] != expected or batched['accepted'] != expected:
+            raise CommandError('Batched num_sent does not match the messages the API accepted')
+        self.stdout.write(self.style.SUCCESS(f"  Speedup: {serial['elapsed'] / batched['elapsed']:.1f}x"))
+
+    def run(self, mock, messages, batch_size, concurrency):
+        mock.calls = mock.accepted = 0
+        backend = ResendEmailBackend(fail_silently=True)
+        start = time.perf_counter()
+        with override_settings(RESEND_BATCH_SIZE=batch_size, RESEND_BATCH_CONCURRENCY=concurrency):
+            if batch_size == 1:
+                num_sent = sum(backend.send_messages([m]) for m in messages)
+            else:
+                num_sent = backend.send_messages(messages)
+        return {
+            'elapsed': time.perf_counter() - start,
+            'calls': mock.calls,
+            'num_sent': num_sent,
+            'accepted': mock.accepted,
+        }
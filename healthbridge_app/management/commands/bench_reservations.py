@@ -0,0 +1,111 @@
+"""
+Throughput of partial reservations (requests/reservations.py) under contention.
+Usage: python manage.py bench_reservations --threads 8 --attempts 500 --donations 5
+
+Creates a few donations, then has `--threads` workers, each on its own
+database connection, create requests and reserve random slices of them as
+create_request does, concentrated on the first donation so the conditional
+UPDATE is contended. Reports reservations per second. That the ledger stays
+consistent under the same load is checked in requests/tests.py. The rows it
+created are deleted again.
+"""
+import random
+import threading
+import time
+from datetime import date, timedelta
+from uuid import uuid4
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+
+from donations.models import Donation
+from requests.models import MedicineRequest
+from requests.reservations import reserve
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Measure reserve() throughput from several threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent workers (default: 8)')
+        parser.add_argument('--attempts', type=int, default=500, help='Reservations tried per worker (default: 500)')
+        parser.add_argument('--donations', type=int, default=5, help='Donations to reserve from (default: 5)')
+        parser.add_argument('--quantity', type=int, default=1000, help='Units per donation (default: 1000)')
+        parser.add_argument('--max-slice', type=int, default=5, help='Largest slice one request asks for (default: 5)')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+
+    def handle(self, *args, **options):
+        tag = uuid4().hex[:6]
+        recipient = User.objects.create_user(
+            username=f"reserve-{tag}", email=f"reserve-{tag}@example.test", password=None,
+            user_type=User.UserType.RECIPIENT,
+        )
+        donations = Donation.objects.bulk_create([
+            Donation(
+                name=f"Stress {tag} {i}",
+                quantity=options['quantity'],
+                expiry_date=date.today() + timedelta(days=365),
+                approval_status=Donation.ApprovalStatus.APPROVED,
+                tracking_code=uuid4().hex[:12].upper(),
+            )
+            for i in range(options['donations'])
+        ])
+        donation_ids = [d.id for d in donations]
+        try:
+            self.stress(recipient, donation_ids, options)
+        finally:
+            Donation.objects.filter(pk__in=donation_ids).delete()
+            recipient.delete()
+
+    def stress(self, recipient, donation_ids, options):
+        counts = {'reserved': 0, 'refused': 0, 'busy': 0}
+        lock = threading.Lock()
+        # Half the traffic goes to the first donation
+        weights = [len(donation_ids)] + [1] * (len(donation_ids) - 1)
+
+        def worker(n):
+            rng = random.Random(options['seed'] + n)
+            local = dict.fromkeys(counts, 0)
+            try:
+                for _ in range(options['attempts']):
+                    donation_id = rng.choices(donation_ids, weights=weights)[0]
+                    quantity = rng.randint(1, options['max_slice'])
+                    try:
+                        with transaction.atomic():
+                            medicine_request = MedicineRequest.objects.create(
+                                recipient=recipient,
+                                medicine_name='stress',
+                                quantity=quantity,
+                                matched_donation_id=donation_id,
+                                status=MedicineRequest.Status.MATCHED,
+                            )
+                            if reserve(donation_id, medicine_request, quantity) is None:
+                                transaction.set_rollback(True)
+                                local['refused'] += 1
+                            else:
+                                local['reserved'] += 1
+                    except OperationalError:
+                        local['busy'] += 1  # SQLite: database is locked
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        attempts = options['threads'] * options['attempts']
+        self.stdout.write(
+            f"{attempts} attempts on {options['threads']} threads in {elapsed:.2f}s: "
+            f"{counts['reserved']} reserved, {counts['refused']} refused (sold out), {counts['busy']} failed busy"
+        )
+        self.stdout.write(self.style.SUCCESS(f"  {counts['reserved'] / elapsed:,.0f} reservations/s"))
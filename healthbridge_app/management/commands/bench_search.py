@@ -0,0 +1,69 @@
+"""
+Time the medicine search (donations.search) against the current database.
+Usage:
+    python manage.py seed_scale --users 100000 --donations 1000000
+    python manage.py bench_search --queries 10 --pages 5
+
+For the most common medicine names and an empty search, compares loading
+every matching donation, as the page did before, with the paged search:
+a cold first page (result ids and the grouped facet query), the same search
+again from the result cache, and following the cursor `--pages` deep. Also
+reports the facet query on its own. Read-only; the cache is cleared before
+each cold run.
+"""
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from donations.models import Donation
+from donations.search import SearchParams, facet_counts, search_page
+from healthbridge_app.instrumentation import QueryRecorder
+from healthbridge_app.seeding import MEDICINE_NAMES
+
+
+class Command(BaseCommand):
+    help = 'Benchmark paged, faceted medicine search with the result-id cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=10, help='Medicine names searched (default: 10)')
+        parser.add_argument('--pages', type=int, default=5, help='Pages followed per search (default: 5)')
+        parser.add_argument('--limit', type=int, default=24, help='Results per page (default: 24)')
+
+    def handle(self, *args, **options):
+        if not Donation.objects.exists():
+            raise CommandError('No donations to search; run seed_scale first')
+        for query in [''] + MEDICINE_NAMES[:options['queries']]:
+            self.bench(query, options)
+
+    def timed(self, fn):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            result = fn()
+        return result, (time.perf_counter() - start) * 1000, recorder.count
+
+    def bench(self, query, options):
+        params = SearchParams({'q': query})
+        limit = options['limit']
+
+        rows, full_ms, _ = self.timed(lambda: len(list(Donation.objects.filter(name__icontains=query))))
+        _, facet_ms, _ = self.timed(lambda: facet_counts(params.base_queryset()))
+
+        cache.clear()
+        (page, total, _), cold_ms, cold_queries = self.timed(lambda: search_page(params, None, limit))
+        _, warm_ms, warm_queries = self.timed(lambda: search_page(params, None, limit))
+        deep_ms = 0.0
+        for _ in range(options['pages']):
+            if not page.has_next:
+                break
+            (page, _, _), ms, _ = self.timed(lambda: search_page(params, page.next_cursor, limit))
+            deep_ms = max(deep_ms, ms)
+
+        self.stdout.write(
+            f"{query or '(all)':<15} {total:>8} results  "
+            f"all rows {full_ms:8.1f} ms ({rows})  facets {facet_ms:7.1f} ms  "
+            f"cold {cold_ms:7.1f} ms/{cold_queries}q  cached {warm_ms:5.1f} ms/{warm_queries}q  "
+            f"next pages <= {deep_ms:5.1f} ms"
+        )
@@ -0,0 +1,121 @@
+"""
+Benchmark the "did you mean" spelling index (healthbridge_app.spelling).
+Usage: python manage.py bench_spelling --words 50000 --lookups 5000
+
+Builds a SpellingIndex of `--words` synthetic medicine-like words (plus the
+seeded medicine names), reporting build time and memory, then times
+corrections of misspellings one and two edits away from dictionary words
+(deleted, inserted, replaced and swapped letters) and of words that are not
+close to anything. A sample is also checked against comparing the typo with
+every dictionary word: both must find the same edit distance. With
+--from-database it also times build_index() on the current database.
+No rows are written.
+"""
+import random
+import statistics
+import string
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from healthbridge_app.seeding import MEDICINE_NAMES
+from healthbridge_app.spelling import MAX_EDIT_DISTANCE, SpellingIndex, build_index, edit_distance
+
+# Consonant-vowel syllables with optional codas, e.g. "mox", "ta", "lin": about 500 of them
+SYLLABLES = [c + v + e for c in 'bcdfglmnprstvxz' for v in 'aeiouy' for e in ('', 'l', 'n', 'r', 'x', 's')]
+
+
+def misspell(word, edits, rng):
+    for _ in range(edits):
+        i = rng.randrange(len(word))
+        kind = rng.choice('dirs' if len(word) > 3 else 'ir')
+        if kind == 'd':
+            word = word[:i] + word[i + 1:]
+        elif kind == 'i':
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+        elif kind == 'r':
+            word = word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:]
+        elif i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+
+class Command(BaseCommand):
+    help = 'Benchmark symmetric-delete spelling corrections on a large synthetic dictionary'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--words', type=int, default=50000, help='Dictionary words (default: 50000)')
+        parser.add_argument('--lookups', type=int, default=5000, help='Corrections timed per kind (default: 5000)')
+        parser.add_argument('--verify', type=int, default=200, help='Lookups checked against a full scan (default: 200)')
+        parser.add_argument('--from-database', action='store_true', help='Also time build_index() on this database')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = {name.lower() for name in MEDICINE_NAMES for name in name.split()}
+        while len(words) < options['words']:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        words = sorted(words)
+
+        start = time.perf_counter()
+        index = self.build(words)
+        build = time.perf_counter() - start
+        # Again under tracemalloc, which slows allocation too much to time with
+        tracemalloc.start()
+        traced = self.build(words)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del traced
+        self.stdout.write(
+            f"{len(index)} words, {len(index.candidates)} delete keys: built in {build:.2f}s, {memory / 2**20:.1f} MiB"
+        )
+
+        targets = rng.choices(words, k=options['lookups'])
+        for label, typos in (
+            ('1 edit', [misspell(w, 1, rng) for w in targets]),
+            ('2 edits', [misspell(w, 2, rng) for w in targets]),
+            ('no match', [''.join(rng.choices('qxzjvkw', k=rng.randint(5, 10))) for _ in targets]),
+        ):
+            self.time_lookups(index, label, typos, targets)
+
+        self.verify(index, words, [misspell(w, rng.randint(1, 2), rng) for w in targets[:options['verify']]])
+
+        if options['from_database']:
+            start = time.perf_counter()
+            db_index = build_index()
+            self.stdout.write(
+                f"build_index() from the database: {len(db_index)} words in {time.perf_counter() - start:.2f}s"
+            )
+
+    def build(self, words):
+        index = SpellingIndex()
+        for word in words:
+            index.add_word(word)
+        return index
+
+    def time_lookups(self, index, label, typos, targets):
+        timings, corrected = [], 0
+        for typo, target in zip(typos, targets):
+            start = time.perf_counter()
+            found = index.correct_word(typo)
+            timings.append((time.perf_counter() - start) * 1e6)
+            corrected += found is not None and found[0] == target
+        timings.sort()
+        self.stdout.write(
+            f"  {label:<9} p50 {statistics.median(timings):7.1f} µs  p99 {timings[int(len(timings) * 0.99)]:7.1f} µs"
+            f"  back to the original word {corrected / len(typos):.0%}"
+        )
+
+    def verify(self, index, words, typos):
+        start = time.perf_counter()
+        mismatches = 0
+        for typo in typos:
+            scan = min((edit_distance(typo, word, MAX_EDIT_DISTANCE) for word in words), default=MAX_EDIT_DISTANCE + 1)
+            found = index.correct_word(typo)
+            mismatches += (found[1] if found else MAX_EDIT_DISTANCE + 1) != scan
+        per_scan = (time.perf_counter() - start) * 1000 / len(typos)
+        style = self.style.SUCCESS if not mismatches else self.style.ERROR
+        self.stdout.write(style(
+            f"  full scan {per_scan:.1f} ms per lookup; {mismatches} of {len(typos)} index results disagree with it"
+        ))
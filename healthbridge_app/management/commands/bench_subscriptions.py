@@ -0,0 +1,126 @@
+"""
+Time matching approved donations against medicine subscriptions.
+Usage: python manage.py bench_subscriptions --recipients 20000 --per-user 5 --approvals 200
+
+Inside a transaction that is rolled back at the end, creates recipients who
+each follow a few medicines (popular ones more often, some with a strength,
+e.g. "amoxicillin 500mg"), then for `--approvals` donation names compares
+the inverted-index lookup (notifications.subscriptions.matching_subscriptions)
+with scanning every subscription, checks both find the same subscribers and
+times notify_subscribers() end to end, bulk notification INSERT included.
+"""
+import random
+import time
+from datetime import date, timedelta
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from donations.models import Donation
+from healthbridge_app.instrumentation import QueryRecorder
+from healthbridge_app.seeding import DatasetSeeder, MEDICINE_NAMES, zipf_weights
+from notifications.models import MedicineSubscription, SubscriptionToken
+from notifications.subscriptions import matching_subscriptions, normalize, notify_subscribers, tokenize
+
+STRENGTHS = ['250mg', '500mg', '10mg', '20mg', '100ml']
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark subscription matching: inverted token index vs scanning all subscriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, default=20000, help='Subscribing recipients (default: 20000)')
+        parser.add_argument('--per-user', type=int, default=5, help='Medicines each recipient follows (default: 5)')
+        parser.add_argument('--approvals', type=int, default=200, help='Donation names matched (default: 200)')
+        parser.add_argument('--seed', type=int, default=7, help='Random seed')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                subscriptions = self.generate(rng, options)
+                self.stdout.write(f"{subscriptions} subscriptions from {options['recipients']} recipients")
+                names = [
+                    f"{rng.choice(MEDICINE_NAMES)} {rng.choice(STRENGTHS)} Tablets"
+                    for _ in range(options['approvals'])
+                ]
+                self.compare(names)
+                self.fan_out(rng, names[:min(len(names), 20)])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def generate(self, rng, options):
+        seeder = DatasetSeeder(prefix=f"subs-{uuid4().hex[:6]}", seed=options['seed'], donor_share=0.0)
+        _, recipients = seeder.seed_users(options['recipients'])
+        weights = zipf_weights(len(MEDICINE_NAMES), s=0.9)
+        rows = []
+        for user in recipients:
+            queries = {}
+            for name in rng.choices(MEDICINE_NAMES, cum_weights=weights, k=options['per_user']):
+                query = f"{name} {rng.choice(STRENGTHS)}" if rng.random() < 0.3 else name
+                queries.setdefault(normalize(query), query)
+            rows += [
+                MedicineSubscription(user=user, query=query, normalized=normalized, token_count=len(tokenize(query)))
+                for normalized, query in queries.items()
+            ]
+        subscriptions = MedicineSubscription.objects.bulk_create(rows, batch_size=2000)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            subscriptions = MedicineSubscription.objects.filter(user__in=recipients)
+        SubscriptionToken.objects.bulk_create(
+            [SubscriptionToken(token=token, subscription=sub) for sub in subscriptions for token in tokenize(sub.query)],
+            batch_size=5000,
+        )
+        return len(rows)
+
+    def compare(self, names):
+        start = time.perf_counter()
+        indexed = [set(matching_subscriptions(name).values_list('pk', flat=True)) for name in names]
+        index_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanned = []
+        for name in names:
+            tokens = set(tokenize(name))
+            scanned.append({
+                pk for pk, normalized in MedicineSubscription.objects.values_list('pk', 'normalized').iterator(2000)
+                if set(normalized.split()) <= tokens
+            })
+        scan_time = time.perf_counter() - start
+
+        if indexed != scanned:
+            raise CommandError('Index and scan disagree on the matching subscriptions')
+        matches = sum(len(found) for found in indexed)
+        n = len(names)
+        self.stdout.write(f"{n} donation names, {matches / n:,.0f} matching subscriptions each on average")
+        self.stdout.write(f"  scan all     {scan_time / n * 1000:9.2f} ms per approval")
+        self.stdout.write(f"  token index  {index_time / n * 1000:9.2f} ms per approval")
+        self.stdout.write(self.style.SUCCESS(f"  {scan_time / index_time:.0f}x faster, same subscribers"))
+
+    def fan_out(self, rng, names):
+        donations = Donation.objects.bulk_create([
+            Donation(
+                name=name,
+                quantity=rng.randint(1, 50),
+                expiry_date=date.today() + timedelta(days=365),
+                approval_status=Donation.ApprovalStatus.APPROVED,
+                tracking_code=uuid4().hex[:12].upper(),
+            )
+            for name in names
+        ])
+        recorder = QueryRecorder()
+        notified = 0
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            for donation in donations:
+                notified += notify_subscribers(donation)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"notify_subscribers: {len(donations)} approvals, {notified} notifications, "
+            f"{recorder.count / len(donations):.0f} queries and {elapsed / len(donations) * 1000:.1f} ms per approval"
+        )
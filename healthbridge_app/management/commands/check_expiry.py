@@ -1,10 +1,15 @@
+import hashlib
+from collections import defaultdict
 from datetime import date, timedelta
 from django.core.management.base import BaseCommand, CommandError
-from django.core.mail import send_mail, send_mass_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.db import transaction
+from django.utils import timezone
+from django.utils.html import escape
 from donations.models import Donation, ExpiryAlert
+from healthbridge_app.batching import run_batches
+from notifications.outbox import enqueue_email
 
 
 class Command(BaseCommand):
@@ -32,6 +37,17 @@ class Command(BaseCommand):
             action='store_true',
             help='Only send alerts for medicines expiring in 3 days or less'
         )
+        parser.add_argument(
+            '--digest',
+            action='store_true',
+            help='Send each recipient one digest email listing all their expiring medicines'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Donations per transaction without --digest (default: 500)'
+        )
     
     def handle(self, *args, **options):
         days_ahead = options['days']
@@ -44,9 +60,12 @@ class Command(BaseCommand):
             self.stdout.write(f"Critical mode: checking medicines expiring within {days_ahead} days")
         
         try:
-            notifications_sent = self.process_expiry_notifications(
-                days_ahead, dry_run, force
-            )
+            if options.get('digest'):
+                notifications_sent = self.process_expiry_digests(days_ahead, dry_run, force)
+            else:
+                notifications_sent = self.process_expiry_notifications(
+                    days_ahead, dry_run, force, options.get('chunk_size', 500)
+                )
             
             if dry_run:
                 self.stdout.write(
@@ -56,29 +75,46 @@ class Command(BaseCommand):
                 )
             else:
                 self.stdout.write(
-                    self.style.SUCCESS(f"Successfully sent {notifications_sent} expiry notifications.")
+                    self.style.SUCCESS(f"Queued {notifications_sent} expiry notifications for the send_outbox worker.")
                 )
                 
         except Exception as e:
             raise CommandError(f"Command failed: {str(e)}")
     
-    @transaction.atomic
-    def process_expiry_notifications(self, days_ahead, dry_run, force):
-        """Main logic for processing expiry notifications"""
+    def process_expiry_notifications(self, days_ahead, dry_run, force, chunk_size=500):
+        """
+        Main logic for processing expiry notifications.
+        
+        Donations are processed in keyset chunks (healthbridge_app.batching),
+        each in its own transaction with its emails, ExpiryAlert rows and
+        next_alert_on advance, so an interrupted run loses at most one chunk
+        and the next run picks up the donations that are still due.
+        """
         
-        # Use the custom manager method
-        expiring_donations = Donation.objects.expiring_within(days=days_ahead)
+        expiring_donations = self.expiring_donations(days_ahead, force).select_related('donor')
         
         self.stdout.write(f"Found {expiring_donations.count()} donations expiring within {days_ahead} days")
         
         if not expiring_donations.exists():
             self.stdout.write("No expiring donations found.")
+            if not dry_run and not force:
+                Donation.objects.clear_stale_alerts()
             return 0
         
-        notifications_sent = 0
-        email_batch = []  # For batch email sending
+        self.dry_run = dry_run
+        self.force = force
+        self.notifications_sent = 0
+        self.rescheduled = 0
+        run_batches(expiring_donations, self.notify_chunk, chunk_size=chunk_size, stdout=self.stdout, label='check_expiry')
         
-        for donation in expiring_donations:
+        if not dry_run and not force:
+            cleared = Donation.objects.clear_stale_alerts()
+            self.stdout.write(f"  Rescheduled {self.rescheduled} donation(s), cleared {cleared} expired or unavailable")
+        return self.notifications_sent
+    
+    def notify_chunk(self, donations):
+        """Queue the alerts for one chunk of donations and move them to their next threshold"""
+        for donation in donations:
             days_until_expiry = donation.days_until_expiry
             
             # Skip if already expired (safety check)
@@ -88,7 +124,7 @@ class Command(BaseCommand):
             recipients = self.get_notification_recipients(donation)
             
             for recipient_email in recipients:
-                should_send = force or not self.alert_already_sent(
+                should_send = self.force or not self.alert_already_sent(
                     donation, days_until_expiry, recipient_email
                 )
                 
@@ -98,18 +134,23 @@ class Command(BaseCommand):
                     )
                     continue
                 
-                if dry_run:
+                if self.dry_run:
                     self.stdout.write(
                         self.style.WARNING(
                             f"  [DRY RUN] Would send {donation.urgency_level.upper()} alert for "
                             f"'{donation.name}' (expires in {days_until_expiry} days) to {recipient_email}"
                         )
                     )
-                    notifications_sent += 1
+                    self.notifications_sent += 1
                 else:
-                    # Prepare email for batch sending
-                    email_data = self.prepare_email(donation, recipient_email, days_until_expiry)
-                    email_batch.append(email_data)
+                    # Queue the email in the outbox; it commits with the ExpiryAlert row
+                    subject, message, from_email, recipient_list = self.prepare_email(
+                        donation, recipient_email, days_until_expiry
+                    )
+                    idempotency_key = f"expiry-alert:{donation.pk}:{days_until_expiry}:{recipient_email}"
+                    if self.force:
+                        idempotency_key += f":{timezone.now().isoformat()}"
+                    enqueue_email(subject, message, recipient_list, from_email, idempotency_key=idempotency_key)
                     
                     # Record the alert (with duplicate protection)
                     ExpiryAlert.objects.get_or_create(
@@ -118,13 +159,141 @@ class Command(BaseCommand):
                         recipient_email=recipient_email,
                         defaults={'alert_type': 'email'}
                     )
-                    notifications_sent += 1
+                    self.notifications_sent += 1
+        
+        if not self.dry_run and not self.force:
+            self.rescheduled += Donation.objects.advance_alerts(
+                Donation.objects.filter(pk__in=[donation.pk for donation in donations])
+            )
+    
+    @transaction.atomic
+    def process_expiry_digests(self, days_ahead, dry_run, force):
+        """
+        Queue one digest email per recipient instead of one email per donation.
+        
+        Expiring donations are loaded in one query (donor joined), already-sent
+        alerts in a second, and everything else is grouped in memory. An
+        ExpiryAlert row is still recorded for every donation in a digest.
+        Returns the number of digest emails.
+        """
+        today = date.today()
+        expiring = self.expiring_donations(days_ahead, force)
+        donations = list(
+            expiring.filter(donor__isnull=False)
+            .exclude(donor__email='')
+            .select_related('donor')
+            .order_by('expiry_date', 'name')
+        )
+        self.stdout.write(f"Found {len(donations)} donations expiring within {days_ahead} days")
+        
+        already_sent = set() if force else set(
+            ExpiryAlert.objects.filter(donation__in=expiring.values('pk'))
+            .values_list('donation_id', 'days_before_expiry', 'recipient_email')
+        )
         
-        # Send emails in batch for better performance
-        if email_batch and not dry_run:
-            self.send_batch_emails(email_batch)
+        digests = defaultdict(list)
+        for donation in donations:
+            days_until_expiry = donation.days_left
+            recipient_email = donation.donor.email
+            if (donation.pk, days_until_expiry, recipient_email) in already_sent:
+                continue
+            digests[recipient_email].append((donation, days_until_expiry))
         
-        return notifications_sent
+        alerts = []
+        for recipient_email, items in digests.items():
+            if dry_run:
+                self.stdout.write(self.style.WARNING(
+                    f"  [DRY RUN] Would send a digest of {len(items)} medicine(s) to {recipient_email}"
+                ))
+                continue
+            subject, message, html_message = self.prepare_digest(items)
+            fingerprint = hashlib.sha1(
+                ",".join(f"{d.pk}:{days}" for d, days in items).encode()
+            ).hexdigest()[:16]
+            idempotency_key = f"expiry-digest:{recipient_email}:{today.isoformat()}:{fingerprint}"
+            if force:
+                idempotency_key += f":{timezone.now().isoformat()}"
+            enqueue_email(
+                subject, message, [recipient_email],
+                getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@healthbridge.com'),
+                html_body=html_message, idempotency_key=idempotency_key,
+            )
+            alerts.extend(
+                ExpiryAlert(donation=donation, days_before_expiry=days, recipient_email=recipient_email)
+                for donation, days in items
+            )
+        
+        ExpiryAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+        if not dry_run and not force:
+            self.advance_schedule(expiring)
+        self.stdout.write(
+            f"  {len(digests)} digest(s) covering {sum(len(items) for items in digests.values())} donations"
+        )
+        return len(digests)
+    
+    def prepare_digest(self, items):
+        """Build (subject, text, html) for one recipient's digest; items are (donation, days) sorted by expiry"""
+        most_urgent = min(days for _, days in items)
+        prefix = '🚨 URGENT' if most_urgent <= 3 else '⚠️'
+        subject = f"{prefix} {len(items)} medicine{'s' if len(items) != 1 else ''} expiring soon"
+        
+        rows = [
+            (donation.name[:30], str(donation.quantity), donation.expiry_date.strftime('%b %d, %Y'),
+             'today' if days == 0 else f"{days}d", donation.tracking_code)
+            for donation, days in items
+        ]
+        header = ('Medicine', 'Qty', 'Expires', 'In', 'Tracking')
+        widths = [max(len(row[i]) for row in rows + [header]) for i in range(len(header))]
+        table = "\n".join(
+            "  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip()
+            for row in [header, tuple('-' * w for w in widths)] + rows
+        )
+        message = f"""
+Dear HealthBridge User,
+
+{len(items)} of your donated medicines will expire within the next few days:
+
+{table}
+
+💡 Please use, share or update the status of these medicines before they expire.
+
+Thank you for helping reduce medicine waste and supporting community health!
+
+Best regards,
+HealthBridge Team
+
+---
+This is an automated message. If you received this in error, please contact support.
+        """.strip()
+        
+        html_rows = "".join(
+            "<tr>" + "".join(f"<td style=\"padding:2px 8px\">{escape(cell)}</td>" for cell in row) + "</tr>"
+            for row in rows
+        )
+        html_header = "".join(f"<th style=\"padding:2px 8px;text-align:left\">{cell}</th>" for cell in header)
+        html_message = (
+            f"<p>Dear HealthBridge User,</p>"
+            f"<p>{len(items)} of your donated medicines will expire within the next few days:</p>"
+            f"<table style=\"border-collapse:collapse;font-size:14px\"><tr>{html_header}</tr>{html_rows}</table>"
+            f"<p>Please use, share or update the status of these medicines before they expire.</p>"
+            f"<p>Best regards,<br>HealthBridge Team</p>"
+        )
+        return subject, message, html_message
+    
+    def expiring_donations(self, days_ahead, force):
+        """
+        Donations to alert about. Normally only those whose next_alert_on is
+        due (an index range scan); --force rescans the whole expiry window.
+        """
+        if force:
+            return Donation.objects.expiring_within(days=days_ahead).with_urgency()
+        return Donation.objects.alerts_due(days=days_ahead).with_urgency()
+    
+    def advance_schedule(self, queryset):
+        """Move the processed donations to their next alert threshold and drop finished ones"""
+        advanced = Donation.objects.advance_alerts(queryset)
+        cleared = Donation.objects.clear_stale_alerts()
+        self.stdout.write(f"  Rescheduled {advanced} donation(s), cleared {cleared} expired or unavailable")
     
     def get_notification_recipients(self, donation):
         """Get list of email recipients for a donation - only the donor"""
@@ -145,7 +314,7 @@ class Command(BaseCommand):
         ).exists()
     
     def prepare_email(self, donation, recipient_email, days_until_expiry):
-        """Prepare email data for batch sending"""
+        """Build (subject, message, from_email, recipient_list) for one alert"""
         urgency = donation.urgency_level
         
         subject = f"{'🚨 URGENT' if urgency in ['critical', 'high'] else '⚠️'} Medicine Expiry Alert: {donation.name}"
@@ -196,22 +365,3 @@ This is an automated message. If you received this in error, please contact supp
             getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@healthbridge.com'),
             [recipient_email]
         )
-    
-    def send_batch_emails(self, email_batch):
-        """Send emails in batch for better performance"""
-        try:
-            send_mass_mail(email_batch, fail_silently=False)
-            self.stdout.write(f"  ✓ Sent batch of {len(email_batch)} emails")
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"  ✗ Batch email error: {str(e)}"))
-            
-            # Fallback: send emails individually
-            self.stdout.write("  Attempting individual email sending...")
-            for subject, message, from_email, recipient_list in email_batch:
-                try:
-                    send_mail(subject, message, from_email, recipient_list, fail_silently=False)
-                    self.stdout.write(f"    ✓ Sent individual email to {recipient_list[0]}")
-                except Exception as individual_error:
-                    self.stdout.write(
-                        self.style.ERROR(f"    ✗ Failed to send to {recipient_list[0]}: {individual_error}")
-                    )
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+Diagnose which claimed requests qualify for the admin pickup section.
+Usage: python manage.py check_pickups [--chunk-size 500]
+
+Read-only. Requests and donations are read in keyset chunks with their
+relations loaded per chunk, so memory and query count stay flat.
+"""
+from django.core.management.base import BaseCommand
+
+from donations.models import Donation
+from healthbridge_app.batching import iterate_chunks
+from requests.models import MedicineRequest
+
+
+class Command(BaseCommand):
+    help = 'Report claimed requests and delivered donations used by the pickup section'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows read per query (default: 500)')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        self.stdout.write("=" * 80)
+        self.stdout.write("PICKUP STATUS DIAGNOSTIC")
+        self.stdout.write("=" * 80)
+
+        claimed_requests = MedicineRequest.objects.filter(
+            status=MedicineRequest.Status.CLAIMED
+        ).select_related('matched_donation__donor', 'recipient')
+        self.stdout.write(f"\n📋 TOTAL CLAIMED REQUESTS: {claimed_requests.count()}")
+
+        for chunk in iterate_chunks(claimed_requests, chunk_size):
+            for req in chunk:
+                self.write_request(req)
+
+        self.stdout.write(f"\n\n{'=' * 80}")
+        self.stdout.write("🚚 ALL DELIVERED DONATIONS")
+        self.stdout.write("=" * 80)
+
+        delivered_donations = Donation.objects.filter(
+            status=Donation.Status.DELIVERED
+        ).select_related('donor').prefetch_related('matched_requests')
+        self.stdout.write(f"Total delivered: {delivered_donations.count()}")
+
+        for chunk in iterate_chunks(delivered_donations, chunk_size):
+            for donation in chunk:
+                self.stdout.write(f"\nDonation: {donation.tracking_code} - {donation.name}")
+                self.stdout.write(f"  Donor: {donation.donor.get_full_name() if donation.donor else 'Anonymous'}")
+                self.stdout.write(f"  Status: {donation.status}")
+                self.stdout.write(f"  Last Updated: {donation.last_update}")
+                matched_reqs = donation.matched_requests.all()
+                self.stdout.write(f"  Matched Requests: {len(matched_reqs)}")
+                for req in matched_reqs:
+                    self.stdout.write(f"    - {req.tracking_code} (status: {req.status})")
+
+        # Final summary
+        self.stdout.write(f"\n\n{'=' * 80}")
+        self.stdout.write("SUMMARY")
+        self.stdout.write("=" * 80)
+
+        qualifying = MedicineRequest.objects.filter(
+            status=MedicineRequest.Status.CLAIMED,
+            matched_donation__isnull=False,
+            matched_donation__status=Donation.Status.DELIVERED,
+        ).count()
+        self.stdout.write(f"✅ Requests that QUALIFY for pickup section: {qualifying}")
+        self.stdout.write(f"   (Request status=claimed AND Donation status=delivered)")
+        self.stdout.write("\n" + "=" * 80)
+
+    def write_request(self, req):
+        self.stdout.write(f"\n{'=' * 60}")
+        self.stdout.write(f"Request: {req.tracking_code}")
+        self.stdout.write(f"  Medicine: {req.medicine_name}")
+        self.stdout.write(f"  Recipient: {req.recipient.get_full_name()}")
+        self.stdout.write(f"  Request Status: {req.status}")
+        self.stdout.write(f"  Claimed Date: {req.updated_at}")
+        self.stdout.write(f"  Has Matched Donation: {'Yes' if req.matched_donation else 'No'}")
+
+        if not req.matched_donation:
+            self.stdout.write(f"  ❌ DOES NOT QUALIFY - No matched donation")
+            return
+        donation = req.matched_donation
+        self.stdout.write(f"\n  Matched Donation: {donation.tracking_code}")
+        self.stdout.write(f"    Donation Name: {donation.name}")
+        self.stdout.write(f"    Donor: {donation.donor.get_full_name() if donation.donor else 'Anonymous'}")
+        self.stdout.write(f"    Donation Status: {donation.status}")
+        self.stdout.write(f"    Last Updated: {donation.last_update}")
+
+        # Check if qualifies for pickup
+        if donation.status == Donation.Status.DELIVERED:
+            self.stdout.write(f"  ✅ QUALIFIES FOR PICKUP (Request=claimed, Donation=delivered)")
+        else:
+            self.stdout.write(f"  ❌ DOES NOT QUALIFY - Donation status is '{donation.status}' (needs 'delivered')")
@@ -1,10 +1,15 @@
+from collections import defaultdict
 from datetime import date
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Count
 from django.utils import timezone
+from django.utils.functional import cached_property
 from donations.models import Donation
 from requests.models import MedicineRequest
 from notifications.models import Notification
+from healthbridge_app.batching import map_io, run_batches
+from healthbridge_app.events import log_event
 import logging
 
 logger = logging.getLogger(__name__)
@@ -30,6 +35,9 @@ class Command(BaseCommand):
             action='store_true',
             help='Delete all expired donations regardless of expiry date'
         )
+        parser.add_argument('--chunk-size', type=int, default=200, help='Donations per transaction (default: 200)')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel image deletions (default: 4)')
+        parser.add_argument('--resume', action='store_true', help='Continue an interrupted run from its checkpoint')
     
     def handle(self, *args, **options):
         days_past = options['days_past_expiry']
@@ -41,7 +49,7 @@ class Command(BaseCommand):
         self.stdout.write("="*60)
         
         try:
-            deleted_count = self.cleanup_expired_donations(days_past, dry_run, force)
+            deleted_count = self.cleanup_expired_donations(days_past, dry_run, force, options)
             
             if dry_run:
                 self.stdout.write(
@@ -60,9 +68,8 @@ class Command(BaseCommand):
             logger.exception("Cleanup command failed")
             raise
     
-    @transaction.atomic
-    def cleanup_expired_donations(self, days_past, dry_run, force):
-        """Main cleanup logic"""
+    def cleanup_expired_donations(self, days_past, dry_run, force, options):
+        """Main cleanup logic; each chunk of donations is removed in its own transaction"""
         
         # Get expired donations
         if force:
@@ -80,58 +87,73 @@ class Command(BaseCommand):
         if total == 0:
             return 0
         
-        deleted_count = 0
+        self.dry_run = dry_run
+        self.workers = options['workers']
+        result = run_batches(
+            expired_donations.select_related('donor'),
+            self.process_chunk,
+            name=None if dry_run else 'batch:cleanup_expired',
+            chunk_size=options['chunk_size'],
+            resume=options['resume'],
+            stdout=self.stdout,
+            label='cleanup_expired',
+        )
+        return result.processed
+    
+    def process_chunk(self, donations):
+        today = date.today()
+        events = {}
+        for donation in donations:
+            events[donation.pk] = {
+                'donation_id': donation.id,
+                'tracking_code': donation.tracking_code,
+                'expiry_date': donation.expiry_date,
+                'days_expired': (today - donation.expiry_date).days,
+                'donor': donation.donor.email if donation.donor else None,
+                'image': donation.image.name if donation.image else None,
+            }
+        
+        if self.dry_run:
+            # Check for related requests
+            related_counts = dict(
+                MedicineRequest.objects.filter(matched_donation__in=donations)
+                .values_list('matched_donation').annotate(n=Count('id'))
+            )
+            for donation in donations:
+                events[donation.pk]['related_requests'] = related_counts.get(donation.pk, 0)
+                log_event('cleanup.would_delete', **events[donation.pk])
+            return
+        
+        # 1. Related requests, loaded for the whole chunk at once
+        related = defaultdict(list)
+        for request in MedicineRequest.objects.filter(matched_donation__in=donations).select_related('recipient'):
+            related[request.matched_donation_id].append(request)
+        
+        # 2. Delete images from Supabase once the chunk is committed, so a rolled
+        #    back chunk never leaves donations pointing at deleted files
+        images = [(donation.pk, donation.image.name) for donation in donations if donation.image]
+        if images:
+            transaction.on_commit(lambda: self.delete_images(images))
         
-        for donation in expired_donations:
-            days_expired = (date.today() - donation.expiry_date).days
+        for donation in donations:
+            event = events[donation.pk]
+            if related[donation.pk]:
+                try:
+                    event['requests_deleted'] = self.delete_related_requests(donation, related[donation.pk])
+                except Exception as e:
+                    log_event('cleanup.request_delete_failed', level=logging.WARNING, donation_id=donation.id, error=str(e))
             
-            self.stdout.write("-" * 60)
-            self.stdout.write(f"Medicine: {donation.name}")
-            self.stdout.write(f"Tracking: {donation.tracking_code}")
-            self.stdout.write(f"Expired: {donation.expiry_date} ({days_expired} days ago)")
-            self.stdout.write(f"Donor: {donation.donor.email if donation.donor else 'Unknown'}")
-            self.stdout.write(f"Image: {donation.image.name if donation.image else 'None'}")
+            # 3. Create notification for donor (if exists)
+            if donation.donor:
+                try:
+                    self.notify_donor(donation, event['days_expired'])
+                    event['donor_notified'] = True
+                except Exception as e:
+                    log_event('cleanup.notify_failed', level=logging.WARNING, donation_id=donation.id, error=str(e))
             
-            if dry_run:
-                self.stdout.write(self.style.WARNING("[DRY RUN] Would delete this donation"))
-                # Check for related requests
-                related_requests = MedicineRequest.objects.filter(matched_donation=donation)
-                if related_requests.exists():
-                    self.stdout.write(self.style.WARNING(f"  [DRY RUN] Would also delete {related_requests.count()} related request(s)"))
-                deleted_count += 1
-            else:
-                # 1. Handle related requests first (before deleting donation)
-                related_requests = MedicineRequest.objects.filter(matched_donation=donation)
-                if related_requests.exists():
-                    try:
-                        requests_deleted = self.delete_related_requests(donation, related_requests)
-                        self.stdout.write(self.style.SUCCESS(f"  ✓ Deleted {requests_deleted} related request(s)"))
-                    except Exception as e:
-                        self.stdout.write(self.style.WARNING(f"  ⚠ Request deletion failed: {e}"))
-                
-                # 2. Delete image from Supabase (if exists)
-                if donation.image:
-                    try:
-                        self.delete_image_from_supabase(donation)
-                        self.stdout.write(self.style.SUCCESS("  ✓ Image deleted from Supabase"))
-                    except Exception as e:
-                        self.stdout.write(self.style.WARNING(f"  ⚠ Image deletion failed: {e}"))
-                
-                # 3. Create notification for donor (if exists)
-                if donation.donor:
-                    try:
-                        self.notify_donor(donation, days_expired)
-                        self.stdout.write(self.style.SUCCESS("  ✓ Donor notified"))
-                    except Exception as e:
-                        self.stdout.write(self.style.WARNING(f"  ⚠ Notification failed: {e}"))
-                
-                # 4. Delete donation from database
-                donation_name = donation.name
-                donation.delete()
-                self.stdout.write(self.style.SUCCESS(f"  ✓ Donation '{donation_name}' deleted from database"))
-                deleted_count += 1
-        
-        return deleted_count
+            # 4. Delete donation from database
+            donation.delete()
+            log_event('cleanup.deleted', **event)
     
     def delete_related_requests(self, donation, related_requests):
         """Delete requests matched to this expired donation and notify recipients"""
@@ -183,21 +205,26 @@ class Command(BaseCommand):
             logger.error(f"Failed to create recipient notification: {e}")
             raise
     
-    def delete_image_from_supabase(self, donation):
+    @cached_property
+    def storage(self):
+        # One client shared by the deletion threads
+        from HealthBridge.supabase_storage import SupabaseStorage
+        return SupabaseStorage()
+    
+    def delete_images(self, images):
+        """Delete the (donation id, file path) images in parallel (network-bound)"""
+        results = map_io(lambda image: self.delete_image_from_supabase(image[1]), images, self.workers)
+        for (donation_id, file_path), _, error in results:
+            if error:
+                log_event('cleanup.image_delete_failed', level=logging.WARNING, donation_id=donation_id, error=str(error))
+            else:
+                log_event('cleanup.image_deleted', donation_id=donation_id, image=file_path)
+    
+    def delete_image_from_supabase(self, file_path):
         """Delete medicine image from Supabase storage"""
-        if not donation.image:
-            return
-        
         try:
-            # Import Supabase storage backend
-            from HealthBridge.supabase_storage import SupabaseStorage
-            import os
-            
-            storage = SupabaseStorage()
-            file_path = donation.image.name
-            
             # Delete from Supabase
-            storage.delete(file_path)
+            self.storage.delete(file_path)
             logger.info(f"Deleted image {file_path} from Supabase")
             
         except Exception as e:
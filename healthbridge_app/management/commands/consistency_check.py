@@ -0,0 +1,59 @@
+"""
+Check (and optionally repair) Donation / MedicineRequest status invariants.
+Usage:
+    python manage.py consistency_check                 # report violations per invariant
+    python manage.py consistency_check --fix           # repair them with bulk UPDATEs
+    python manage.py consistency_check --only delivered_with_stock --explain
+
+Replaces fix_delivered_status and fix_donation_availability, which saved one
+donation at a time. The invariants live in healthbridge_app/consistency.py.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from healthbridge_app.consistency import get_invariants, run_checks
+
+
+class Command(BaseCommand):
+    help = 'Report donation/request status inconsistencies and repair them with set-based updates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Repair the violations that can be repaired')
+        parser.add_argument('--only', nargs='+', metavar='NAME', help='Run only these invariants')
+        parser.add_argument('--list', action='store_true', help='List the invariants, then exit')
+        parser.add_argument('--explain', action='store_true', help="Print each invariant's query plan")
+
+    def handle(self, *args, **options):
+        try:
+            invariants = get_invariants(options['only'])
+        except KeyError as e:
+            raise CommandError(f"Unknown invariant: {e.args[0]}")
+
+        if options['list']:
+            for invariant in invariants:
+                mode = '' if invariant.repair else ' (report only)'
+                self.stdout.write(f"{invariant.name:<30} {invariant.description}{mode}")
+            return
+
+        results = run_checks(invariants, repair=options['fix'])
+        total = 0
+        for result in results:
+            total += result.violations
+            line = f"{result.invariant.name:<30} {result.violations:>8} violations  {result.check_time * 1000:8.1f} ms"
+            if result.repaired is not None:
+                line += f"  repaired {result.repaired} in {result.repair_time * 1000:.1f} ms"
+            elif result.violations and result.invariant.repair is None:
+                line += "  (report only)"
+            style = self.style.WARNING if result.violations else self.style.SUCCESS
+            self.stdout.write(style(line))
+            if options['explain']:
+                for plan_line in result.invariant.violations().explain().splitlines():
+                    self.stdout.write(f"      {plan_line}")
+
+        elapsed = sum(r.check_time + (r.repair_time or 0) for r in results)
+        if not total:
+            self.stdout.write(self.style.SUCCESS(f"\nAll {len(results)} invariants hold ({elapsed:.2f}s)"))
+        elif options['fix']:
+            repaired = sum(r.repaired or 0 for r in results)
+            self.stdout.write(f"\n{total} violations found, {repaired} rows repaired ({elapsed:.2f}s)")
+        else:
+            self.stdout.write(f"\n{total} violations found ({elapsed:.2f}s); run with --fix to repair")
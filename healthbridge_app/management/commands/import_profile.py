@@ -0,0 +1,129 @@
+"""
+Measure worker start-up import cost and fail when it regresses.
+Usage:
+    python manage.py import_profile                          # report
+    python manage.py import_profile --save import_baseline.json
+    python manage.py import_profile --baseline import_baseline.json --tolerance 20 --budget-ms 900
+
+Boots the project the way a gunicorn worker does (django.setup(), the WSGI
+application, the URLconf, then the storage backend as the first page with an
+image would) in a fresh interpreter under ``python -X importtime``
+and parses the per-module timings. Modules listed with --forbid (by default
+the Supabase SDK) must not be imported at start-up at all; they belong behind
+a lazy import at their first use.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BOOT_SCRIPT = """
+import django
+django.setup()
+from HealthBridge.wsgi import application
+from django.urls import get_resolver
+get_resolver().url_patterns
+# First page with a donation image: instantiates the default storage backend
+from django.core.files.storage import default_storage
+default_storage.url('donations/probe.png')
+"""
+
+DEFAULT_FORBIDDEN = ['supabase', 'realtime', 'postgrest', 'storage3', 'resend']
+
+
+def parse_importtime(stderr):
+    """Yield (module, self_us, cumulative_us, depth) from ``-X importtime`` output"""
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        # "import time:       223 |     191493 |   supabase_auth" (two spaces per nesting level)
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        yield name.strip(), int(self_us), int(cumulative_us), depth
+
+
+class Command(BaseCommand):
+    help = 'Profile imports needed to boot a web worker and enforce an import-time budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Fresh interpreter runs; the fastest is kept')
+        parser.add_argument('--top', type=int, default=15, help='Packages to list (default: 15)')
+        parser.add_argument('--budget-ms', type=float, default=None, help='Fail if total import time exceeds this')
+        parser.add_argument('--baseline', default=None, help='Previous --save output to compare against')
+        parser.add_argument('--tolerance', type=float, default=20.0, help='Allowed regression vs baseline, percent')
+        parser.add_argument('--save', default=None, help='Write this run as a JSON baseline')
+        parser.add_argument(
+            '--forbid',
+            default=','.join(DEFAULT_FORBIDDEN),
+            help='Comma-separated top-level packages that must not load at start-up'
+        )
+
+    def handle(self, *args, **options):
+        runs = [self.profile_once() for _ in range(max(1, options['repeat']))]
+        best = min(runs, key=lambda run: run['total_us'])
+        packages = {
+            name: statistics.median(run['packages'].get(name, 0) for run in runs)
+            for name in best['packages']
+        }
+        total_ms = best['total_us'] / 1000
+
+        self.stdout.write(f"Worker start-up imports: {total_ms:.0f} ms across {best['modules']} modules "
+                          f"(best of {len(runs)})")
+        self.stdout.write(f"{'package':<32}{'self ms':>10}")
+        for name, us in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f"{name:<32}{us / 1000:>10.1f}")
+
+        problems = []
+        forbidden = [name.strip() for name in options['forbid'].split(',') if name.strip()]
+        loaded = sorted(name for name in forbidden if name in best['packages'])
+        if loaded:
+            problems.append(f"imported at start-up but should be lazy: {', '.join(loaded)}")
+        if options['budget_ms'] is not None and total_ms > options['budget_ms']:
+            problems.append(f"total {total_ms:.0f} ms exceeds the {options['budget_ms']:.0f} ms budget")
+        if options['baseline']:
+            problems.extend(self.compare(options['baseline'], total_ms, packages, options['tolerance']))
+
+        if options['save']:
+            with open(options['save'], 'w') as f:
+                json.dump({'total_ms': round(total_ms, 1),
+                           'packages_ms': {k: round(v / 1000, 2) for k, v in packages.items()}}, f, indent=2)
+            self.stdout.write(f"Baseline written to {options['save']}")
+
+        if problems:
+            raise CommandError('Import budget failed: ' + '; '.join(problems))
+        self.stdout.write(self.style.SUCCESS('Import budget OK'))
+
+    def profile_once(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'HealthBridge.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Boot script failed:\n{result.stderr[-2000:]}")
+        packages = defaultdict(int)
+        total = modules = 0
+        for name, self_us, _, _ in parse_importtime(result.stderr):
+            packages[name.split('.')[0]] += self_us
+            total += self_us
+            modules += 1
+        return {'total_us': total, 'packages': dict(packages), 'modules': modules}
+
+    def compare(self, path, total_ms, packages, tolerance):
+        with open(path) as f:
+            baseline = json.load(f)
+        problems = []
+        limit = baseline['total_ms'] * (1 + tolerance / 100)
+        self.stdout.write(f"Baseline total {baseline['total_ms']:.0f} ms -> {total_ms:.0f} ms")
+        if total_ms > limit:
+            problems.append(f"total {total_ms:.0f} ms is over baseline {baseline['total_ms']:.0f} ms +{tolerance:.0f}%")
+        new = sorted(set(packages) - set(baseline['packages_ms']), key=lambda name: -packages[name])
+        heavy_new = [name for name in new if packages[name] / 1000 > 10]
+        if heavy_new:
+            problems.append(f"new packages costing >10 ms at start-up: {', '.join(heavy_new)}")
+        return problems
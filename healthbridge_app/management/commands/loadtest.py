@@ -0,0 +1,294 @@
+"""
+Scripted load driver for the core user journeys.
+Usage:
+    python manage.py seed_benchmark_data --manifest bench_manifest.json
+    python manage.py runserver --noreload   (or gunicorn HealthBridge.wsgi)
+    python manage.py loadtest --base-url http://127.0.0.1:8000 --duration 60 --output report.json
+    python manage.py loadtest ... --compare previous_report.json
+
+Each virtual user logs in as a seeded donor or recipient and loops over the
+dashboards, search, autocomplete, the notification bell and create_request;
+the deliver -> claim journey logs in the donor and recipient that own a seeded
+matched request. Latency percentiles and queries per request (read from the
+Server-Timing header added by QueryInstrumentationMiddleware) are written to a
+JSON report that can be diffed across commits. The seeded users are not staff,
+so outside DEBUG start the server with QUERY_INSTRUMENTATION_ENABLED=True and
+QUERY_INSTRUMENTATION_SERVER_TIMING=True to get query counts.
+
+Every virtual user comes from the same address, so a server with rate
+limiting on (healthbridge_app.ratelimit) refuses much of the load; start it
+with RATELIMIT_ENABLED=False to measure capacity. Refused requests are
+counted as `limited`, not as errors.
+"""
+import asyncio
+import json
+import logging
+import random
+import re
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import httpx
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+QUERY_COUNT = re.compile(r'desc="(\d+) queries"')
+
+RECIPIENT_ACTIONS = {
+    'recipient_dashboard': 25,
+    'search': 15,
+    'autocomplete': 25,
+    'notification_bell': 20,
+    'create_request': 8,
+    'deliver_and_claim': 7,
+}
+DONOR_ACTIONS = {
+    'donor_dashboard': 35,
+    'search': 10,
+    'autocomplete': 15,
+    'notification_bell': 25,
+    'deliver_and_claim': 15,
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+class LoadDriver:
+    def __init__(self, base_url, manifest, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.manifest = manifest
+        self.timeout = timeout
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.limited = defaultdict(int)  # 429s from the rate limiter
+        self.clients = {}
+        self.login_locks = defaultdict(asyncio.Lock)
+        self.deliverable = list(manifest['deliverable'])
+        random.shuffle(self.deliverable)
+
+    # ---------- plumbing ----------
+    async def timed(self, name, client, method, url, **kwargs):
+        headers = kwargs.pop('headers', {})
+        if method == 'POST':
+            headers['X-CSRFToken'] = client.cookies.get('csrftoken', '')
+            headers['Referer'] = self.base_url + '/'
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, headers=headers, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - start) * 1000)
+        match = QUERY_COUNT.search(response.headers.get('server-timing', ''))
+        if match:
+            self.queries[name].append(int(match.group(1)))
+        if response.status_code == 429:
+            self.limited[name] += 1
+        elif response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    async def client_for(self, email):
+        """A logged-in client per account, shared by every journey that needs it"""
+        async with self.login_locks[email]:
+            if email not in self.clients:
+                client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout)
+                await client.get('/login/')  # sets the csrftoken cookie
+                response = await self.timed('login', client, 'POST', '/login/', data={
+                    'email': email, 'password': self.manifest['password'],
+                })
+                if response is None or response.status_code != 302:
+                    if response is not None and response.status_code < 400:
+                        self.errors['login'] += 1  # form re-rendered: bad credentials
+                    await client.aclose()
+                    return None
+                self.clients[email] = client
+            return self.clients[email]
+
+    # ---------- journeys ----------
+    async def donor_dashboard(self, client):
+        await self.timed('donor_dashboard', client, 'GET', '/dashboard/donor/')
+
+    async def recipient_dashboard(self, client):
+        await self.timed('recipient_dashboard', client, 'GET', '/dashboard/recipient/')
+
+    async def search(self, client):
+        term = random.choice(self.manifest['search_terms'])
+        await self.timed('search', client, 'GET', '/donations/search/', params={'q': term[:random.randint(3, len(term))]})
+
+    async def autocomplete(self, client):
+        term = random.choice(self.manifest['search_terms']).lower()
+        for length in range(2, min(len(term), 6) + 1):  # one call per keystroke
+            await self.timed('autocomplete', client, 'GET', '/donations/api/autocomplete/', params={'q': term[:length]})
+
+    async def notification_bell(self, client):
+        await self.timed('notification_bell', client, 'GET', '/notifications/api/unread-count/')
+        if random.random() < 0.3:
+            await self.timed('notification_list', client, 'GET', '/notifications/api/')
+
+    async def create_request(self, client):
+        data = {
+            'medicine_name': random.choice(self.manifest['search_terms']),
+            'quantity': str(random.randint(1, 5)),
+            'urgency': random.choice(['low', 'medium', 'high', 'critical']),
+            'reason': 'Load test',
+        }
+        available = self.manifest['available_donation_ids']
+        if available and random.random() < 0.5:
+            data['donation_id'] = str(random.choice(available))
+        await self.timed('create_request', client, 'POST', '/requests/create/', data=data)
+
+    async def deliver_and_claim(self, client):
+        if not self.deliverable:
+            return await self.notification_bell(client)
+        item = self.deliverable.pop()
+        donor = await self.client_for(item['donor'])
+        recipient = await self.client_for(item['recipient'])
+        if donor is None or recipient is None:
+            return
+        await self.timed('deliver', donor, 'POST', f"/requests/{item['request_id']}/deliver/")
+        await self.timed('claim', recipient, 'POST', f"/requests/{item['request_id']}/claim/")
+
+    async def virtual_user(self, email, actions, deadline, think_time):
+        client = await self.client_for(email)
+        if client is None:
+            return
+        names, weights = list(actions), list(actions.values())
+        while time.monotonic() < deadline:
+            action = random.choices(names, weights=weights)[0]
+            await getattr(self, action)(client)
+            if think_time:
+                await asyncio.sleep(random.uniform(0, think_time))
+
+    async def run(self, virtual_users, duration, think_time):
+        donors, recipients = self.manifest['donors'], self.manifest['recipients']
+        deadline = time.monotonic() + duration
+        tasks = []
+        for i in range(virtual_users):
+            if i % 3 == 0 and donors:
+                email, actions = donors[i // 3 % len(donors)], DONOR_ACTIONS
+            else:
+                email, actions = recipients[i % len(recipients)], RECIPIENT_ACTIONS
+            tasks.append(self.virtual_user(email, actions, deadline, think_time))
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            await asyncio.gather(*(client.aclose() for client in self.clients.values()))
+
+    def report(self):
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            latencies = sorted(self.latencies[name])
+            queries = self.queries[name]
+            endpoints[name] = {
+                'count': len(latencies),
+                'errors': self.errors[name],
+                'limited': self.limited[name],
+                'p50_ms': round(percentile(latencies, 50), 2) if latencies else None,
+                'p95_ms': round(percentile(latencies, 95), 2) if latencies else None,
+                'p99_ms': round(percentile(latencies, 99), 2) if latencies else None,
+                'mean_ms': round(sum(latencies) / len(latencies), 2) if latencies else None,
+                'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+                'queries_max': max(queries) if queries else None,
+            }
+        return endpoints
+
+
+class Command(BaseCommand):
+    help = 'Drive concurrent load through the core user journeys and write a latency/query report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to load (default: http://127.0.0.1:8000)')
+        parser.add_argument('--manifest', default='bench_manifest.json', help='Manifest written by seed_benchmark_data')
+        parser.add_argument('--users', type=int, default=20, help='Concurrent virtual users (default: 20)')
+        parser.add_argument('--duration', type=float, default=30, help='Test duration in seconds (default: 30)')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Max random pause between actions, seconds')
+        parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout in seconds')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible action mixes')
+        parser.add_argument('--output', default='loadtest_report.json', help='Where to write the JSON report')
+        parser.add_argument('--compare', default=None, help='Previous report to compare p95 latency and queries against')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['manifest']) as f:
+                manifest = json.load(f)
+        except OSError as e:
+            raise CommandError(f"Cannot read manifest: {e}. Run seed_benchmark_data first.")
+
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+        logging.getLogger('httpx').setLevel(logging.WARNING)  # one INFO line per request otherwise
+
+        driver = LoadDriver(options['base_url'], manifest, options['timeout'])
+        started = datetime.now(timezone.utc)
+        asyncio.run(driver.run(options['users'], options['duration'], options['think_time']))
+        elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+
+        endpoints = driver.report()
+        total = sum(e['count'] for e in endpoints.values())
+        report = {
+            'meta': {
+                'git_commit': self.git_commit(),
+                'started_at': started.isoformat(),
+                'duration_s': round(elapsed, 2),
+                'base_url': options['base_url'],
+                'virtual_users': options['users'],
+                'total_requests': total,
+                'errors': sum(e['errors'] for e in endpoints.values()),
+                'limited': sum(e['limited'] for e in endpoints.values()),
+                'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+            },
+            'endpoints': endpoints,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.print_table(endpoints)
+        self.stdout.write(
+            f"\n{total} requests in {elapsed:.1f}s ({report['meta']['throughput_rps']} req/s), "
+            f"{report['meta']['errors']} errors, {report['meta']['limited']} rate limited. Report: {options['output']}"
+        )
+        if options['compare']:
+            self.compare(options['compare'], endpoints)
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_table(self, endpoints):
+        self.stdout.write(f"{'endpoint':<22}{'count':>7}{'err':>5}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+        for name, e in endpoints.items():
+            self.stdout.write(
+                f"{name:<22}{e['count']:>7}{e['errors']:>5}"
+                f"{e['p50_ms'] or 0:>9.1f}{e['p95_ms'] or 0:>9.1f}{e['p99_ms'] or 0:>9.1f}"
+                f"{e['queries_mean'] if e['queries_mean'] is not None else '-':>9}"
+            )
+
+    def compare(self, path, endpoints):
+        with open(path) as f:
+            baseline = json.load(f)
+        self.stdout.write(f"\nCompared with {path} (commit {baseline['meta'].get('git_commit')}):")
+        for name, e in endpoints.items():
+            old = baseline['endpoints'].get(name)
+            if not old or old['p95_ms'] is None or e['p95_ms'] is None:
+                continue
+            delta = (e['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0
+            style = self.style.ERROR if delta > 10 else self.style.SUCCESS if delta < -10 else str
+            self.stdout.write(style(
+                f"  {name:<22} p95 {old['p95_ms']:>8.1f} -> {e['p95_ms']:>8.1f} ms ({delta:+.0f}%)"
+                f"   queries {old['queries_mean']} -> {e['queries_mean']}"
+            ))
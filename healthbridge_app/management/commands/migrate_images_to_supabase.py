@@ -1,53 +1,87 @@
 """
 Management command to migrate existing local images to Supabase Storage.
-Usage: python manage.py migrate_images_to_supabase
+Usage: python manage.py migrate_images_to_supabase [--workers 8] [--resume]
+
+Donations are walked in keyset chunks; each chunk's files are uploaded in
+parallel and its image paths saved with one bulk UPDATE. An interrupted run
+continues from its checkpoint with --resume.
 """
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from donations.models import Donation
 from django.core.files import File
+from healthbridge_app.batching import map_io, run_batches
 import os
 
 
 class Command(BaseCommand):
     help = 'Migrate existing local images to Supabase Storage'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50, help='Donations per chunk (default: 50)')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel uploads (default: 4)')
+        parser.add_argument('--resume', action='store_true', help='Continue an interrupted run from its checkpoint')
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.WARNING('Starting image migration to Supabase Storage...'))
-        
+
         # Get all donations with images
         donations = Donation.objects.exclude(image='').exclude(image__isnull=True)
         total = donations.count()
-        migrated = 0
-        skipped = 0
-        
+        self.migrated = 0
+        self.skipped = 0
+        self.workers = options['workers']
+
         self.stdout.write(f'Found {total} donations with images')
-        
+
+        run_batches(
+            donations, self.migrate_chunk,
+            name='batch:migrate_images_to_supabase',
+            chunk_size=options['chunk_size'],
+            resume=options['resume'],
+            stdout=self.stdout,
+            label='migrate_images_to_supabase',
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Migration complete!'))
+        self.stdout.write(f'Migrated: {self.migrated}')
+        self.stdout.write(f'Skipped: {self.skipped}')
+        self.stdout.write(f'Total: {total}')
+
+    def migrate_chunk(self, donations):
+        local = []
         for donation in donations:
             # Check if file exists locally
-            local_path = donation.image.path if hasattr(donation.image, 'path') else None
-            
-            if local_path and os.path.exists(local_path):
-                try:
-                    # Re-save the image (this will trigger upload to Supabase)
-                    with open(local_path, 'rb') as f:
-                        file_name = os.path.basename(local_path)
-                        donation.image.save(file_name, File(f), save=True)
-                    
-                    migrated += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(f'✓ Migrated: {donation.medicine_name} - {file_name}')
-                    )
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'✗ Failed to migrate {donation.medicine_name}: {str(e)}')
-                    )
+            local_path = os.path.join(settings.MEDIA_ROOT, donation.image.name)
+            if os.path.exists(local_path):
+                local.append((donation, local_path))
             else:
-                skipped += 1
+                self.skipped += 1
                 self.stdout.write(
-                    self.style.WARNING(f'⊘ Skipped {donation.medicine_name}: Local file not found')
+                    self.style.WARNING(f'⊘ Skipped {donation.name}: Local file not found')
                 )
-        
-        self.stdout.write(self.style.SUCCESS(f'\n✅ Migration complete!'))
-        self.stdout.write(f'Migrated: {migrated}')
-        self.stdout.write(f'Skipped: {skipped}')
-        self.stdout.write(f'Total: {total}')
+
+        uploaded = []
+        for (donation, local_path), name, error in map_io(self.upload, local, self.workers):
+            if error:
+                self.stdout.write(
+                    self.style.ERROR(f'✗ Failed to migrate {donation.name}: {str(error)}')
+                )
+                continue
+            donation.image.name = name
+            uploaded.append(donation)
+            self.migrated += 1
+            self.stdout.write(
+                self.style.SUCCESS(f'✓ Migrated: {donation.name} - {os.path.basename(local_path)}')
+            )
+
+        # Save the new paths without a save() (and expiry signal) per donation
+        Donation.objects.bulk_update(uploaded, ['image'])
+
+    def upload(self, item):
+        """Upload one local file through the image field's storage; returns the stored name"""
+        donation, local_path = item
+        field = donation.image.field
+        with open(local_path, 'rb') as f:
+            name = field.generate_filename(donation, os.path.basename(local_path))
+            return field.storage.save(name, File(f), max_length=field.max_length)
@@ -0,0 +1,46 @@
+"""
+Delete expired sessions from the database in small chunks.
+Usage: python manage.py purge_sessions [--batch-size 1000] [--pause 0.1] [--dry-run]
+
+clearsessions removes every expired row in one DELETE, which on a large
+django_session table holds locks for as long as it runs. This deletes
+`--batch-size` expired keys at a time (found through the expire_date
+index), each in its own short transaction, pausing between chunks. Cached
+copies (cached_db sessions) expire from the cache on their own. Run every
+CLEAR_SESSIONS_SCHEDULE by run_scheduler.
+"""
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Sessions deleted per transaction (default: 1000)')
+        parser.add_argument('--pause', type=float, default=0.1, help='Seconds to sleep between chunks (default: 0.1)')
+        parser.add_argument('--dry-run', action='store_true', help='Count expired sessions without deleting them')
+
+    def handle(self, *args, **options):
+        expired = Session.objects.filter(expire_date__lt=timezone.now())
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} expired sessions would be deleted")
+            return
+
+        deleted = chunks = 0
+        start = time.perf_counter()
+        while True:
+            keys = list(expired.values_list('session_key', flat=True)[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            chunks += 1
+            if len(keys) < options['batch_size']:
+                break
+            time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {deleted} expired sessions in {chunks} chunks, {time.perf_counter() - start:.1f}s"
+        ))
@@ -0,0 +1,28 @@
+"""
+Release allocations whose reservation deadline (Allocation.reserved_until) has passed.
+Usage: python manage.py release_reservations [--dry-run]
+
+The units go back to their donations; the requests holding them are
+cancelled or returned to pending according to their urgency's
+ReservationPolicy, and the recipients notified. Run every
+RELEASE_RESERVATIONS_SCHEDULE by run_scheduler.
+"""
+from django.core.management.base import BaseCommand
+
+from requests.reservations import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Release expired donation reservations and cancel or requeue the requests holding them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Count what would be released without changing anything')
+        parser.add_argument('--batch-size', type=int, default=500, help='Allocations released per transaction (default: 500)')
+
+    def handle(self, *args, **options):
+        totals = release_expired_reservations(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'Would release' if options['dry_run'] else 'Released'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['released']} reservations: "
+            f"{totals['cancelled']} requests cancelled, {totals['requeued']} requeued"
+        ))
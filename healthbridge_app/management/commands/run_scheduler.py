@@ -0,0 +1,55 @@
+"""
+Run the periodic jobs from healthbridge_app/tasks.py.
+Usage:
+    python manage.py run_scheduler           # long-running process (Procfile: scheduler)
+    python manage.py run_scheduler --list    # show each job and when it is next due
+    python manage.py run_scheduler --once    # run whatever is due, then exit (cron / CI)
+
+The process sleeps until the next job is due rather than polling: expiry
+alerts wake it when the next donation reaches an alert threshold. Start as
+many as you like; one holds the lock and the others wait as standbys.
+"""
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from healthbridge_app.scheduler import Scheduler
+from healthbridge_app.tasks import get_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run scheduled jobs (expiry alerts, cleanup) with single-instance locking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list', action='store_true', help='Print the jobs and their next run, then exit')
+        parser.add_argument('--once', action='store_true', help='Run the jobs that are due now, then exit')
+        parser.add_argument('--identity', default=None, help='Lock owner name (default: host:pid)')
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler(get_jobs(), identity=options['identity'])
+
+        if options['list']:
+            now = timezone.now()
+            planned = {job.name: due for due, job, _ in scheduler.schedule(now)}
+            for job in scheduler.jobs:
+                due = planned.get(job.name)
+                when = timezone.localtime(due).strftime('%Y-%m-%d %H:%M %Z') if due else 'idle'
+                overdue = ' (due now)' if due and due <= now else ''
+                self.stdout.write(f"{job.name:<22} {job.describe():<32} {when}{overdue}")
+            return
+
+        if options['once']:
+            if not scheduler.acquire_lock():
+                raise CommandError('Another scheduler holds the lock')
+            try:
+                scheduler.run_due()
+            finally:
+                scheduler.release_lock()
+            return
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: scheduler.stop())
+        self.stdout.write(f"Scheduler {scheduler.identity} started with {len(scheduler.jobs)} jobs")
+        scheduler.run_forever()
+        self.stdout.write(self.style.SUCCESS('Scheduler stopped'))
@@ -0,0 +1,55 @@
+"""
+Seed a local database with benchmark data for the load driver.
+Usage: python manage.py seed_benchmark_data --users 200 --donations 2000 --manifest bench_manifest.json
+"""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from healthbridge_app.seeding import DEFAULT_PASSWORD, DatasetSeeder
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Generate users, donations, requests and notifications for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Number of users (default: 200)')
+        parser.add_argument('--donations', type=int, default=2000, help='Number of donations (default: 2000)')
+        parser.add_argument('--requests', type=int, default=1000, help='Number of medicine requests (default: 1000)')
+        parser.add_argument('--notifications', type=int, default=5000, help='Number of notifications (default: 5000)')
+        parser.add_argument('--prefix', default='bench', help='Email prefix for generated users (default: bench)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible datasets')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password given to every generated user')
+        parser.add_argument(
+            '--manifest',
+            default='bench_manifest.json',
+            help='Where to write the manifest consumed by the loadtest command'
+        )
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(email__startswith=f"{prefix}-").exists():
+            raise CommandError(
+                f"Users with prefix '{prefix}' already exist. Use another --prefix or a fresh database."
+            )
+
+        seeder = DatasetSeeder(prefix=prefix, seed=options['seed'], password=options['password'])
+        manifest = seeder.seed(
+            users=options['users'],
+            donations=options['donations'],
+            requests=options['requests'],
+            notifications=options['notifications'],
+        )
+
+        with open(options['manifest'], 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(manifest['donors'])} donors, {len(manifest['recipients'])} recipients, "
+            f"{options['donations']} donations, {options['requests']} requests, "
+            f"{options['notifications']} notifications"
+        ))
+        self.stdout.write(f"Manifest written to {options['manifest']}")
@@ -0,0 +1,97 @@
+"""
+Bulk-generate a large, consistent dataset for performance work.
+Usage: python manage.py seed_scale --users 100000 --donations 1000000
+
+Rows are streamed in chunks through bulk_create, or through COPY FROM STDIN
+when the database is PostgreSQL (--method auto, the default). Works on the
+local SQLite database as well as a local Postgres; never point it at the
+production Supabase database.
+"""
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from healthbridge_app.seeding import DEFAULT_PASSWORD, BulkCreateWriter, CopyWriter, ScaleSeeder
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Stream a large users/donations/requests/notifications dataset into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Number of users (default: 100000)')
+        parser.add_argument('--donations', type=int, default=1000000, help='Number of donations (default: 1000000)')
+        parser.add_argument('--requests', type=int, default=None, help='Number of requests (default: donations / 2)')
+        parser.add_argument(
+            '--notifications', type=int, default=None, help='Number of notifications (default: donations * 2)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows generated per chunk (default: 10000)')
+        parser.add_argument(
+            '--method',
+            choices=['auto', 'bulk', 'copy'],
+            default='auto',
+            help='bulk_create, Postgres COPY, or COPY when available (default: auto)'
+        )
+        parser.add_argument('--prefix', default='scale', help='Email prefix for generated users (default: scale)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible datasets')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD, help='Password given to every generated user')
+        parser.add_argument('--manifest', default=None, help='Optionally write a loadtest manifest here')
+
+    def handle(self, *args, **options):
+        if options['users'] < 2:
+            raise CommandError('--users must be at least 2 (donors and recipients are both needed)')
+        prefix = options['prefix']
+        if User.objects.filter(email__startswith=f"{prefix}-").exists():
+            raise CommandError(
+                f"Users with prefix '{prefix}' already exist. Use another --prefix or a fresh database."
+            )
+
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if connection.vendor == 'postgresql' else 'bulk'
+        if method == 'copy' and connection.vendor != 'postgresql':
+            raise CommandError('--method copy requires a PostgreSQL database')
+        writer = CopyWriter() if method == 'copy' else BulkCreateWriter()
+
+        if connection.vendor == 'sqlite':
+            # Throwaway benchmark data: skip the fsync after every chunk commit
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA synchronous = OFF')
+
+        donations = options['donations']
+        requests = options['requests'] if options['requests'] is not None else donations // 2
+        notifications = options['notifications'] if options['notifications'] is not None else donations * 2
+
+        started = time.perf_counter()
+        seeder = ScaleSeeder(
+            writer=writer,
+            chunk_size=options['chunk_size'],
+            progress=self.progress,
+            prefix=prefix,
+            seed=options['seed'],
+            password=options['password'],
+        )
+        manifest = seeder.seed(
+            users=options['users'],
+            donations=donations,
+            requests=requests,
+            notifications=notifications,
+        )
+        elapsed = time.perf_counter() - started
+
+        total = options['users'] + donations + requests + notifications
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {total:,} rows via {method} in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)"
+        ))
+        if options['manifest']:
+            with open(options['manifest'], 'w') as f:
+                json.dump(manifest, f, indent=2)
+            self.stdout.write(f"Manifest written to {options['manifest']}")
+
+    def progress(self, label, done, total):
+        self.stdout.write(f"  {label}: {done:,}/{total:,}", ending='\r' if done < total else '\n')
+        self.stdout.flush()
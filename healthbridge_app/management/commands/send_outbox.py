@@ -0,0 +1,53 @@
+"""
+Email outbox worker.
+Usage:
+    python manage.py send_outbox            # long-running worker (Procfile: worker)
+    python manage.py send_outbox --drain    # send everything due, then exit (cron / CI)
+
+Several workers can run side by side: rows are claimed with
+SELECT ... FOR UPDATE SKIP LOCKED, so each email is leased to one worker.
+"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox with batching, rate limiting and retries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drain', action='store_true', help='Exit once no email is due')
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows claimed per iteration')
+        parser.add_argument('--rate', type=float, default=None, help='Max messages per second (0 = unlimited)')
+        parser.add_argument('--concurrency', type=int, default=None, help='Parallel sends per worker')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when idle (default: 5)')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker = OutboxWorker(
+            batch_size=options['batch_size'], rate=options['rate'], concurrency=options['concurrency'],
+        )
+        try:
+            while not self.stopping:
+                if worker.run_once():
+                    continue
+                if options['drain']:
+                    break
+                time.sleep(options['poll_interval'])
+        finally:
+            worker.close()
+
+        stats = worker.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"Outbox: {stats['sent']} sent, {stats['retried']} scheduled for retry, {stats['failed']} failed"
+        ))
+
+    def stop(self, signum, frame):
+        # Finish the current batch so no claimed row is left leased
+        self.stopping = True
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('healthbridge_app', '0009_jobstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobstate',
+            name='checkpoint',
+            field=models.JSONField(blank=True, default=dict, help_text='Resume point of an interrupted batch run'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated manually: lowercase stored emails so sign-in can use an exact lookup
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+import healthbridge_app.models
+
+BATCH_SIZE = 10000
+
+
+def lowercase_emails(apps, schema_editor):
+    """
+    Refuse to run if two accounts differ only by the case of their email
+    (they have to be merged by hand first), then lowercase the rest one
+    primary key range at a time, so no single UPDATE holds the table for long
+    """
+    User = apps.get_model('healthbridge_app', 'CustomUser')
+    clashes = list(
+        User.objects.annotate(lower_email=Lower('email')).order_by()
+        .values('lower_email').annotate(n=Count('id')).filter(n__gt=1)
+        .values_list('lower_email', flat=True)[:20]
+    )
+    if clashes:
+        raise RuntimeError(
+            "Accounts whose emails differ only by case must be merged before this migration: "
+            + ", ".join(clashes)
+        )
+
+    last = User.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    for start in range(0, last + 1, BATCH_SIZE):
+        User.objects.filter(pk__gte=start, pk__lt=start + BATCH_SIZE).exclude(
+            email=Lower('email')
+        ).update(email=Lower('email'))
+
+
+class Migration(migrations.Migration):
+    atomic = False  # commit each batch of the backfill on its own
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('healthbridge_app', '0010_jobstate_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', healthbridge_app.models.CustomUserManager()),
+            ],
+        ),
+        migrations.RunPython(lowercase_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(Lower('email'), name='user_email_lower_uniq'),
+        ),
+    ]
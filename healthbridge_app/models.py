@@ -2,11 +2,23 @@ from uuid import uuid4
 from datetime import date, timedelta
 
 from django.conf import settings
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 
 
+class CustomUserManager(UserManager):
+    """Emails are stored lowercase, so sign-in looks them up with an exact match on the unique index"""
+
+    @classmethod
+    def normalize_email(cls, email):
+        return (email or '').strip().lower()
+
+    def get_by_natural_key(self, username):
+        return self.get(**{self.model.USERNAME_FIELD: self.normalize_email(username)})
+
+
 class CustomUser(AbstractUser):
     class UserType(models.TextChoices):
         DONOR = 'donor', 'Donor'
@@ -34,6 +46,19 @@ class CustomUser(AbstractUser):
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
 
+    objects = CustomUserManager()
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # case-insensitive uniqueness for rows written around save(), e.g. bulk_create or update()
+            models.UniqueConstraint(Lower('email'), name='user_email_lower_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.email:
+            self.email = CustomUserManager.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.get_user_type_display() if self.user_type else 'No Role'})"
     
@@ -61,6 +86,26 @@ class BrandMedicine(models.Model):
         return f"{self.brand_name} ({self.generic.name})"
 
 
+class JobState(models.Model):
+    """
+    Run history of a run_scheduler job or a batch command (healthbridge_app.batching);
+    the row named LOCK_NAME is the scheduler's single-instance lease
+    """
+    LOCK_NAME = '__scheduler__'
+
+    name = models.CharField(max_length=100, unique=True)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+    last_success_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True, help_text="Seconds")
+    last_error = models.TextField(blank=True, default='')
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_until = models.DateTimeField(null=True, blank=True)
+    checkpoint = models.JSONField(default=dict, blank=True, help_text="Resume point of an interrupted batch run")
+
+    def __str__(self):
+        return self.name
+
+
 # ============================================================================
 # NOTE: Models have been moved to their respective modular apps.
 # This avoids model conflicts and follows Django best practices.
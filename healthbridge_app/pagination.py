@@ -0,0 +1,122 @@
+"""
+Keyset (cursor) pagination for list views
+
+keyset_page() returns one page of a queryset ordered by a field and the
+primary key, descending unless asked otherwise. The next page is ``WHERE
+(field, pk) < (last row) ORDER BY field DESC, pk DESC LIMIT n``: with an index on the owner
+column, the field and the pk it reads only the rows it shows, however deep
+the page, where OFFSET reads and throws away every row before it. The
+position travels as an opaque ``after`` cursor in the query string; a cursor
+that does not decode falls back to the first page. status_counts() gives the
+per-status header those pages show, in one aggregate query.
+"""
+import base64
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Q
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+STATUS_COUNTS_TTL = 300
+
+
+def encode_cursor(field, row):
+    value = field.value_to_string(row)
+    payload = json.dumps([value, row.pk], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(field, cursor):
+    """(value, pk) from a cursor made by encode_cursor, or None if it is not one"""
+    if not cursor:
+        return None
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return field.to_python(value), int(pk)
+    except (ValueError, TypeError, ValidationError):
+        return None
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, is_first, limit):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+        self.limit = limit
+        self.next_query = None   # query strings for the pager links, set by paginate()
+        self.first_query = None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_page(queryset, order_field, after=None, limit=DEFAULT_PAGE_SIZE, descending=True):
+    """
+    One page of `queryset` newest first by `order_field` (then pk), or oldest
+    first with descending=False, starting after the row the `after` cursor
+    points at.
+    """
+    field = queryset.model._meta.get_field(order_field)
+    sign, op = ('-', 'lt') if descending else ('', 'gt')
+    queryset = queryset.order_by(f'{sign}{order_field}', f'{sign}pk')
+    position = decode_cursor(field, after)
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(Q(**{f'{order_field}__{op}': value}) | Q(**{order_field: value, f'pk__{op}': pk}))
+    rows = list(queryset[:limit + 1])
+    next_cursor = encode_cursor(field, rows[limit - 1]) if len(rows) > limit else None
+    return KeysetPage(rows[:limit], next_cursor, position is None, limit)
+
+
+def page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        return min(max(int(request.GET.get('limit', default)), 1), MAX_PAGE_SIZE)
+    except ValueError:
+        return default
+
+
+def paginate(request, queryset, order_field, default_limit=DEFAULT_PAGE_SIZE, descending=True):
+    """keyset_page() driven by ?after= and ?limit=, with pager query strings that keep the other parameters"""
+    page = keyset_page(queryset, order_field, request.GET.get('after'), page_size(request, default_limit), descending)
+    return link_pages(request, page)
+
+
+def link_pages(request, page):
+    """Set page.first_query and page.next_query from the request's query string"""
+    params = request.GET.copy()
+    params.pop('after', None)
+    page.first_query = params.urlencode()
+    if page.has_next:
+        params['after'] = page.next_cursor
+        page.next_query = params.urlencode()
+    return page
+
+
+def status_counts(queryset, statuses, cache_key=None, fresh=True):
+    """
+    {'total': n, <status value>: n, ...} for a TextChoices status field, in
+    one aggregate query. With a cache_key the result is kept for
+    STATUS_COUNTS_TTL seconds and fresh=False reuses it: the aggregate reads
+    every row of the owner, so deeper pages of a long list take it from the
+    cache while the first page, where users land after a change, recounts.
+    """
+    if cache_key and not fresh:
+        counts = cache.get(cache_key)
+        if counts is not None:
+            return counts
+    counts = queryset.order_by().aggregate(
+        total=Count('pk'),
+        **{status: Count('pk', filter=Q(status=status)) for status in statuses.values},
+    )
+    if cache_key:
+        cache.set(cache_key, counts, STATUS_COUNTS_TTL)
+    return counts
@@ -0,0 +1,119 @@
+"""
+Token-bucket rate limiting for views
+
+@ratelimit('autocomplete') gives every client (by default its IP address)
+a bucket of tokens in the cache: each request takes one, and the bucket
+refills at a steady rate up to its size. The rate comes from the
+RATELIMIT_<SCOPE> setting as "burst/seconds": `burst` requests at once,
+refilled over `seconds`. An empty bucket answers 429 with Retry-After before
+the view runs, so a flood of logins or keystrokes costs a cache read instead
+of a password hash or a query.
+
+Updates to a bucket are serialized per process by a striped lock. Workers
+sharing the cache (REDIS_URL) read and write buckets without a lock between
+them, so simultaneous requests in different workers can each spend the same
+token: the limit holds to within one request per worker. A bucket left idle
+for its `seconds` is full again and expires from the cache.
+"""
+import hashlib
+import logging
+import threading
+import time
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+from .events import log_event
+
+LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'30/10' -> (30, 10.0): a bucket of 30 tokens refilled over 10 seconds"""
+    burst, seconds = rate.split('/')
+    return int(burst), float(seconds)
+
+
+def client_ip(request):
+    """
+    The client's address: REMOTE_ADDR, or with RATELIMIT_PROXY_COUNT proxies
+    in front of the app the X-Forwarded-For entry the outermost one added
+    (entries to its left are whatever the client sent)
+    """
+    proxies = settings.RATELIMIT_PROXY_COUNT
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def user_or_ip(request):
+    """The user id for signed-in users, who may share an address, otherwise the client IP"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return client_ip(request)
+
+
+def posted_email_and_ip(request):
+    """
+    The email a login form was posted with and the client's address, hashed:
+    guesses at one account are limited per address, so a flood from
+    elsewhere can't lock its owner out
+    """
+    email = request.POST.get('email', '').strip().lower()
+    if not email:
+        return None
+    return hashlib.sha256(f"{email}|{client_ip(request)}".encode()).hexdigest()[:32]
+
+
+def take(bucket, burst, seconds):
+    """Take a token from bucket: (True, 0) or, when it is empty, (False, seconds until the next token)"""
+    now = time.time()
+    with _locks[hash(bucket) % LOCK_STRIPES]:
+        tokens, updated, refused = cache.get(bucket) or (burst, now, 0)
+        tokens = min(burst, tokens + (now - updated) * burst / seconds)
+        if tokens >= 1:
+            cache.set(bucket, (tokens - 1, now, 0), seconds)
+            return True, 0
+        cache.set(bucket, (tokens, now, refused + 1), seconds)
+    if not refused:
+        log_event('ratelimit.limited', level=logging.WARNING, bucket=bucket)  # once per run of refusals
+    return False, (1 - tokens) * seconds / burst
+
+
+def too_many_requests(request, retry_after):
+    return HttpResponse('Too many requests, please slow down.', status=429, content_type='text/plain')
+
+
+def json_too_many_requests(request, retry_after):
+    return JsonResponse({'error': 'Too many requests', 'retry_after': retry_after}, status=429)
+
+
+def ratelimit(scope, key=client_ip, methods=None, response=too_many_requests):
+    """
+    Limit a view to the RATELIMIT_<SCOPE> rate per key(request), for the
+    given HTTP methods (all by default); refused requests get
+    response(request, retry_after) with a Retry-After header
+    """
+    setting = f"RATELIMIT_{scope.upper()}"
+
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if settings.RATELIMIT_ENABLED and (methods is None or request.method in methods):
+                identity = key(request)
+                if identity:
+                    allowed, retry_after = take(f"ratelimit:{scope}:{identity}", *parse_rate(getattr(settings, setting)))
+                    if not allowed:
+                        retry_after = max(1, round(retry_after))
+                        limited = response(request, retry_after)
+                        limited['Retry-After'] = str(retry_after)
+                        return limited
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,394 @@
+"""
+In-process job scheduler behind ``manage.py run_scheduler``
+
+Each Job says when it is next due: CronJob from a five-field cron spec and
+its last run (a slot missed while the scheduler was down runs once on start),
+ExpiryAlertJob from the earliest Donation.next_alert_on. The scheduler sleeps
+until the earliest due time. On PostgreSQL it LISTENs on NOTIFY_CHANNEL, so
+notify_scheduler() (sent when a donation is rescheduled) wakes it early to
+recompute; other databases fall back to waking every SCHEDULER_POLL_SECONDS.
+
+Only one scheduler runs jobs at a time: it holds a lease on the JobState row
+named JobState.LOCK_NAME and renews it while sleeping, and from a
+LeaseHeartbeat thread while a job runs. A standby instance takes over when
+the lease lapses.
+"""
+import logging
+import os
+import select
+import socket
+import threading
+import time as clock
+import traceback
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from donations.models import ALERTABLE_STATUSES, Donation
+
+from .events import log_event
+from .models import JobState
+
+NOTIFY_CHANNEL = 'healthbridge_scheduler'
+
+
+def notify_scheduler(payload=''):
+    """Wake run_scheduler early; delivered when the current transaction commits (PostgreSQL only)"""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, payload])
+
+
+class CronSpec:
+    """Five-field cron expression: minute hour day-of-month month day-of-week (0 or 7 = Sunday)"""
+    RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, spec):
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron spec needs 5 fields, got {spec!r}")
+        self.spec = spec
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            self.parse_field(field, low, high) for field, (low, high) in zip(fields, self.RANGES)
+        )
+        self.weekdays = sorted({day % 7 for day in weekdays})
+        # As in cron: when both day fields are restricted, a day matching either runs the job
+        self.either_day = fields[2] != '*' and fields[4] != '*'
+
+    @staticmethod
+    def parse_field(field, low, high):
+        values = set()
+        for part in field.split(','):
+            body, _, step = part.partition('/')
+            step = int(step) if step else 1
+            if body == '*':
+                start, end = low, high
+            elif '-' in body:
+                start, end = (int(value) for value in body.split('-', 1))
+            else:
+                start = int(body)
+                end = high if step > 1 else start
+            if not low <= start <= end <= high or step < 1:
+                raise ValueError(f"Cron field {field!r} is outside {low}-{high}")
+            values.update(range(start, end + 1, step))
+        return sorted(values)
+
+    def day_matches(self, day):
+        if day.month not in self.months:
+            return False
+        in_days = day.day in self.days
+        in_weekdays = day.isoweekday() % 7 in self.weekdays
+        return in_days or in_weekdays if self.either_day else in_days and in_weekdays
+
+    def next_after(self, moment):
+        """First matching minute strictly after `moment`, in moment's timezone"""
+        moment = timezone.localtime(moment)
+        start = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        day = start.date()
+        for _ in range(366 * 8):  # long enough for "29th of February, on a Monday"
+            if self.day_matches(day):
+                for hour in self.hours:
+                    for minute in self.minutes:
+                        candidate = datetime.combine(day, time(hour, minute), tzinfo=moment.tzinfo)
+                        if candidate >= start:
+                            return candidate
+            day += timedelta(days=1)
+        raise ValueError(f"Cron spec {self.spec!r} never matches")
+
+    def __str__(self):
+        return self.spec
+
+
+class Job:
+    """A named callable; subclasses implement next_run()"""
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+
+    def next_run(self, state, now):
+        """Aware datetime the job is next due (in the past = run now), or None when idle"""
+        raise NotImplementedError
+
+    def describe(self):
+        return self.__class__.__name__
+
+
+class CronJob(Job):
+    def __init__(self, name, spec, func, catch_up=True):
+        super().__init__(name, func)
+        self.spec = CronSpec(spec)
+        self.catch_up = catch_up
+
+    def next_run(self, state, now):
+        if state.last_run_at is None:
+            return self.spec.next_after(now)
+        due = self.spec.next_after(state.last_run_at)
+        if due <= now and not self.catch_up:
+            return self.spec.next_after(now)
+        # Several missed slots collapse into one catch-up run
+        return due
+
+    def describe(self):
+        return f"cron '{self.spec}'"
+
+
+class ExpiryAlertJob(Job):
+    """
+    Runs when the next donation reaches an alert threshold: at EXPIRY_ALERT_HOUR
+    on the earliest next_alert_on date, at most once per day.
+    """
+
+    def next_run(self, state, now):
+        first = Donation.objects.filter(
+            next_alert_on__isnull=False, status__in=ALERTABLE_STATUSES,
+        ).aggregate(first=Min('next_alert_on'))['first']
+        if first is None:
+            return None
+        due = self.alert_time(first, now)
+        if state.last_run_at and due <= state.last_run_at:
+            # Anything still due was left over by today's run; try again tomorrow
+            due = self.alert_time(timezone.localtime(state.last_run_at).date() + timedelta(days=1), now)
+        return due
+
+    @staticmethod
+    def alert_time(day, now):
+        return datetime.combine(day, time(settings.EXPIRY_ALERT_HOUR), tzinfo=timezone.localtime(now).tzinfo)
+
+    def describe(self):
+        return f"next alert threshold at {settings.EXPIRY_ALERT_HOUR}:00"
+
+
+class Wakeup:
+    """
+    Interruptible sleep. On PostgreSQL a dedicated connection LISTENs on
+    NOTIFY_CHANNEL and any notification ends the sleep; stop() ends it from a
+    signal handler through a socket pair.
+    """
+
+    def __init__(self):
+        self.reader, self.writer = socket.socketpair()
+        self.reader.setblocking(False)
+        self.listener = None
+
+    def listen(self):
+        if self.listener is not None or connection.vendor != 'postgresql':
+            return
+        try:
+            listener = connections.create_connection('default')
+            listener.ensure_connection()
+            with listener.connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {NOTIFY_CHANNEL}')
+            self.listener = listener
+        except Exception as e:
+            log_event('scheduler.listen_failed', level=logging.WARNING, error=str(e))
+
+    def wait(self, seconds):
+        """Sleep up to `seconds`; True when woken by a notification or stop()"""
+        self.listen()
+        sources = [self.reader]
+        if self.listener is not None:
+            sources.append(self.listener.connection)
+        ready, _, _ = select.select(sources, [], [], max(0.0, seconds))
+        woken = bool(ready)
+        if self.reader in ready:
+            self.reader.recv(64)
+        if self.listener is not None:
+            woken = self.drain_notifications() or woken
+        return woken
+
+    def drain_notifications(self):
+        raw = self.listener.connection
+        try:
+            if hasattr(raw, 'poll'):  # psycopg2
+                raw.poll()
+                notified = bool(raw.notifies)
+                raw.notifies.clear()
+            else:  # psycopg 3
+                notified = any(True for _ in raw.notifies(timeout=0))
+            return notified
+        except Exception as e:
+            # Lost the connection; listen again on the next wait
+            log_event('scheduler.listen_failed', level=logging.WARNING, error=str(e))
+            self.close_listener()
+            return False
+
+    def stop(self):
+        try:
+            self.writer.send(b'x')
+        except OSError:
+            pass
+
+    def close_listener(self):
+        if self.listener is not None:
+            try:
+                self.listener.close()
+            except Exception:
+                pass
+            self.listener = None
+
+    def close(self):
+        self.close_listener()
+        self.reader.close()
+        self.writer.close()
+
+
+class LeaseHeartbeat:
+    """
+    Renews the scheduler's lease every third of its length from a background
+    thread, so a job that runs longer than the lease does not let a standby
+    scheduler start the same jobs alongside it.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='scheduler-lease-heartbeat', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.done.set()
+        self.thread.join()
+
+    def run(self):
+        try:
+            while not self.done.wait(self.scheduler.lease.total_seconds() / 3):
+                try:
+                    renewed = self.scheduler.renew_lock()
+                except Exception as e:
+                    log_event('scheduler.heartbeat_failed', level=logging.WARNING, error=str(e))
+                    continue
+                if not renewed:
+                    log_event('scheduler.lease_lost', level=logging.WARNING, identity=self.scheduler.identity)
+                    return
+        finally:
+            connection.close()  # this thread's own connection
+
+
+class Scheduler:
+    def __init__(self, jobs, identity=None, lease_seconds=None, poll_seconds=None, retry_seconds=None):
+        self.jobs = jobs
+        self.identity = identity or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease = timedelta(seconds=lease_seconds or settings.SCHEDULER_LEASE_SECONDS)
+        self.poll_seconds = poll_seconds or settings.SCHEDULER_POLL_SECONDS
+        self.retry = timedelta(seconds=retry_seconds or settings.SCHEDULER_RETRY_SECONDS)
+        self.wakeup = Wakeup()
+        self.stopping = False
+        self.has_lock = False
+
+    def states(self):
+        existing = {state.name: state for state in JobState.objects.filter(name__in=[job.name for job in self.jobs])}
+        return {job.name: existing.get(job.name) or JobState(name=job.name) for job in self.jobs}
+
+    def schedule(self, now):
+        """[(due, job, state)] for every job with a due time, earliest first"""
+        states = self.states()
+        planned = []
+        for job in self.jobs:
+            state = states[job.name]
+            due = job.next_run(state, now)
+            if state.last_error and state.last_run_at:
+                retry_at = state.last_run_at + self.retry
+                due = retry_at if due is None else min(due, retry_at)
+            if due is not None:
+                planned.append((due, job, state))
+        return sorted(planned, key=lambda item: item[0])
+
+    def acquire_lock(self):
+        """Take or renew the single-instance lease; False while another scheduler holds it"""
+        now = timezone.now()
+        JobState.objects.get_or_create(name=JobState.LOCK_NAME)
+        self.has_lock = bool(JobState.objects.filter(name=JobState.LOCK_NAME).filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now) | Q(locked_by=self.identity)
+        ).update(locked_by=self.identity, locked_until=now + self.lease))
+        return self.has_lock
+
+    def renew_lock(self):
+        """Extend a lease this scheduler still holds; False once it has lapsed and another took it"""
+        return bool(JobState.objects.filter(name=JobState.LOCK_NAME, locked_by=self.identity).update(
+            locked_until=timezone.now() + self.lease,
+        ))
+
+    def release_lock(self):
+        if self.has_lock:
+            JobState.objects.filter(name=JobState.LOCK_NAME, locked_by=self.identity).update(
+                locked_by='', locked_until=None,
+            )
+            self.has_lock = False
+
+    def run_job(self, job, state, due, now):
+        late = (now - due).total_seconds()
+        if late > 60:
+            log_event('scheduler.catch_up', job=job.name, scheduled_for=due.isoformat(), late_seconds=int(late))
+        started = timezone.now()
+        start = clock.perf_counter()
+        try:
+            with LeaseHeartbeat(self):
+                job.func()
+            error = ''
+        except Exception:
+            error = traceback.format_exc()
+        duration = clock.perf_counter() - start
+        state.last_run_at = started
+        state.last_duration = duration
+        state.last_error = error
+        if not error:
+            state.last_success_at = started
+        state.save()
+        if error:
+            log_event('scheduler.job_failed', level=logging.ERROR, job=job.name,
+                      duration=round(duration, 3), error=error.strip().splitlines()[-1])
+        else:
+            log_event('scheduler.job_finished', job=job.name, duration=round(duration, 3))
+        return not error
+
+    def run_due(self):
+        """Run every job that is due now; returns the seconds until the next one (None if idle)"""
+        now = timezone.now()
+        for due, job, state in self.schedule(now):
+            if due > now or self.stopping:
+                break
+            close_old_connections()
+            self.run_job(job, state, due, now)
+            if not self.acquire_lock():
+                return 0  # lost the lease while the job ran
+            now = timezone.now()
+        planned = self.schedule(timezone.now())
+        if not planned:
+            return None
+        return max(0.0, (planned[0][0] - timezone.now()).total_seconds())
+
+    def max_sleep(self):
+        # Wake in time to renew the lease; without LISTEN also poll for new work
+        cap = self.lease.total_seconds() / 3
+        if self.wakeup.listener is None:
+            cap = min(cap, self.poll_seconds)
+        return cap
+
+    def run_forever(self):
+        try:
+            while not self.stopping:
+                close_old_connections()
+                if not self.acquire_lock():
+                    log_event('scheduler.standby', level=logging.DEBUG, identity=self.identity)
+                    self.wakeup.wait(self.lease.total_seconds() / 3)
+                    continue
+                self.wakeup.listen()
+                wait = self.run_due()
+                if self.stopping:
+                    break
+                self.wakeup.wait(self.max_sleep() if wait is None else min(wait, self.max_sleep()))
+        finally:
+            self.release_lock()
+            self.wakeup.close()
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.stop()
@@ -0,0 +1,515 @@
+"""
+Synthetic data generator for benchmarks and load tests
+
+Builds users, donations, medicine requests and notifications with skewed,
+realistic distributions: a few pharmacy-sized donors own most donations,
+popular medicines dominate the catalogue, most stock expires months out with a
+tail that is about to (or already did) expire, and requests move through the
+normal matched -> fulfilled -> claimed flow, each with its allocation ledger
+row. Everything is written with
+bulk_create, so no model signals (and no expiry emails) fire while seeding.
+
+DatasetSeeder keeps everything in memory and suits the load-test dataset;
+ScaleSeeder streams millions of rows through bulk_create or Postgres COPY.
+"""
+import csv
+import io
+import random
+from datetime import date, timedelta
+from itertools import accumulate
+from uuid import uuid4
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from donations.models import Donation, next_alert_date
+from healthbridge_app.models import GenericMedicine
+from notifications.models import Notification
+from requests.models import Allocation, MedicineRequest
+
+User = get_user_model()
+
+DEFAULT_PASSWORD = 'bench-pass-123'
+
+MEDICINE_NAMES = [
+    'Paracetamol', 'Amoxicillin', 'Ibuprofen', 'Cetirizine', 'Loperamide', 'Metformin',
+    'Losartan', 'Amlodipine', 'Omeprazole', 'Salbutamol', 'Ascorbic Acid', 'Mefenamic Acid',
+    'Carbocisteine', 'Ambroxol', 'Cefalexin', 'Azithromycin', 'Co-Amoxiclav', 'Simvastatin',
+    'Atorvastatin', 'Metoprolol', 'Hydrochlorothiazide', 'Furosemide', 'Prednisone',
+    'Dexamethasone', 'Loratadine', 'Diphenhydramine', 'Ranitidine', 'Famotidine',
+    'Ciprofloxacin', 'Doxycycline', 'Clindamycin', 'Metronidazole', 'Ferrous Sulfate',
+    'Folic Acid', 'Multivitamins', 'Zinc Sulfate', 'Oral Rehydration Salts', 'Guaifenesin',
+    'Phenylephrine', 'Naproxen', 'Diclofenac', 'Tramadol', 'Insulin Glargine', 'Gliclazide',
+    'Glimepiride', 'Captopril', 'Enalapril', 'Clopidogrel', 'Aspirin', 'Montelukast',
+    'Fluticasone', 'Budesonide', 'Levothyroxine', 'Allopurinol', 'Colchicine', 'Sertraline',
+    'Fluoxetine', 'Carbamazepine', 'Levetiracetam', 'Domperidone',
+]
+
+STATUS_MIX = {
+    # (request status, share of requests)
+    MedicineRequest.Status.PENDING: 0.15,
+    MedicineRequest.Status.MATCHED: 0.40,
+    MedicineRequest.Status.FULFILLED: 0.15,
+    MedicineRequest.Status.CLAIMED: 0.30,
+}
+
+NOTIFICATION_TYPES = [
+    Notification.Type.DONATION_APPROVED, Notification.Type.REQUEST_APPROVED,
+    Notification.Type.REQUEST_CREATED, Notification.Type.MEDICINE_EXPIRING,
+    Notification.Type.SYSTEM,
+]
+
+
+def zipf_weights(n, s=1.1):
+    """Cumulative Zipf weights for ``random.choices(..., cum_weights=...)``"""
+    return list(accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+
+class DatasetSeeder:
+    """Generate a consistent donation/request/notification graph"""
+
+    def __init__(self, prefix='bench', seed=42, password=DEFAULT_PASSWORD, batch_size=1000, donor_share=0.3):
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.password = password
+        self.batch_size = batch_size
+        self.donor_share = donor_share
+        self.today = date.today()
+        self.reserved_until = timezone.now() + timedelta(hours=settings.RESERVATION_TTL_HOURS)
+
+    # ---------- distributions ----------
+    def expiry_date(self):
+        roll = self.rng.random()
+        if roll < 0.05:
+            days = self.rng.randint(-30, -1)    # already expired
+        elif roll < 0.20:
+            days = self.rng.randint(0, 14)      # inside the alert window
+        else:
+            days = self.rng.randint(15, 720)
+        return self.today + timedelta(days=days)
+
+    def donation_quantity(self):
+        return max(1, min(500, int(self.rng.lognormvariate(3, 1))))
+
+    def approval_status(self, choices):
+        roll = self.rng.random()
+        if roll < 0.80:
+            return choices.APPROVED
+        return choices.PENDING if roll < 0.95 else choices.REJECTED
+
+    def consume(self, donation, status, quantity):
+        """
+        Apply a request in `status` to its donation as reserve() and deliver()
+        would, and return the matching Allocation (without its request).
+        """
+        if status == MedicineRequest.Status.MATCHED:
+            donation.allocated_qty += quantity
+            state = Allocation.State.ACTIVE
+        else:
+            donation.quantity -= quantity
+            state = Allocation.State.DELIVERED
+        if donation.quantity == 0:
+            donation.status = Donation.Status.DELIVERED
+            donation.next_alert_on = None
+        elif donation.allocated_qty >= donation.quantity:
+            donation.status = Donation.Status.RESERVED
+        else:
+            donation.status = Donation.Status.AVAILABLE
+        return Allocation(
+            donation_id=donation.id,
+            quantity=quantity,
+            state=state,
+            reserved_until=self.reserved_until if state == Allocation.State.ACTIVE else None,
+        )
+
+    # ---------- builders ----------
+    def seed_catalogue(self):
+        GenericMedicine.objects.bulk_create(
+            [GenericMedicine(name=name) for name in MEDICINE_NAMES],
+            ignore_conflicts=True,
+        )
+
+    def seed_users(self, count):
+        password_hash = make_password(self.password)  # hash once, not per user
+        n_donors = max(1, int(count * self.donor_share))
+        users = []
+        for i in range(count):
+            role = User.UserType.DONOR if i < n_donors else User.UserType.RECIPIENT
+            email = f"{self.prefix}-{role}-{i}@example.test"
+            users.append(User(
+                username=email,
+                email=email,
+                password=password_hash,
+                first_name=f"{role.title()}{i}",
+                last_name=self.prefix.title(),
+                user_type=role,
+                role_selected=True,
+            ))
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        users = list(User.objects.filter(email__startswith=f"{self.prefix}-").order_by('id'))
+        donors = [u for u in users if u.user_type == User.UserType.DONOR]
+        recipients = [u for u in users if u.user_type == User.UserType.RECIPIENT]
+        return donors, recipients
+
+    def seed_donations(self, count, donors):
+        donor_weights = zipf_weights(len(donors))
+        name_weights = zipf_weights(len(MEDICINE_NAMES), s=0.9)
+        donors_for = self.rng.choices(donors, cum_weights=donor_weights, k=count)
+        names_for = self.rng.choices(MEDICINE_NAMES, cum_weights=name_weights, k=count)
+        donations = [
+            Donation(
+                name=names_for[i],
+                quantity=self.donation_quantity(),
+                expiry_date=self.expiry_date(),
+                donor=donors_for[i],
+                status=Donation.Status.AVAILABLE,
+                approval_status=self.approval_status(Donation.ApprovalStatus),
+                tracking_code=uuid4().hex[:12].upper(),
+            )
+            for i in range(count)
+        ]
+        for donation in donations:
+            donation.next_alert_on = next_alert_date(donation.expiry_date)  # save() is bypassed
+        return Donation.objects.bulk_create(donations, batch_size=self.batch_size)
+
+    def seed_requests(self, count, recipients, donations):
+        # One request per matched donation, for part or all of its quantity
+        matchable = [
+            d for d in donations
+            if d.approval_status == Donation.ApprovalStatus.APPROVED and d.expiry_date >= self.today
+        ]
+        self.rng.shuffle(matchable)
+        statuses = self.rng.choices(list(STATUS_MIX), weights=list(STATUS_MIX.values()), k=count)
+
+        requests, touched, allocations = [], [], []
+        for status in statuses:
+            donation = matchable.pop() if status != MedicineRequest.Status.PENDING and matchable else None
+            if donation is None:
+                status = MedicineRequest.Status.PENDING
+                quantity = self.rng.randint(1, 30)
+            else:
+                quantity = self.rng.randint(1, donation.quantity)
+                allocations.append(self.consume(donation, status, quantity))
+                touched.append(donation)
+            approval = (
+                MedicineRequest.ApprovalStatus.APPROVED
+                if status in (MedicineRequest.Status.FULFILLED, MedicineRequest.Status.CLAIMED)
+                else self.approval_status(MedicineRequest.ApprovalStatus)
+            )
+            requests.append(MedicineRequest(
+                recipient=self.rng.choice(recipients),
+                medicine_name=donation.name if donation else self.rng.choice(MEDICINE_NAMES),
+                quantity=quantity,
+                urgency=self.rng.choice(MedicineRequest.Urgency.values),
+                reason='Seeded benchmark request',
+                status=status,
+                approval_status=approval,
+                matched_donation=donation,
+                tracking_code=f"REQ{uuid4().hex[:9].upper()}",
+            ))
+        Donation.objects.bulk_update(
+            touched, ['quantity', 'allocated_qty', 'status', 'next_alert_on'], batch_size=self.batch_size
+        )
+        requests = MedicineRequest.objects.bulk_create(requests, batch_size=self.batch_size)
+        for allocation, medicine_request in zip(allocations, [r for r in requests if r.matched_donation_id]):
+            allocation.request_id = medicine_request.id
+        Allocation.objects.bulk_create(allocations, batch_size=self.batch_size)
+        return requests
+
+    def seed_notifications(self, count, users):
+        user_weights = zipf_weights(len(users), s=0.8)
+        owners = self.rng.choices(users, cum_weights=user_weights, k=count)
+        notifications = [
+            Notification(
+                user=owner,
+                notification_type=self.rng.choice(NOTIFICATION_TYPES),
+                title='Seeded notification',
+                message='Generated for benchmarking.',
+                is_read=self.rng.random() < 0.6,
+            )
+            for owner in owners
+        ]
+        return Notification.objects.bulk_create(notifications, batch_size=self.batch_size)
+
+    @transaction.atomic
+    def seed(self, users, donations, requests, notifications):
+        """Create the dataset and return a manifest for the load driver"""
+        self.seed_catalogue()
+        donors, recipients = self.seed_users(users)
+        donation_rows = self.seed_donations(donations, donors)
+        request_rows = self.seed_requests(requests, recipients, donation_rows)
+        self.seed_notifications(notifications, donors + recipients)
+
+        donors_by_id = {d.id: d.email for d in donors}
+        recipients_by_id = {r.id: r.email for r in recipients}
+        donation_by_id = {d.id: d for d in donation_rows}
+        deliverable = [
+            {
+                'request_id': r.id,
+                'donor': donors_by_id[donation_by_id[r.matched_donation_id].donor_id],
+                'recipient': recipients_by_id[r.recipient_id],
+            }
+            for r in request_rows
+            if r.status == MedicineRequest.Status.MATCHED
+        ]
+        available = [
+            d.id for d in donation_rows
+            if d.status == Donation.Status.AVAILABLE and d.approval_status == Donation.ApprovalStatus.APPROVED
+        ]
+        return {
+            'prefix': self.prefix,
+            'password': self.password,
+            'donors': [d.email for d in donors],
+            'recipients': [r.email for r in recipients],
+            'deliverable': deliverable,
+            'available_donation_ids': available,
+            'search_terms': MEDICINE_NAMES,
+        }
+
+
+# ---------- scale seeding ----------
+
+class BulkCreateWriter:
+    """Write model instances with chunked bulk_create (any backend)"""
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def write(self, model, objs):
+        model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+    def finish(self, models):
+        # Rows were inserted with explicit ids; move Postgres sequences past them
+        sql = connection.ops.sequence_reset_sql(no_style(), models)
+        if sql:
+            with connection.cursor() as cursor:
+                for statement in sql:
+                    cursor.execute(statement)
+
+
+class CopyWriter(BulkCreateWriter):
+    """Stream model instances into Postgres with COPY ... FROM STDIN (csv)"""
+
+    def write(self, model, objs):
+        fields = [f for f in model._meta.concrete_fields]
+        buffer = io.StringIO()
+        # Strings are quoted so "" stays an empty string; bare empty fields are NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+        for obj in objs:
+            writer.writerow([
+                f.get_db_prep_save(f.pre_save(obj, add=True), connection) for f in fields
+            ])
+        columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+        sql = f"COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)"
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            raw = cursor.cursor
+            if hasattr(raw, 'copy_expert'):  # psycopg2
+                raw.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+
+
+def next_id(model):
+    return (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+
+
+class ScaleSeeder(DatasetSeeder):
+    """
+    Stream a large dataset to the database chunk by chunk.
+
+    Ids are allocated up front (max(id) + 1 onwards) so donations, requests
+    and notifications can reference users and donations without reading rows
+    back, and at most one chunk of instances is held in memory at a time.
+    Matched/fulfilled/claimed requests are generated alongside the donation
+    they consume, with their Allocation rows, so donation status, quantity
+    and allocated_qty stay consistent.
+    """
+
+    MATCHABLE_SHARE = 0.76  # approved (0.80) and not yet expired (0.95)
+    MANIFEST_LIMIT = 5000
+
+    def __init__(self, writer, chunk_size=10000, progress=None, **kwargs):
+        super().__init__(**kwargs)
+        self.writer = writer
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda label, done, total: None)
+        self.deliverable = []
+        self.available = []
+
+    def chunks(self, total):
+        for start in range(0, total, self.chunk_size):
+            yield start, min(self.chunk_size, total - start)
+
+    def write_chunk(self, model, objs, label, done, total):
+        with transaction.atomic():
+            self.writer.write(model, objs)
+        self.progress(label, done, total)
+
+    def email(self, role, index):
+        return f"{self.prefix}-{role}-{index}@example.test"
+
+    def scale_users(self, count):
+        password_hash = make_password(self.password)
+        n_donors = max(1, int(count * self.donor_share))
+        first_id = next_id(User)
+        for start, size in self.chunks(count):
+            users = []
+            for i in range(start, start + size):
+                role = User.UserType.DONOR if i < n_donors else User.UserType.RECIPIENT
+                users.append(User(
+                    id=first_id + i,
+                    username=self.email(role, i),
+                    email=self.email(role, i),
+                    password=password_hash,
+                    first_name=f"{role.title()}{i}",
+                    last_name=self.prefix.title(),
+                    user_type=role,
+                    role_selected=True,
+                ))
+            self.write_chunk(User, users, 'users', start + size, count)
+        donors = range(first_id, first_id + n_donors)
+        recipients = range(first_id + n_donors, first_id + count)
+        return donors, recipients
+
+    def linked_request(self, request_id, donation, status, recipients, first_user_id):
+        quantity = self.rng.randint(1, donation.quantity)
+        allocation = self.consume(donation, status, quantity)
+        allocation.id = self.first_allocation_id + request_id - self.first_request_id
+        allocation.request_id = request_id
+        self.allocations.append(allocation)
+        recipient_id = self.rng.choice(recipients)
+        if status == MedicineRequest.Status.MATCHED and len(self.deliverable) < self.MANIFEST_LIMIT:
+            self.deliverable.append({
+                'request_id': request_id,
+                'donor': self.email(User.UserType.DONOR, donation.donor_id - first_user_id),
+                'recipient': self.email(User.UserType.RECIPIENT, recipient_id - first_user_id),
+            })
+        return MedicineRequest(
+            id=request_id,
+            recipient_id=recipient_id,
+            medicine_name=donation.name,
+            quantity=quantity,
+            urgency=self.rng.choice(MedicineRequest.Urgency.values),
+            reason='Seeded benchmark request',
+            status=status,
+            approval_status=(
+                self.approval_status(MedicineRequest.ApprovalStatus)
+                if status == MedicineRequest.Status.MATCHED
+                else MedicineRequest.ApprovalStatus.APPROVED
+            ),
+            matched_donation_id=donation.id,
+            tracking_code=f"SR{request_id:010d}",
+        )
+
+    def pending_request(self, request_id, recipients):
+        return MedicineRequest(
+            id=request_id,
+            recipient_id=self.rng.choice(recipients),
+            medicine_name=self.rng.choice(MEDICINE_NAMES),
+            quantity=self.rng.randint(1, 30),
+            urgency=self.rng.choice(MedicineRequest.Urgency.values),
+            reason='Seeded benchmark request',
+            status=MedicineRequest.Status.PENDING,
+            approval_status=self.approval_status(MedicineRequest.ApprovalStatus),
+            tracking_code=f"SR{request_id:010d}",
+        )
+
+    def scale_donations_and_requests(self, donations, requests, donors, recipients):
+        linked_statuses = {k: v for k, v in STATUS_MIX.items() if k != MedicineRequest.Status.PENDING}
+        linked_target = int(requests * sum(linked_statuses.values()))
+        link_chance = min(1.0, linked_target / max(1, donations * self.MATCHABLE_SHARE))
+        donor_weights = zipf_weights(len(donors))
+        name_weights = zipf_weights(len(MEDICINE_NAMES), s=0.9)
+        first_donation_id = next_id(Donation)
+        next_request_id = first_request_id = self.first_request_id = next_id(MedicineRequest)
+        self.first_allocation_id = next_id(Allocation)
+        self.allocations = []
+        first_user_id = donors[0]
+
+        for start, size in self.chunks(donations):
+            donors_for = self.rng.choices(donors, cum_weights=donor_weights, k=size)
+            names_for = self.rng.choices(MEDICINE_NAMES, cum_weights=name_weights, k=size)
+            chunk, linked = [], []
+            for i in range(size):
+                donation = Donation(
+                    id=first_donation_id + start + i,
+                    name=names_for[i],
+                    quantity=self.donation_quantity(),
+                    expiry_date=self.expiry_date(),
+                    donor_id=donors_for[i],
+                    status=Donation.Status.AVAILABLE,
+                    approval_status=self.approval_status(Donation.ApprovalStatus),
+                    tracking_code=f"SD{first_donation_id + start + i:010d}",
+                )
+                donation.next_alert_on = next_alert_date(donation.expiry_date)
+                matchable = (
+                    donation.approval_status == Donation.ApprovalStatus.APPROVED
+                    and donation.expiry_date >= self.today
+                )
+                if (matchable and next_request_id - first_request_id < linked_target
+                        and self.rng.random() < link_chance):
+                    status = self.rng.choices(list(linked_statuses), weights=list(linked_statuses.values()))[0]
+                    linked.append(self.linked_request(next_request_id, donation, status, recipients, first_user_id))
+                    next_request_id += 1
+                if (matchable and donation.status == Donation.Status.AVAILABLE
+                        and len(self.available) < self.MANIFEST_LIMIT):
+                    self.available.append(donation.id)
+                chunk.append(donation)
+            self.write_chunk(Donation, chunk, 'donations', start + size, donations)
+            if linked:
+                self.write_chunk(MedicineRequest, linked, 'requests', next_request_id - first_request_id, requests)
+                with transaction.atomic():
+                    self.writer.write(Allocation, self.allocations)
+                self.allocations = []
+
+        pending = requests - (next_request_id - first_request_id)
+        for start, size in self.chunks(max(0, pending)):
+            chunk = [self.pending_request(next_request_id + i, recipients) for i in range(size)]
+            next_request_id += size
+            self.write_chunk(MedicineRequest, chunk, 'requests', next_request_id - first_request_id, requests)
+
+    def scale_notifications(self, count, donors, recipients):
+        user_ids = range(donors[0], recipients[-1] + 1) if recipients else donors
+        user_weights = zipf_weights(len(user_ids), s=0.8)
+        for start, size in self.chunks(count):
+            owners = self.rng.choices(user_ids, cum_weights=user_weights, k=size)
+            chunk = [
+                Notification(
+                    user_id=owner,
+                    notification_type=self.rng.choice(NOTIFICATION_TYPES),
+                    title='Seeded notification',
+                    message='Generated for benchmarking.',
+                    is_read=self.rng.random() < 0.6,
+                )
+                for owner in owners
+            ]
+            self.write_chunk(Notification, chunk, 'notifications', start + size, count)
+
+    def seed(self, users, donations, requests, notifications):
+        """Stream the dataset in chunks and return a (truncated) manifest"""
+        self.seed_catalogue()
+        donors, recipients = self.scale_users(users)
+        self.scale_donations_and_requests(donations, requests, donors, recipients)
+        self.scale_notifications(notifications, donors, recipients)
+        self.writer.finish([User, Donation, MedicineRequest, Allocation, Notification])
+
+        n_donors = len(donors)
+        return {
+            'prefix': self.prefix,
+            'password': self.password,
+            'donors': [self.email(User.UserType.DONOR, i) for i in range(min(n_donors, self.MANIFEST_LIMIT))],
+            'recipients': [
+                self.email(User.UserType.RECIPIENT, n_donors + i)
+                for i in range(min(len(recipients), self.MANIFEST_LIMIT))
+            ],
+            'deliverable': self.deliverable,
+            'available_donation_ids': self.available,
+            'search_terms': MEDICINE_NAMES,
+        }
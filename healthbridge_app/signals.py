@@ -2,17 +2,30 @@
 Real-time expiry monitoring using Django signals
 This triggers immediately when donations are added/updated
 """
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from datetime import timedelta
+import io
+import logging
+
 from donations.models import Donation, ExpiryAlert
+from . import spelling
+from .events import log_event
+from .models import BrandMedicine, CustomUser, GenericMedicine
+from .scheduler import notify_scheduler
+from .usercache import invalidate_user
 
 @receiver(post_save, sender=Donation)
 def check_expiry_on_donation_save(sender, instance, created, **kwargs):
     """
     Automatically check expiry when a donation is created or updated
     """
+    if getattr(instance, '_alert_rescheduled', False) and instance.next_alert_on:
+        # run_scheduler may be sleeping past this donation's first alert
+        notify_scheduler(str(instance.next_alert_on))
+    
     if instance.expiry_date:
         # Ensure expiry_date is a date object
         from datetime import datetime, date
@@ -22,45 +35,73 @@ def check_expiry_on_donation_save(sender, instance, created, **kwargs):
             try:
                 expiry_date = datetime.strptime(expiry_date, '%Y-%m-%d').date()
             except ValueError:
-                print(f"❌ Invalid date format: {expiry_date}")
+                log_event('expiry.invalid_date', level=logging.WARNING, donation_id=instance.pk, expiry_date=expiry_date)
                 return
         
         days_until_expiry = (expiry_date - timezone.now().date()).days
         
-        # Check if this donation needs immediate attention
-        if days_until_expiry <= 10:  # Within 10 days
-            print(f"🚨 REAL-TIME ALERT: {instance.name} expires in {days_until_expiry} days!")
-            
+        # Check if this donation needs immediate attention (an alert is due for it today)
+        alert_due = instance.next_alert_on is not None and instance.next_alert_on <= date.today()
+        if days_until_expiry <= 10 and alert_due:  # Within 10 days
             # Determine urgency level
             urgency = "CRITICAL" if days_until_expiry <= 3 else "WARNING" if days_until_expiry <= 7 else "LOW"
-            print(f"📊 Urgency Level: {urgency} | Expiry Date: {expiry_date}")
+            log_event(
+                'expiry.realtime_alert',
+                donation_id=instance.pk, days_until_expiry=days_until_expiry,
+                urgency=urgency, expiry_date=expiry_date,
+            )
             
             # AUTOMATICALLY SEND EMAILS in real-time
             try:
                 from .management.commands.check_expiry import Command as ExpiryCommand
-                expiry_command = ExpiryCommand()
+                # Keep the command's progress output off the request's stdout
+                expiry_command = ExpiryCommand(stdout=io.StringIO())
                 
                 # Provide default options for the command
                 default_options = {
                     'days': 10,
                     'dry_run': False,  # Send real emails
-                    'force': True,     # Override duplicate protection for real-time
+                    'force': False,    # Only donations whose next_alert_on is due, including this one
                     'critical_only': days_until_expiry <= 3,  # Only critical if very urgent
                     'verbosity': 1
                 }
                 
-                print(f"📧 Automatically sending email alerts to staff...")
                 expiry_command.handle(**default_options)
-                print(f"✅ Real-time email alerts sent successfully!")
+                log_event('expiry.realtime_alert_sent', donation_id=instance.pk)
                 
             except Exception as e:
-                print(f"⚠️ Real-time email failed: {e}")
-                print(f"💡 Fallback: Daily automation will catch this at 9:00 AM")
+                # Fallback: the daily automation will catch this donation
+                log_event('expiry.realtime_alert_failed', level=logging.WARNING, donation_id=instance.pk, error=str(e))
 
 @receiver(post_delete, sender=Donation)
 def cleanup_alerts_on_donation_delete(sender, instance, **kwargs):
     """
     Clean up alerts when donation is deleted
     """
-    ExpiryAlert.objects.filter(donation=instance).delete()
-    print(f"🗑️ Cleaned up alerts for deleted donation: {instance.name}")
\ No newline at end of file
+    deleted, _ = ExpiryAlert.objects.filter(donation=instance).delete()
+    log_event('expiry.alerts_cleaned', level=logging.DEBUG, donation_id=instance.pk, alerts=deleted)
+
+
+@receiver(post_save, sender=GenericMedicine)
+@receiver(post_save, sender=BrandMedicine)
+@receiver(post_save, sender=Donation)
+def index_medicine_name(sender, instance, **kwargs):
+    """
+    Add saved medicine names to the "did you mean" index (healthbridge_app.spelling)
+    """
+    if sender is Donation and instance.approval_status != Donation.ApprovalStatus.APPROVED:
+        return
+    spelling.index_name(instance.brand_name if sender is BrandMedicine else instance.name)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drop the signed-in user's cached copy (healthbridge_app.usercache) after
+    a profile edit, password change or any other save: now, and again once
+    committed, in case another request cached the old row in between
+    """
+    user_id = instance.pk
+    invalidate_user(user_id)
+    transaction.on_commit(lambda: invalidate_user(user_id))
@@ -0,0 +1,112 @@
+"""
+Single-flight caching: one computation per cache miss, however many ask
+
+cached(key, compute, ttl) returns the cached value of `key`, computing it on
+a miss. Concurrent misses in one process queue on a lock of their own key
+(unrelated keys never wait for each other) and only the first computes;
+across processes the
+first to cache.add() a lease computes while the others poll for its result,
+for up to SINGLEFLIGHT_LEASE_SECONDS before computing it themselves.
+
+Entries are also refreshed early (XFetch, "Optimal Probabilistic Cache
+Stampede Prevention", Vattani et al.): each read recomputes with a
+probability that rises as expiry nears, scaled by how long the value took
+to compute, so a popular key is normally refreshed by one caller while the
+others still read the current value and never see a miss.
+
+With LocMemCache the cache, and so the lease, is per process; set REDIS_URL
+to share both between workers.
+"""
+import logging
+import math
+import random
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .events import log_event
+
+POLL_INTERVAL = 0.05
+_key_locks = {}  # key -> [lock, callers holding or waiting for it]; dropped when the last one leaves
+_key_locks_guard = threading.Lock()
+
+
+def is_fresh(entry, beta=1.0):
+    """False once now + delta * beta * -ln(rand) reaches the entry's expiry (XFetch)"""
+    _, delta, expires_at = entry
+    return time.time() - delta * beta * math.log(1.0 - random.random()) < expires_at
+
+
+def _acquire_slot(key):
+    with _key_locks_guard:
+        slot = _key_locks.setdefault(key, [threading.Lock(), 0])
+        slot[1] += 1
+        return slot
+
+
+def _release_slot(key, slot):
+    with _key_locks_guard:
+        slot[1] -= 1
+        if not slot[1]:
+            del _key_locks[key]
+
+
+def cached(key, compute, ttl, beta=1.0):
+    """The value cached under key, or compute() stored for ttl seconds, computed once however many callers miss"""
+    key = f"singleflight:{key}"
+    entry = cache.get(key)
+    if entry is not None and is_fresh(entry, beta):
+        return entry[0]
+
+    slot = _acquire_slot(key)
+    lock = slot[0]
+    try:
+        if entry is None:
+            lock.acquire()
+        elif not lock.acquire(blocking=False):
+            return entry[0]  # another thread is already refreshing it early
+        try:
+            current = cache.get(key)
+            if current is not None and (entry is None or current[2] != entry[2]):
+                return current[0]  # stored while this caller waited for the lock
+            return compute_with_lease(key, compute, ttl, stale=current)
+        finally:
+            lock.release()
+    finally:
+        _release_slot(key, slot)
+
+
+def compute_with_lease(key, compute, ttl, stale=None):
+    lease_key = f"{key}:lease"
+    token = uuid.uuid4().hex
+    if not cache.add(lease_key, token, settings.SINGLEFLIGHT_LEASE_SECONDS):
+        # Another process is computing it
+        if stale is not None:
+            return stale[0]
+        deadline = time.monotonic() + settings.SINGLEFLIGHT_LEASE_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+            if cache.get(lease_key) is None:
+                break  # the holder gave up without storing a value
+        else:
+            log_event('singleflight.lease_timeout', level=logging.WARNING, key=key)
+
+    try:
+        start = time.perf_counter()
+        value = compute()
+        cache.set(key, (value, time.perf_counter() - start, time.time() + ttl), ttl)
+        return value
+    finally:
+        if cache.get(lease_key) == token:
+            cache.delete(lease_key)
+
+
+def invalidate(key):
+    """Drop the value cached under key so the next caller recomputes it"""
+    cache.delete(f"singleflight:{key}")
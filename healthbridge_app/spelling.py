@@ -0,0 +1,215 @@
+"""
+In-memory "did you mean" index for medicine names
+
+A symmetric-delete (SymSpell) index: every dictionary word is stored under
+each string obtained by deleting up to MAX_EDIT_DISTANCE characters from
+its first PREFIX_LENGTH characters. A misspelling generates its own deletes
+and looks them up, so a lookup is a few dozen dict probes plus an edit
+distance per candidate found, however large the dictionary, where comparing
+against every word costs one edit distance per word.
+
+Words are the alphabetic tokens of GenericMedicine names, brand names and
+approved donation names. Each process builds its index on first use and
+rebuilds it after SPELLING_INDEX_MAX_AGE seconds, which is how renamed and
+deleted names leave it; in between, post_save signals
+(healthbridge_app.signals) add new names. Memory is bounded by
+SPELLING_MAX_WORDS and by taking deletes from the prefix only, at most
+1 + 7 + 21 keys per word, stored as hashes.
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from .events import log_event
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+MIN_WORD_LENGTH = 3
+WORD_RE = re.compile(r'[^\W\d_]+')
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (transpositions count as one edit), or limit + 1 once it is exceeded"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # A typo leaves most of the word alone: only the differing middle needs the full table
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if not a or not b:
+        return min(len(a) + len(b), limit + 1)
+
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def deletes(word, distance=MAX_EDIT_DISTANCE):
+    """
+    The first PREFIX_LENGTH characters of word, then the strings left by
+    deleting 1, 2, ... `distance` of them: one set per number of deletes
+    """
+    level = {word[:PREFIX_LENGTH]}
+    seen = set(level)
+    yield level
+    for _ in range(distance):
+        level = {w[:i] + w[i + 1:] for w in level for i in range(len(w))} - seen
+        seen |= level
+        yield level
+
+
+class SpellingIndex:
+    def __init__(self, max_words=None):
+        self.max_words = max_words
+        self.counts = {}      # word -> names it appeared in, to prefer common words
+        self.display = {}     # word -> spelling as first added ("Amoxicillin")
+        # hash(delete) -> word, or list of words once there are several; a hash
+        # collision only adds a candidate that the edit distance then rejects
+        self.candidates = {}
+        self.full = False
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def add_name(self, name):
+        for token in WORD_RE.findall(name):
+            self.add_word(token)
+
+    def add_word(self, token):
+        word = token.lower()
+        if len(word) < MIN_WORD_LENGTH:
+            return
+        if word in self.counts:
+            self.counts[word] += 1
+            return
+        if self.max_words is not None and len(self.counts) >= self.max_words:
+            self.full = True
+            return
+        self.display[word] = token
+        for level in deletes(word):
+            for key in map(hash, level):
+                bucket = self.candidates.get(key)
+                if bucket is None:
+                    self.candidates[key] = word
+                elif isinstance(bucket, list):
+                    bucket.append(word)
+                else:
+                    self.candidates[key] = [bucket, word]
+        self.counts[word] = 1  # last: lookups in other threads only ever see fully indexed words
+
+    def correct_word(self, word, max_distance=MAX_EDIT_DISTANCE):
+        """(closest dictionary word, distance), the most common on ties, or None if none is within max_distance"""
+        word = word.lower()
+        if word in self.counts:
+            return word, 0
+        best, best_rank = None, None
+        seen = set()
+        for deleted, level in enumerate(deletes(word, max_distance)):
+            if best_rank and deleted > best_rank[0]:
+                break  # candidates this far from the input cannot beat the best one
+            for key in map(hash, level):
+                bucket = self.candidates.get(key)
+                if bucket is None:
+                    continue
+                for candidate in bucket if isinstance(bucket, list) else (bucket,):
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    limit = best_rank[0] if best_rank else max_distance
+                    if abs(len(candidate) - len(word)) > limit:
+                        continue
+                    distance = edit_distance(word, candidate, limit)
+                    if distance > max_distance:
+                        continue
+                    rank = (distance, -self.counts[candidate])
+                    if best_rank is None or rank < best_rank:
+                        best, best_rank = candidate, rank
+        return (best, best_rank[0]) if best else None
+
+    def suggest(self, query):
+        """query with each misspelt word replaced by its closest dictionary word, or None if nothing was corrected"""
+        corrected = False
+
+        def replace(match):
+            nonlocal corrected
+            token = match.group()
+            found = self.correct_word(token) if len(token) >= MIN_WORD_LENGTH else None
+            if not found or found[1] == 0:
+                return token
+            corrected = True
+            return self.display[found[0]]
+
+        suggestion = WORD_RE.sub(replace, query)
+        return suggestion if corrected else None
+
+
+def build_index():
+    """A SpellingIndex of every generic, brand and approved donation name"""
+    from donations.models import Donation
+    from .models import BrandMedicine, GenericMedicine
+
+    start = time.perf_counter()
+    index = SpellingIndex(settings.SPELLING_MAX_WORDS)
+    sources = (
+        GenericMedicine.objects.values_list('name', flat=True),
+        BrandMedicine.objects.values_list('brand_name', flat=True),
+        Donation.objects.filter(approval_status=Donation.ApprovalStatus.APPROVED)
+        .order_by().values_list('name', flat=True).distinct(),
+    )
+    for names in sources:
+        for name in names.iterator(chunk_size=5000):
+            index.add_name(name)
+    log_event(
+        'spelling.index_built', words=len(index), keys=len(index.candidates),
+        full=index.full, seconds=round(time.perf_counter() - start, 3),
+    )
+    return index
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    """This process's index, built on first use and rebuilt once older than SPELLING_INDEX_MAX_AGE"""
+    global _index
+    index = _index
+    if index is None or time.monotonic() - index.built_at > settings.SPELLING_INDEX_MAX_AGE:
+        # Only the first caller waits; while a stale index is rebuilt the others keep using it
+        if _lock.acquire(blocking=index is None):
+            try:
+                if _index is index:
+                    _index = build_index()
+            finally:
+                _lock.release()
+        index = _index or index
+    return index
+
+
+def suggest(query):
+    """A "did you mean" correction of query, or None"""
+    return get_index().suggest(query)
+
+
+def index_name(name):
+    """Add a saved name to this process's index, if it has one yet"""
+    if _index is not None and name:
+        _index.add_name(name)
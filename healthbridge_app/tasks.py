@@ -1,61 +1,40 @@
 """
-Background task monitoring using Celery
-Runs continuous monitoring in the background
+Periodic jobs run by ``python manage.py run_scheduler`` (see scheduler.py)
+
+Replaces the Celery tasks: no broker was ever configured, and the expiry
+monitor was a ``while True`` loop that held a worker and re-scanned every
+4 hours. Expiry alerts now run when the next donation reaches a threshold
+(Donation.next_alert_on); the rest run on cron specs from settings.
 """
-from celery import Celery
-from django.utils import timezone
-from datetime import timedelta
-import time
-
-# Create Celery app
-app = Celery('healthbridge_expiry')
-
-@app.task
-def continuous_expiry_monitor():
-    """
-    Continuously monitor for expiring medicines
-    More efficient than daily checks
-    """
-    from donations.models import Donation
-    from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand
-    
-    while True:
-        # Check every 4 hours instead of daily
-        current_time = timezone.now()
-        
-        # Quick check - only run full check if we might have new expiring items
-        near_expiry = Donation.objects.filter(
-            expiry_date__lte=current_time.date() + timedelta(days=10),
-            expiry_date__gte=current_time.date()
-        ).count()
-        
-        if near_expiry > 0:
-            print(f"🔍 Found {near_expiry} items approaching expiry - running full check")
-            expiry_command = ExpiryCommand()
-            expiry_command.handle(verbosity=1)
-        else:
-            print("✅ No items approaching expiry")
-        
-        # Wait 4 hours before next check
-        time.sleep(14400)  # 4 hours = 14400 seconds
-
-@app.task
-def immediate_expiry_check(donation_id):
-    """
-    Immediate check for a specific donation
-    Triggered when donations are added/updated
-    """
-    from donations.models import Donation
-    from healthbridge_app.management.commands.check_expiry import Command as ExpiryCommand
-    
-    try:
-        donation = Donation.objects.get(id=donation_id)
-        if donation.expiry_date:
-            days_until_expiry = (donation.expiry_date - timezone.now().date()).days
-            
-            if days_until_expiry <= 10:
-                print(f"⚡ IMMEDIATE CHECK: {donation.medicine_name} expires in {days_until_expiry} days")
-                expiry_command = ExpiryCommand()
-                expiry_command.handle(force=True)
-    except Donation.DoesNotExist:
-        pass
\ No newline at end of file
+from django.core.management import call_command
+from django.conf import settings
+
+from donations.models import alert_thresholds
+
+from .scheduler import CronJob, ExpiryAlertJob
+
+
+def send_expiry_alerts():
+    call_command('check_expiry', days=alert_thresholds()[0], digest=True)
+
+
+def cleanup_expired_donations():
+    call_command('cleanup_expired', days_past_expiry=7)
+
+
+def release_reservations():
+    call_command('release_reservations')
+
+
+def clear_expired_sessions():
+    # Sessions are written through to the database (cached_db); expired rows are never removed otherwise
+    call_command('purge_sessions')
+
+
+def get_jobs():
+    return [
+        ExpiryAlertJob('expiry_alerts', send_expiry_alerts),
+        CronJob('cleanup_expired', settings.CLEANUP_EXPIRED_SCHEDULE, cleanup_expired_donations),
+        CronJob('release_reservations', settings.RELEASE_RESERVATIONS_SCHEDULE, release_reservations),
+        CronJob('clear_sessions', settings.CLEAR_SESSIONS_SCHEDULE, clear_expired_sessions),
+    ]
@@ -1,3 +1,437 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import random
+import string
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from donations.models import Donation, ExpiryAlert
+from requests.models import Allocation, MedicineRequest
+from notifications.models import OutboundEmail
+from requests.reservations import reserve
+
+from . import singleflight
+from .consistency import run_checks
+from .events import AsyncQueueHandler, JSONFormatter, event_logger, log_event
+from .management.commands import cleanup_expired
+from .models import JobState
+from .ratelimit import client_ip
+from .scheduler import Job, Scheduler
+from .seeding import MEDICINE_NAMES
+from .spelling import MAX_EDIT_DISTANCE, SpellingIndex, edit_distance
+
+User = get_user_model()
+
+
+@override_settings(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN='100/300', RATELIMIT_LOGIN_EMAIL='5/300')
+class LoginRateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='victim', email='victim@example.test', password='correct horse', first_name='V', last_name='V',
+        )
+
+    def login(self, password, ip):
+        return self.client.post('/login/', {'email': self.user.email, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_guesses_at_one_account_are_limited_per_address(self):
+        statuses = [self.login(f"guess-{i}", '203.0.113.7').status_code for i in range(6)]
+        self.assertEqual(statuses.count(429), 1)
+        self.assertEqual(statuses[-1], 429)
+
+    def test_flood_from_another_address_does_not_lock_the_owner_out(self):
+        for i in range(10):
+            self.login(f"guess-{i}", '203.0.113.7')
+        self.assertEqual(self.login('correct horse', '198.51.100.20').status_code, 302)
+
+
+class ClientIpTests(TestCase):
+    def request(self):
+        return RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 198.51.100.20')
+
+    @override_settings(RATELIMIT_PROXY_COUNT=0)
+    def test_without_proxies_uses_remote_addr(self):
+        self.assertEqual(client_ip(self.request()), '10.0.0.1')
+
+    @override_settings(RATELIMIT_PROXY_COUNT=1)
+    def test_behind_one_proxy_uses_the_address_it_added(self):
+        self.assertEqual(client_ip(self.request()), '198.51.100.20')
+
+
+class SingleFlightTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def run_threads(self, n, target):
+        """Start n threads on target() together, each on its own connection, and return their results"""
+        results = [None] * n
+        barrier = threading.Barrier(n)
+
+        def run(i):
+            try:
+                barrier.wait()
+                results[i] = target()
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def counted(self, key, compute, ttl=60):
+        """cached() on this thread's connection: (value, queries it ran)"""
+        with CaptureQueriesContext(connection) as queries:
+            value = singleflight.cached(key, compute, ttl)
+        return value, len(queries)
+
+    def count_donations(self):
+        count = Donation.objects.count()
+        time.sleep(0.05)  # long enough for every thread to miss
+        return count
+
+    def test_concurrent_misses_run_one_query(self):
+        results = self.run_threads(16, lambda: self.counted('donation-count', self.count_donations))
+        self.assertEqual({value for value, _ in results}, {0})
+        self.assertEqual(sum(queries for _, queries in results), 1)
+
+    def test_waits_for_a_lease_held_by_another_worker(self):
+        stored = 'singleflight:remote'
+        cache.add(f"{stored}:lease", 'another-worker', 10)
+
+        def other_worker():
+            time.sleep(0.2)
+            cache.set(stored, ('from another worker', 0.2, time.time() + 60), 60)
+
+        threading.Thread(target=other_worker).start()
+        results = self.run_threads(8, lambda: self.counted('remote', self.count_donations))
+        self.assertEqual(results, [('from another worker', 0)] * 8)
+
+    def test_unrelated_keys_do_not_wait_for_each_other(self):
+        computing, release = threading.Event(), threading.Event()
+
+        def slow():
+            computing.set()
+            release.wait(5)
+            return 'slow'
+
+        thread = threading.Thread(target=singleflight.cached, args=('slow-key', slow, 60))
+        thread.start()
+        computing.wait(5)
+        try:
+            start = time.monotonic()
+            for n in range(200):  # enough keys that some would have shared a lock stripe
+                self.assertEqual(singleflight.cached(f"fast-key-{n}", lambda: 'fast', 60), 'fast')
+            self.assertLess(time.monotonic() - start, 2)
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(singleflight._key_locks, {})
+
+
+class SpellingIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.words = sorted({word.lower() for name in MEDICINE_NAMES for word in name.split() if len(word) >= 3})
+        self.index = SpellingIndex()
+        for word in self.words:
+            self.index.add_word(word)
+
+    def misspell(self, word, rng):
+        for _ in range(rng.randint(1, MAX_EDIT_DISTANCE)):
+            i = rng.randrange(len(word) - 1)
+            word = rng.choice((
+                word[:i] + word[i + 1:],
+                word[:i] + rng.choice(string.ascii_lowercase) + word[i:],
+                word[:i] + rng.choice(string.ascii_lowercase) + word[i + 1:],
+                word[:i] + word[i + 1] + word[i] + word[i + 2:],
+            ))
+        return word
+
+    def test_corrects_typos(self):
+        for typo in ('amoxicilin', 'amoxcillin', 'amoxicillni', 'paracetamool'):
+            found = self.index.correct_word(typo)
+            self.assertIsNotNone(found, typo)
+            self.assertEqual(found[1], edit_distance(typo, found[0], MAX_EDIT_DISTANCE))
+
+    def test_words_too_short_to_match_anything(self):
+        for word in ('a', 'zq', 'qxz'):
+            self.assertIsNone(self.index.correct_word(word))
+
+    def test_agrees_with_comparing_every_word(self):
+        rng = random.Random(7)
+        for word in rng.choices(self.words, k=200):
+            typo = self.misspell(word, rng)
+            scan = min(edit_distance(typo, w, MAX_EDIT_DISTANCE) for w in self.words)
+            found = self.index.correct_word(typo)
+            self.assertEqual(found[1] if found else MAX_EDIT_DISTANCE + 1, scan, typo)
+
+
+class JSONFormatterTests(SimpleTestCase):
+    def format(self, **extra):
+        record = logging.makeLogRecord({'name': 'healthbridge_app.events', 'msg': 'cache.refreshed',
+                                        'levelno': logging.INFO, 'levelname': 'INFO', **extra})
+        return json.loads(JSONFormatter().format(record))
+
+    def test_event_fields(self):
+        payload = self.format(event_fields={'key': 'stats', 'seconds': 0.5})
+        self.assertEqual(payload['event'], 'cache.refreshed')
+        self.assertEqual((payload['key'], payload['seconds']), ('stats', 0.5))
+
+    def test_fields_cannot_overwrite_reserved_keys(self):
+        for extra in ({'event_fields': {'ts': 1, 'logger': 'x', 'level': 'DEBUG', 'event': 'y'}},
+                      {'ts': 1, 'logger': 'x', 'level': 'DEBUG', 'event': 'y'}):
+            payload = self.format(**extra)
+            self.assertEqual((payload['event'], payload['level'], payload['logger']),
+                             ('cache.refreshed', 'INFO', 'healthbridge_app.events'))
+            self.assertNotEqual(payload['ts'], 1)
+            self.assertEqual((payload['field_ts'], payload['field_logger'], payload['field_level'],
+                              payload['field_event']), (1, 'x', 'DEBUG', 'y'))
+
+
+class SchedulerLeaseTests(TransactionTestCase):
+    def test_lease_is_renewed_while_a_job_runs(self):
+        active = Scheduler([], identity='active', lease_seconds=0.3)
+        standby = Scheduler([], identity='standby', lease_seconds=0.3)
+        self.assertTrue(active.acquire_lock())
+
+        now = timezone.now()
+        self.assertTrue(active.run_job(Job('slow', lambda: time.sleep(1)), JobState(name='slow'), now, now))
+
+        # The job ran for over three leases; the heartbeat kept the standby out
+        self.assertFalse(standby.acquire_lock())
+        self.assertTrue(active.acquire_lock())
+
+
+class CleanupExpiredTests(TestCase):
+    def test_images_are_deleted_only_after_the_chunk_commits(self):
+        donation = Donation.objects.create(
+            name='Amoxicillin', quantity=10, expiry_date=date.today() - timedelta(days=30), image='donations/a.jpg',
+        )
+        storage = mock.Mock()
+        with mock.patch.object(cleanup_expired.Command, 'storage', storage):
+            with self.captureOnCommitCallbacks() as callbacks:
+                call_command('cleanup_expired', stdout=io.StringIO())
+                storage.delete.assert_not_called()
+            self.assertFalse(Donation.objects.filter(pk=donation.pk).exists())
+            for callback in callbacks:
+                callback()
+        storage.delete.assert_called_once_with('donations/a.jpg')
+
+
+@override_settings(QUERY_INSTRUMENTATION_ENABLED=True, QUERY_INSTRUMENTATION_SERVER_TIMING=False)
+class ServerTimingTests(TestCase):
+    def test_hidden_from_anonymous_visitors(self):
+        self.assertNotIn('Server-Timing', self.client.get('/login/'))
+
+    def test_sent_to_staff(self):
+        staff = User.objects.create_user(username='staff', email='staff@example.test', password='pw', is_staff=True)
+        self.client.force_login(staff)
+        self.assertIn('queries', self.client.get('/login/')['Server-Timing'])
+
+    @override_settings(QUERY_INSTRUMENTATION_SERVER_TIMING=True)
+    def test_sent_to_everyone_when_enabled(self):
+        self.assertIn('Server-Timing', self.client.get('/login/'))
+
+
+@override_settings(AUTH_USER_CACHE_SECONDS=300, SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                   RATELIMIT_ENABLED=False)
+class AuthUserCacheTests(TestCase):
+    password = 'correct horse 1'
+    bell = '/notifications/api/unread-count/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='cached', email='cached@example.test', password=self.password,
+            first_name='Before', last_name='Cache', user_type=User.UserType.RECIPIENT, role_selected=True,
+        )
+
+    def signed_in(self):
+        client = Client()
+        self.assertTrue(client.login(email=self.user.email, password=self.password))
+        client.get(self.bell)
+        return client
+
+    def test_signed_in_requests_skip_the_session_and_user_queries(self):
+        client = self.signed_in()
+        with self.assertNumQueries(1):  # the unread count itself
+            self.assertEqual(client.get(self.bell).status_code, 200)
+
+    def test_profile_edit_is_seen_by_the_next_request(self):
+        client = self.signed_in()
+        client.post('/profile/edit/', {'first_name': 'After', 'last_name': 'Cache', 'email': self.user.email})
+        self.assertContains(client.get('/profile/edit/'), 'name="first_name" value="After"')
+
+    def test_password_change_signs_out_other_sessions(self):
+        browser, other = self.signed_in(), self.signed_in()
+        new_password = 'correct horse 2'
+        browser.post('/profile/password/change/', {
+            'old_password': self.password, 'new_password1': new_password, 'new_password2': new_password,
+        })
+        self.assertEqual(browser.get(self.bell).status_code, 200)
+        self.assertTrue(browser.session.get('_auth_user_id'))
+        other.get(self.bell)
+        self.assertIsNone(other.session.get('_auth_user_id'))
+
+
+class EmailNormalizationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mixed', email=' Mixed.Case@Example.TEST ', password='pw')
+
+    def test_emails_are_stored_lowercase(self):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'mixed.case@example.test')
+        self.user.email = 'Other@Example.Test'
+        self.user.save()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, 'other@example.test')
+
+    def test_sign_in_with_any_case_uses_an_exact_lookup(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(authenticate(None, email='MIXED.case@example.test', password='pw'), self.user)
+        self.assertNotIn('LIKE', queries[0]['sql'].upper())
+        self.assertNotIn('UPPER(', queries[0]['sql'].upper())
+
+    def test_accounts_differing_only_by_case_are_refused(self):
+        # bulk_create skips save(); the Lower('email') constraint still holds
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.bulk_create([User(username='shout', email='MIXED.CASE@EXAMPLE.TEST')])
+
+
+class ConsistencyCheckTests(TestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient', email='recipient@example.test', password='pw')
+        self.donations = [
+            Donation.objects.create(
+                name=f'Cetirizine {i}', quantity=10, expiry_date=date.today() + timedelta(days=90),
+                approval_status=Donation.ApprovalStatus.APPROVED,
+            )
+            for i in range(3)
+        ]
+        self.requests = []
+        for donation in self.donations[:2]:
+            medicine_request = MedicineRequest.objects.create(
+                recipient=self.recipient, medicine_name=donation.name, quantity=4,
+                matched_donation=donation, status=MedicineRequest.Status.MATCHED,
+            )
+            reserve(donation.pk, medicine_request, 4)
+            self.requests.append(medicine_request)
+
+    def violations(self, **kwargs):
+        return {r.invariant.name: r.violations for r in run_checks(**kwargs) if r.violations}
+
+    def test_consistent_data_has_no_violations(self):
+        self.assertEqual(self.violations(), {})
+
+    def test_repairs_leave_nothing_to_repair(self):
+        first, second, third = self.donations
+        # Delivery recorded on the request only; the ledger drifting; a delivered donation with stock
+        MedicineRequest.objects.filter(pk=self.requests[0].pk).update(status=MedicineRequest.Status.FULFILLED)
+        Donation.objects.filter(pk=second.pk).update(allocated_qty=F('allocated_qty') - 1)
+        Donation.objects.filter(pk=third.pk).update(status=Donation.Status.DELIVERED, next_alert_on=None)
+
+        self.assertEqual(self.violations(), {
+            'closed_request_allocation': 1, 'allocated_qty_mismatch': 1,
+            'delivered_with_stock': 1,
+        })
+        self.violations(repair=True)
+        self.assertEqual(self.violations(), {})
+
+        for donation in self.donations:
+            donation.refresh_from_db()
+        self.assertEqual([d.allocated_qty for d in self.donations], [0, 4, 0])
+        self.assertEqual(self.requests[0].allocations.get().state, Allocation.State.RELEASED)
+        self.assertEqual(third.status, Donation.Status.AVAILABLE)
+        self.assertIsNotNone(third.next_alert_on)
+
+    def test_violations_needing_a_person_are_only_reported(self):
+        Donation.objects.filter(pk=self.donations[0].pk).update(quantity=2)
+        self.violations(repair=True)
+        self.assertEqual(self.violations(), {'over_allocated': 1})
+
+
+@override_settings(EMAIL_OUTBOX_ENABLED=True)
+class ExpiryDigestTests(TestCase):
+    def setUp(self):
+        donors = [
+            User.objects.create_user(username=f'donor{i}', email=f'donor{i}@example.test', password='pw')
+            for i in range(2)
+        ]
+        # bulk_create: no post_save, so the real-time alert does not send them first
+        Donation.objects.bulk_create([
+            Donation(
+                name=f'Loperamide {i}', quantity=5, donor=donors[0] if i < 3 else donors[1], tracking_code=f'DIGEST{i}',
+                expiry_date=date.today() + timedelta(days=2 + i), next_alert_on=date.today(),
+                approval_status=Donation.ApprovalStatus.APPROVED,
+            )
+            for i in range(4)
+        ])
+
+    def run_check(self, *args):
+        call_command('check_expiry', *args, stdout=io.StringIO())
+        return OutboundEmail.objects.count()
+
+    def test_one_digest_per_donor(self):
+        self.assertEqual(self.run_check('--digest'), 2)
+        self.assertEqual(ExpiryAlert.objects.count(), 4)
+        bodies = {email.to[0]: email.body for email in OutboundEmail.objects.all()}
+        self.assertEqual(sorted(bodies), ['donor0@example.test', 'donor1@example.test'])
+        for name in ('Loperamide 0', 'Loperamide 1', 'Loperamide 2'):
+            self.assertIn(name, bodies['donor0@example.test'])
+        self.assertNotIn('Loperamide 3', bodies['donor0@example.test'])
+
+    def test_one_email_per_donation_without_digest(self):
+        self.assertEqual(self.run_check(), 4)
+
+    def test_digests_are_not_sent_twice(self):
+        self.run_check('--digest')
+        self.assertEqual(self.run_check('--digest'), 2)
+        self.assertEqual(self.run_check('--digest', '--force'), 4)
+
+    def test_dry_run_queues_nothing(self):
+        self.assertEqual(self.run_check('--digest', '--dry-run'), 0)
+        self.assertEqual(ExpiryAlert.objects.count(), 0)
+
+
+class AsyncQueueHandlerTests(SimpleTestCase):
+    def capture(self, maxsize=100):
+        stream = io.StringIO()
+        handler = AsyncQueueHandler(stream, maxsize=maxsize)
+        self.addCleanup(handler.stop)
+        event_logger.addHandler(handler)
+        self.addCleanup(event_logger.removeHandler, handler)
+        return handler, stream
+
+    def test_events_are_written_as_json_lines_by_the_listener(self):
+        handler, stream = self.capture()
+        log_event('request.created', request_id=5)
+        handler.stop()
+        payload = json.loads(stream.getvalue().splitlines()[-1])
+        self.assertEqual((payload['event'], payload['request_id']), ('request.created', 5))
+
+    def test_a_full_queue_drops_records_instead_of_blocking(self):
+        handler, _ = self.capture(maxsize=2)
+        handler.stop()  # nothing drains the queue now
+        for i in range(5):
+            log_event('request.created', request_id=i)
+        self.assertEqual(handler.dropped, 3)
+
+    @override_settings(EVENT_LOG_DEBUG_SAMPLE_RATE=0)
+    def test_unsampled_debug_events_are_dropped_before_logging(self):
+        with mock.patch.object(event_logger, 'log') as log:
+            log_event('cache.hit', level=logging.DEBUG)
+        log.assert_not_called()
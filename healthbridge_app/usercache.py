@@ -0,0 +1,59 @@
+"""
+Per-user cache of the signed-in user, so authenticated requests skip the user query
+
+AuthenticationMiddleware loads request.user through EmailBackend.get_user()
+on every request. get_cached_user() keeps the loaded CustomUser in the
+cache next to a version token for that user; the two are read together in
+one get_many(), and the cached copy is used only while its version matches.
+invalidate_user() replaces the token (signals.py calls it whenever a user
+is saved or deleted: profile edits, password changes, last_login), so a copy
+loaded before the change can never be served after it, even if a request
+that started earlier writes it back late.
+
+Changes made with queryset.update() bypass the signals and are picked up
+within AUTH_USER_CACHE_SECONDS. The cache has to be shared by every process
+that can change a user (workers, management commands, the shell), so it is
+only on by default with REDIS_URL; with AUTH_USER_CACHE_SECONDS = 0 users
+are loaded from the database as usual.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+CACHE_FORMAT = 1  # bump when CustomUser's fields change, so workers don't unpickle copies of the old model
+
+
+def _keys(user_id):
+    return f"auth-user:v{CACHE_FORMAT}:version:{user_id}", f"auth-user:v{CACHE_FORMAT}:{user_id}"
+
+
+def get_cached_user(user_id, load):
+    """The user with this id from the cache, or load(user_id) (None if there is none), cached for next time"""
+    timeout = settings.AUTH_USER_CACHE_SECONDS
+    if not timeout:
+        return load(user_id)
+    version_key, user_key = _keys(user_id)
+    found = cache.get_many([version_key, user_key])
+    version = found.get(version_key)
+    entry = found.get(user_key)
+    if version is not None and entry is not None and entry[0] == version:
+        return entry[1]
+
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(version_key, version, timeout):
+            version = cache.get(version_key, version)  # another request created it first
+    user = load(user_id)
+    if user is not None:
+        cache.set(user_key, (version, user), timeout)
+    return user
+
+
+def invalidate_user(user_id):
+    """Retire every cached copy of this user, including ones still being written by other requests"""
+    if not settings.AUTH_USER_CACHE_SECONDS:
+        return
+    version_key, user_key = _keys(user_id)
+    cache.set(version_key, uuid.uuid4().hex, settings.AUTH_USER_CACHE_SECONDS)
+    cache.delete(user_key)
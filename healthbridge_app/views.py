@@ -5,13 +5,15 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.http import JsonResponse
-from django.core.cache import cache
 from django.contrib.auth.views import PasswordResetView, PasswordResetDoneView, PasswordResetConfirmView, PasswordResetCompleteView
 import logging
 
-from .models import GenericMedicine, BrandMedicine
-from donations.models import Donation
+from .ratelimit import json_too_many_requests, posted_email_and_ip, ratelimit
+
+from donations import views as donations_views
+from donations.models import Donation, Urgency
 from requests.models import MedicineRequest
+from requests.reservations import release_allocations
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -22,7 +24,7 @@ def home(request):
 
 def register(request):
     if request.method == "POST":
-        email = request.POST.get("email")
+        email = User.objects.normalize_email(request.POST.get("email"))
         password = request.POST.get("password")
         first_name = request.POST.get("first_name")
         last_name = request.POST.get("last_name")
@@ -91,6 +93,8 @@ def select_role(request):
     
     return render(request, "healthbridge_app/select_role.html")
 
+@ratelimit('login', methods=('POST',))
+@ratelimit('login_email', key=posted_email_and_ip, methods=('POST',))
 def login_view(request):
     if request.method == "POST":
         email = request.POST.get("email")
@@ -121,27 +125,17 @@ def dashboard(request):
         # Get user's donations expiring within 10 days using custom manager
         user_expiring = Donation.objects.expiring_within(days=10).filter(donor=request.user)
         context['user_expiring_donations'] = user_expiring
-        context['user_critical_donations'] = user_expiring.filter(expiry_date__lte=date.today() + timedelta(days=3))
+        context['user_critical_donations'] = user_expiring.with_urgency().filter(urgency_rank__lte=Urgency.HIGH)
         
         # If user is admin/staff, show all expiring donations with urgency levels
         if request.user.is_staff:
-            all_expiring = Donation.objects.expiring_within(days=14)
-            
-            # Group by urgency for better dashboard display
-            context['critical_donations'] = all_expiring.filter(expiry_date__lte=date.today() + timedelta(days=1))
-            context['high_priority_donations'] = all_expiring.filter(
-                expiry_date__gt=date.today() + timedelta(days=1),
-                expiry_date__lte=date.today() + timedelta(days=3)
-            )
-            context['medium_priority_donations'] = all_expiring.filter(
-                expiry_date__gt=date.today() + timedelta(days=3),
-                expiry_date__lte=date.today() + timedelta(days=7)
-            )
-            context['low_priority_donations'] = all_expiring.filter(
-                expiry_date__gt=date.today() + timedelta(days=7)
-            )
-            
-            context['total_expiring_count'] = all_expiring.count()
+            # Group by urgency in one query instead of a query per bucket
+            buckets = Donation.objects.expiring_within(days=14).urgency_buckets()
+            context['critical_donations'] = buckets['critical']
+            context['high_priority_donations'] = buckets['high']
+            context['medium_priority_donations'] = buckets['medium']
+            context['low_priority_donations'] = buckets['low']
+            context['total_expiring_count'] = sum(len(bucket) for bucket in buckets.values())
             
             # Recent alerts for admin
             from donations.models import ExpiryAlert
@@ -162,6 +156,7 @@ def logout_view(request):
     return redirect("landing:home")
 
 # ---------- API ENDPOINTS ----------
+@ratelimit('autocomplete', response=json_too_many_requests)
 def medicine_autocomplete(request):
     """API endpoint for medicine name autocomplete suggestions with caching"""
     query = request.GET.get('q', '').strip().lower()
@@ -170,48 +165,12 @@ def medicine_autocomplete(request):
     if not query or len(query) < 2:
         return JsonResponse({'suggestions': []})
     
-    # Try to get from cache first (cache for 5 minutes)
-    cache_key = f'autocomplete_{query}'
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return JsonResponse({'suggestions': cached_result})
-    
-    # Get unique medicine names from donations
-    donation_medicines = Donation.objects.filter(
-        name__icontains=query
-    ).values_list('name', flat=True).distinct()[:5]
-    
-    # Get unique medicine names from generic medicines  
-    generic_medicines = GenericMedicine.objects.filter(
-        name__icontains=query
-    ).values_list('name', flat=True).distinct()[:5]
-    
-    # Combine and deduplicate
-    all_medicines = list(set(list(donation_medicines) + list(generic_medicines)))
-    suggestions = sorted(all_medicines)[:10]  # Limit to 10 suggestions
-    
-    # Cache the result for 5 minutes (300 seconds)
-    cache.set(cache_key, suggestions, 300)
-    
-    return JsonResponse({'suggestions': suggestions})
+    return JsonResponse({'suggestions': donations_views.autocomplete_suggestions(query)})
 
 # ---------- SEARCH ----------
 def medicine_search(request):
-    query = request.GET.get('q', '').strip()
-    # Only show APPROVED and AVAILABLE donations with quantity > 0
-    medicines = Donation.objects.filter(
-        status=Donation.Status.AVAILABLE,
-        approval_status=Donation.ApprovalStatus.APPROVED,
-        quantity__gt=0
-    )
-
-    if query:
-        medicines = medicines.filter(name__icontains=query)
-
-    return render(request, 'donations/medicine_search.html', {
-        'medicines': medicines,
-        'query': query
-    })
+    """Same page as donations.views.medicine_search (filters, facets, paging)"""
+    return donations_views.medicine_search(request)
 
 # ---------- DONATE ----------
 @login_required
@@ -295,15 +254,8 @@ def delete_medicine_request(request, pk):
     if request.method == 'POST':
         medicine_name = medicine_request.medicine_name
         
-        # If the request was matched to a donation, restore it to AVAILABLE
-        # Only restore if NOT delivered yet (if delivered, quantity was already subtracted)
-        if medicine_request.matched_donation and medicine_request.status not in [MedicineRequest.Status.FULFILLED, MedicineRequest.Status.CLAIMED]:
-            donation = medicine_request.matched_donation
-            
-            # Set donation back to AVAILABLE (quantity was never subtracted unless delivered)
-            if donation.status == Donation.Status.RESERVED:
-                donation.status = Donation.Status.AVAILABLE
-                donation.save()
+        # Give back any units still allocated to the request (delivered ones were already subtracted)
+        release_allocations(medicine_request.allocations.all())
         
         medicine_request.delete()
         messages.success(request, f'Request for "{medicine_name}" has been deleted successfully.')
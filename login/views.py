@@ -11,10 +11,22 @@ from django.contrib import messages
 from django.conf import settings
 import logging
 
+from healthbridge_app.ratelimit import posted_email_and_ip, ratelimit
+
 logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+def login_too_many_requests(request, retry_after):
+    minutes = max(1, round(retry_after / 60))
+    return render(request, "login/login.html", {
+        "error": f"Too many login attempts. Please try again in {minutes} minute{'s' if minutes != 1 else ''}.",
+    }, status=429)
+
+
+# Failed or not, every attempt costs a password hash: limit them per address, and per account at each address
+@ratelimit('login', methods=('POST',), response=login_too_many_requests)
+@ratelimit('login_email', key=posted_email_and_ip, methods=('POST',), response=login_too_many_requests)
 def login_view(request):
     """User login view"""
     # Redirect authenticated users to their dashboard
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification
+from .models import MedicineSubscription, Notification, OutboundEmail
 
 
 @admin.register(Notification)
@@ -8,3 +8,22 @@ class NotificationAdmin(admin.ModelAdmin):
     list_filter = ['notification_type', 'is_read', 'created_at']
     search_fields = ['user__email', 'title', 'message']
     readonly_fields = ['created_at', 'read_at']
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['subject', 'idempotency_key', 'to']
+    readonly_fields = ['idempotency_key', 'created_at', 'sent_at', 'last_error']
+
+
+@admin.register(MedicineSubscription)
+class MedicineSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ['user', 'query', 'created_at', 'last_notified_at']
+    search_fields = ['user__email', 'query', 'normalized']
+    readonly_fields = ['normalized', 'token_count', 'created_at', 'last_notified_at']
+
+    def has_add_permission(self, request):
+        # Created through notifications.subscriptions.subscribe, which also writes the token index
+        return False
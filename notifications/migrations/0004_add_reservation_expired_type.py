@@ -0,0 +1,31 @@
+# Generated manually to add RESERVATION_EXPIRED notification type
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(
+                choices=[
+                    ('donation_approved', 'Donation Approved'),
+                    ('donation_rejected', 'Donation Rejected'),
+                    ('request_approved', 'Request Approved'),
+                    ('request_rejected', 'Request Rejected'),
+                    ('request_created', 'Request Created'),
+                    ('request_matched', 'Request Matched'),
+                    ('medicine_expiring', 'Medicine Expiring Soon'),
+                    ('reservation_expired', 'Reservation Expired'),
+                    ('system', 'System Notification')
+                ],
+                max_length=30
+            ),
+        ),
+    ]
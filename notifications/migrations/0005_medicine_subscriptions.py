@@ -0,0 +1,66 @@
+# Generated manually: medicine subscriptions, their token index and the MEDICINE_AVAILABLE type
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_add_reservation_expired_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(
+                choices=[
+                    ('donation_approved', 'Donation Approved'),
+                    ('donation_rejected', 'Donation Rejected'),
+                    ('request_approved', 'Request Approved'),
+                    ('request_rejected', 'Request Rejected'),
+                    ('request_created', 'Request Created'),
+                    ('request_matched', 'Request Matched'),
+                    ('medicine_expiring', 'Medicine Expiring Soon'),
+                    ('reservation_expired', 'Reservation Expired'),
+                    ('medicine_available', 'Medicine Available'),
+                    ('system', 'System Notification')
+                ],
+                max_length=30
+            ),
+        ),
+        migrations.CreateModel(
+            name='MedicineSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200)),
+                ('normalized', models.CharField(editable=False, max_length=200)),
+                ('token_count', models.PositiveSmallIntegerField(editable=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_notified_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medicine_subscriptions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'constraints': [
+                    models.UniqueConstraint(fields=('user', 'normalized'), name='unique_medicine_subscription'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='SubscriptionToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=100)),
+                ('subscription', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tokens', to='notifications.medicinesubscription')),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('token', 'subscription'), name='unique_subscription_token'),
+                ],
+            },
+        ),
+    ]
@@ -14,6 +14,8 @@ class Notification(models.Model):
         REQUEST_CREATED = 'request_created', 'Request Created'
         REQUEST_MATCHED = 'request_matched', 'Request Matched'
         MEDICINE_EXPIRING = 'medicine_expiring', 'Medicine Expiring Soon'
+        RESERVATION_EXPIRED = 'reservation_expired', 'Reservation Expired'
+        MEDICINE_AVAILABLE = 'medicine_available', 'Medicine Available'
         SYSTEM = 'system', 'System Notification'
     
     user = models.ForeignKey(
@@ -70,3 +72,84 @@ class Notification(models.Model):
             return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
         else:
             return "Just now"
+
+
+class OutboundEmail(models.Model):
+    """Durable outbox row; queued email is sent by the send_outbox worker, or on commit when there is none"""
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        SENDING = 'sending', 'Sending'
+        SENT = 'sent', 'Sent'
+        FAILED = 'failed', 'Failed'
+
+    # Stable per logical email; enqueueing the same key twice is a no-op and the
+    # key is forwarded to the provider so a retried HTTP call is not re-sent
+    idempotency_key = models.CharField(max_length=200, unique=True)
+
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField(blank=True, default='')
+    html_body = models.TextField(blank=True, default='')
+
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class MedicineSubscription(models.Model):
+    """A saved search: the user is notified when a donation matching `query` is approved"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='medicine_subscriptions'
+    )
+    query = models.CharField(max_length=200)  # As the user typed it
+    normalized = models.CharField(max_length=200, editable=False)  # Sorted tokens, see subscriptions.normalize
+    token_count = models.PositiveSmallIntegerField(editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_notified_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'normalized'], name='unique_medicine_subscription'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.email} - {self.query}"
+
+
+class SubscriptionToken(models.Model):
+    """Inverted index over MedicineSubscription: one row per token of its query"""
+
+    token = models.CharField(max_length=100)
+    subscription = models.ForeignKey(MedicineSubscription, on_delete=models.CASCADE, related_name='tokens')
+
+    class Meta:
+        constraints = [
+            # Also the index lookups by token go through
+            models.UniqueConstraint(fields=['token', 'subscription'], name='unique_subscription_token'),
+        ]
+
+    def __str__(self):
+        return self.token
@@ -0,0 +1,295 @@
+"""
+Durable email outbox
+
+All outgoing email is written to the OutboundEmail table, either directly with
+``enqueue_email(...)`` or through OutboxEmailBackend (the EMAIL_BACKEND when
+EMAIL_OUTBOX_ENABLED), so queuing an email is one INSERT inside the caller's
+transaction instead of an HTTPS round-trip. Without EMAIL_OUTBOX_ENABLED no
+worker is expected, so enqueue_email() sends the rows queued in a transaction
+itself once it commits, together over one connection; a failed send stays
+PENDING for the next ``send_outbox --drain``. The send_outbox command runs
+OutboxWorker, which claims due rows with SELECT ... FOR UPDATE SKIP LOCKED,
+sends them through EMAIL_DELIVERY_BACKEND (the whole batch in one
+send_each() call when the backend batches, as Resend does, otherwise from a
+small thread pool with one long-lived connection per thread), and retries
+each failed row with exponential backoff. Each row's idempotency key is
+passed to the provider, so a row re-sent after a worker crash is not
+delivered twice.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from healthbridge_app.events import log_event
+
+from .models import OutboundEmail
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+_on_commit = threading.local()
+
+
+def enqueue_email(subject, body, to, from_email=None, html_body='', cc=None, bcc=None, reply_to=None,
+                  idempotency_key=None):
+    """
+    Queue an email for the send_outbox worker and return its OutboundEmail row.
+
+    Enqueueing twice with the same idempotency_key returns the existing row.
+    """
+    email, _ = OutboundEmail.objects.get_or_create(
+        idempotency_key=idempotency_key or uuid4().hex,
+        defaults={
+            'subject': subject[:255],
+            'body': body,
+            'html_body': html_body or '',
+            'from_email': from_email or settings.DEFAULT_FROM_EMAIL,
+            'to': list(to),
+            'cc': list(cc or []),
+            'bcc': list(bcc or []),
+            'reply_to': list(reply_to or []),
+        },
+    )
+    if not settings.EMAIL_OUTBOX_ENABLED:
+        send_on_commit(email.pk)
+    return email
+
+
+def send_on_commit(email_id):
+    """Send a row once the transaction commits, for when no send_outbox worker is running"""
+    if not hasattr(_on_commit, 'ids'):
+        _on_commit.ids = []
+    _on_commit.ids.append(email_id)
+    transaction.on_commit(send_committed)
+
+
+def send_committed():
+    """
+    Send every row queued by send_on_commit() on this thread so far.
+
+    The first callback of a transaction sends them all over one connection (one
+    batch call for Resend); the later ones find nothing left to send.
+    """
+    ids, _on_commit.ids = getattr(_on_commit, 'ids', []), []
+    if not ids:
+        return
+    worker = OutboxWorker(batch_size=len(ids), rate=0, concurrency=1)
+    try:
+        worker.run_once(ids)
+    finally:
+        worker.close()
+
+
+def to_message(email):
+    """Rebuild a Django EmailMessage from an outbox row"""
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email,
+        to=email.to,
+        cc=email.cc,
+        bcc=email.bcc,
+        reply_to=email.reply_to,
+        headers={IDEMPOTENCY_HEADER: email.idempotency_key},
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def delivery_connection(**kwargs):
+    return get_connection(settings.EMAIL_DELIVERY_BACKEND, **kwargs)
+
+
+class OutboxEmailBackend(BaseEmailBackend):
+    """
+    EMAIL_BACKEND that queues messages in the outbox instead of sending them.
+
+    Lets Django-generated mail (password resets, send_mail callers) go through
+    the outbox unchanged. Messages with attachments are not stored in the
+    outbox and are sent immediately through EMAIL_DELIVERY_BACKEND.
+    """
+
+    def send_messages(self, email_messages):
+        queued, direct = 0, []
+        for message in email_messages:
+            if message.attachments:
+                direct.append(message)
+                continue
+            html_body = ''
+            for content, mimetype in getattr(message, 'alternatives', []):
+                if mimetype == 'text/html':
+                    html_body = content
+            body = message.body
+            if message.content_subtype == 'html':
+                html_body, body = body, ''
+            enqueue_email(
+                subject=message.subject,
+                body=body,
+                html_body=html_body,
+                to=message.to,
+                cc=message.cc,
+                bcc=message.bcc,
+                reply_to=message.reply_to,
+                from_email=message.from_email,
+                idempotency_key=message.extra_headers.get(IDEMPOTENCY_HEADER),
+            )
+            queued += 1
+        if direct:
+            queued += delivery_connection(fail_silently=self.fail_silently).send_messages(direct)
+        return queued
+
+
+class RateLimiter:
+    """Token bucket shared by the worker's sends; rate is messages per second (0 = unlimited)"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self, messages=1):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= messages
+            deficit = -self.tokens
+        if deficit > 0:
+            time.sleep(deficit / self.rate)
+
+
+class OutboxWorker:
+    """Claim due outbox rows in batches and deliver them"""
+
+    def __init__(self, batch_size=None, rate=None, max_attempts=None, lease_seconds=None,
+                 backoff_base=None, backoff_max=None, concurrency=None):
+        self.batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+        self.concurrency = concurrency or settings.EMAIL_OUTBOX_CONCURRENCY
+        self.max_attempts = max_attempts or settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        self.lease = timedelta(seconds=lease_seconds or settings.EMAIL_OUTBOX_LEASE_SECONDS)
+        self.backoff_base = settings.EMAIL_OUTBOX_BACKOFF_BASE if backoff_base is None else backoff_base
+        self.backoff_max = settings.EMAIL_OUTBOX_BACKOFF_MAX if backoff_max is None else backoff_max
+        self.limiter = RateLimiter(settings.EMAIL_OUTBOX_RATE_LIMIT if rate is None else rate)
+        # Backends with send_each() (Resend) take a whole batch in one call
+        self.batches = hasattr(import_string(settings.EMAIL_DELIVERY_BACKEND), 'send_each')
+        self.local = threading.local()
+        self.connections = []
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='outbox')
+        self.stats = {'sent': 0, 'retried': 0, 'failed': 0}
+
+    def claim(self, ids=None):
+        """Lock a batch of due rows (only those in ids, if given), lease them to this worker and return them"""
+        now = timezone.now()
+        due = Q(status=OutboundEmail.Status.PENDING, next_attempt_at__lte=now) | Q(
+            # A worker died mid-batch; its lease has run out
+            status=OutboundEmail.Status.SENDING, locked_until__lt=now,
+        )
+        if ids is not None:
+            due &= Q(id__in=ids)
+        with transaction.atomic():
+            ids = list(
+                OutboundEmail.objects.select_for_update(skip_locked=True)
+                .filter(due)
+                .order_by('next_attempt_at')
+                .values_list('id', flat=True)[:self.batch_size]
+            )
+            if not ids:
+                return []
+            OutboundEmail.objects.filter(id__in=ids).update(
+                status=OutboundEmail.Status.SENDING,
+                locked_until=now + self.lease,
+                attempts=F('attempts') + 1,
+            )
+        return list(OutboundEmail.objects.filter(id__in=ids).order_by('next_attempt_at'))
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+    def connection(self):
+        """This sender thread's connection, opened once and reused (SMTP connections are not thread-safe)"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = self.local.connection = delivery_connection(fail_silently=False)
+            connection.open()
+            self.connections.append(connection)
+        return connection
+
+    def send(self, email):
+        """Send one row; returns None on success or the exception raised"""
+        self.limiter.wait()
+        try:
+            if self.connection().send_messages([to_message(email)]) != 1:
+                raise RuntimeError('Email backend reported the message as not sent')
+        except Exception as e:
+            return e
+        return None
+
+    def deliver(self, batch):
+        """
+        Send a claimed batch; returns one result per row (None or the exception).
+
+        Backends with send_each() (Resend) get the whole batch in one call and
+        report each message; others get one message per call from the pool.
+        """
+        if not self.batches:
+            return list(self.executor.map(self.send, batch))
+        self.limiter.wait(len(batch))
+        try:
+            return self.connection().send_each([to_message(email) for email in batch])
+        except Exception as e:
+            return [e] * len(batch)
+
+    def run_once(self, ids=None):
+        """Send one batch; returns the number of rows claimed"""
+        batch = self.claim(ids)
+        if not batch:
+            return 0
+        sent_ids = []
+        # HTTP calls run on the pool or the backend's own; all database writes stay on this thread
+        for email, error in zip(batch, self.deliver(batch)):
+            if error is None:
+                sent_ids.append(email.id)
+            else:
+                self.schedule_retry(email, error)
+
+        if sent_ids:
+            OutboundEmail.objects.filter(id__in=sent_ids).update(
+                status=OutboundEmail.Status.SENT, sent_at=timezone.now(), locked_until=None, last_error='',
+            )
+            self.stats['sent'] += len(sent_ids)
+            log_event('email.outbox.sent', count=len(sent_ids))
+        return len(batch)
+
+    def schedule_retry(self, email, error):
+        if email.attempts >= self.max_attempts:
+            status, next_attempt = OutboundEmail.Status.FAILED, email.next_attempt_at
+            self.stats['failed'] += 1
+            log_event('email.outbox.failed', email_id=email.id, attempts=email.attempts, error=str(error))
+        else:
+            status, next_attempt = OutboundEmail.Status.PENDING, timezone.now() + self.backoff(email.attempts)
+            self.stats['retried'] += 1
+            log_event('email.outbox.retry', email_id=email.id, attempts=email.attempts, error=str(error))
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status=status, next_attempt_at=next_attempt, locked_until=None, last_error=str(error)[:2000],
+        )
+
+    def close(self):
+        self.executor.shutdown()
+        for connection in self.connections:
+            connection.close()
@@ -0,0 +1,114 @@
+"""
+Medicine subscriptions (saved searches)
+
+A recipient subscribes to a medicine name instead of re-running the search
+until it shows up. Names are normalized into tokens (accents stripped,
+lowercased, split on anything that is not a letter or digit) and each token
+is a SubscriptionToken row, an inverted index from token to subscription.
+A subscription matches a donation when every one of its tokens occurs in the
+donation's name, so "paracetamol" matches "Paracetamol 500mg Tablets".
+
+When a donation is approved, notify_subscribers() looks the donation's tokens
+up in the index, keeps the subscriptions whose token_count is covered, and
+creates the notifications with one bulk INSERT: the cost follows the number of
+matching subscriptions, not the number of subscriptions.
+"""
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from healthbridge_app.events import log_event
+
+from .models import MedicineSubscription, Notification, SubscriptionToken
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+class SubscriptionError(Exception):
+    """The query cannot be subscribed to; the message is safe to show the user"""
+
+
+def tokenize(name):
+    """Distinct normalized tokens of a medicine name, in order of appearance"""
+    folded = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().lower()
+    return list(dict.fromkeys(token[:100] for token in TOKEN_RE.findall(folded)))
+
+
+def normalize(name):
+    """Canonical form of a query: its tokens sorted, so word order and punctuation don't matter"""
+    return ' '.join(sorted(tokenize(name)))[:200]
+
+
+def subscribe(user, query):
+    """
+    Subscribe `user` to donations matching `query`.
+    Returns (subscription, created); raises SubscriptionError.
+    """
+    query = (query or '').strip()[:200]
+    tokens = tokenize(query)
+    if not tokens:
+        raise SubscriptionError('Enter a medicine name to subscribe to.')
+    normalized = normalize(query)
+    existing = MedicineSubscription.objects.filter(user=user, normalized=normalized).first()
+    if existing:
+        return existing, False
+    if MedicineSubscription.objects.filter(user=user).count() >= settings.MEDICINE_SUBSCRIPTION_LIMIT:
+        raise SubscriptionError(
+            f'You can follow at most {settings.MEDICINE_SUBSCRIPTION_LIMIT} medicines. Remove one first.'
+        )
+    try:
+        with transaction.atomic():
+            subscription = MedicineSubscription.objects.create(
+                user=user, query=query, normalized=normalized, token_count=len(tokens),
+            )
+            SubscriptionToken.objects.bulk_create(
+                [SubscriptionToken(token=token, subscription=subscription) for token in tokens]
+            )
+    except IntegrityError:
+        # The same subscription created concurrently (double submit)
+        return MedicineSubscription.objects.get(user=user, normalized=normalized), False
+    return subscription, True
+
+
+def matching_subscriptions(name):
+    """Subscriptions all of whose tokens occur in `name`"""
+    tokens = tokenize(name)
+    return MedicineSubscription.objects.filter(tokens__token__in=tokens).annotate(
+        hits=Count('tokens')
+    ).filter(hits=F('token_count'))
+
+
+def notify_subscribers(donation, now=None):
+    """
+    Notify everyone subscribed to a medicine matching the approved donation,
+    once per user, except the donor. Returns the number of notifications.
+    """
+    now = now or timezone.now()
+    matches = matching_subscriptions(donation.name).exclude(user_id=donation.donor_id)
+    subscribers = {}
+    for user_id, query in matches.values_list('user_id', 'query'):
+        subscribers.setdefault(user_id, query)
+    if not subscribers:
+        return 0
+
+    with transaction.atomic():
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                notification_type=Notification.Type.MEDICINE_AVAILABLE,
+                title='Medicine Available 🔔',
+                message=(
+                    f'{donation.quantity}x {donation.name} matching your alert for "{query}" is now available '
+                    f'(expires {donation.expiry_date.strftime("%B %d, %Y")}). Request it before someone else does.'
+                ),
+                donation_id=donation.id,
+            )
+            for user_id, query in subscribers.items()
+        ], batch_size=500)
+        MedicineSubscription.objects.filter(pk__in=matches.values('pk')).update(last_notified_at=now)
+    log_event('subscriptions.notified', donation_id=donation.id, users=len(subscribers))
+    return len(subscribers)
@@ -1,3 +1,288 @@
-from django.test import TestCase
+import random
+import threading
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from donations.models import Donation
+from HealthBridge.resend_backend import ResendEmailBackend
+from healthbridge_app.seeding import MEDICINE_NAMES
+
+from .models import MedicineSubscription, Notification, OutboundEmail
+from .outbox import IDEMPOTENCY_HEADER, OutboxWorker, enqueue_email
+from .subscriptions import SubscriptionError, matching_subscriptions, normalize, notify_subscribers, subscribe
+
+User = get_user_model()
+
+LOCMEM = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+@override_settings(EMAIL_DELIVERY_BACKEND=LOCMEM)
+class EnqueueEmailTests(TestCase):
+    def enqueue(self, key='welcome:1'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return enqueue_email('Welcome', 'Hello', ['recipient@example.test'], idempotency_key=key)
+
+    @override_settings(EMAIL_OUTBOX_ENABLED=True)
+    def test_with_the_outbox_the_worker_sends_it(self):
+        email = self.enqueue()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+        self.assertEqual(mail.outbox, [])
+
+    @override_settings(EMAIL_OUTBOX_ENABLED=False)
+    def test_without_the_outbox_it_is_sent_on_commit(self):
+        email = self.enqueue()
+        self.enqueue()  # same idempotency key: not sent twice
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.SENT, 1))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['recipient@example.test'])
+
+    @override_settings(EMAIL_OUTBOX_ENABLED=False, EMAIL_DELIVERY_BACKEND='notifications.tests.CountingBackend')
+    def test_emails_of_one_transaction_share_a_connection(self):
+        CountingBackend.opened = 0
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                enqueue_email('Alert', 'Body', [f'user{i}@example.test'])
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.Status.SENT).count(), 3)
+
+    @override_settings(EMAIL_OUTBOX_ENABLED=False, EMAIL_DELIVERY_BACKEND='notifications.tests.FailingBackend')
+    def test_failed_send_stays_pending_for_the_next_drain(self):
+        email = self.enqueue()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.PENDING)
+        self.assertIn('provider down', email.last_error)
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('provider down')
+
+
+class CountingBackend(LocmemBackend):
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+
+
+class SubscriptionTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create_user(username='donor', email='donor@example.test', password='pw')
+        self.recipient = User.objects.create_user(username='recipient', email='recipient@example.test', password='pw')
+
+    def donation(self, name, donor=None):
+        return Donation.objects.create(
+            name=name, quantity=10, donor=donor or self.donor, expiry_date=date.today() + timedelta(days=90),
+        )
+
+    def matches(self, name):
+        return set(matching_subscriptions(name).values_list('query', flat=True))
+
+    def test_queries_are_normalized(self):
+        self.assertEqual(normalize('500mg, Paracétamol'), normalize('paracetamol 500MG'))
+
+    def test_every_token_must_occur_in_the_name(self):
+        for query in ('paracetamol', 'Paracetamol 500mg', 'amoxicillin 500mg'):
+            subscribe(self.recipient, query)
+        self.assertEqual(self.matches('Paracetamol 500mg Tablets'), {'paracetamol', 'Paracetamol 500mg'})
+        self.assertEqual(self.matches('Paracetamol 250mg'), {'paracetamol'})
+        self.assertEqual(self.matches('Ibuprofen'), set())
+
+    def test_index_agrees_with_scanning_every_subscription(self):
+        rng = random.Random(7)
+        strengths = ['', ' 250mg', ' 500mg', ' 10mg']
+        users = [User.objects.create_user(username=f'u{i}', email=f'u{i}@example.test') for i in range(10)]
+        for user in users:
+            for name in rng.sample(MEDICINE_NAMES, 5):
+                subscribe(user, name + rng.choice(strengths))
+        for _ in range(30):
+            name = f"{rng.choice(MEDICINE_NAMES)}{rng.choice(strengths)} Tablets"
+            tokens = set(normalize(name).split())
+            scanned = {s.pk for s in MedicineSubscription.objects.all() if set(s.normalized.split()) <= tokens}
+            self.assertEqual(set(matching_subscriptions(name).values_list('pk', flat=True)), scanned, name)
+
+    def test_subscribing_twice_returns_the_existing_subscription(self):
+        first, created = subscribe(self.recipient, 'Paracetamol 500mg')
+        self.assertTrue(created)
+        self.assertEqual(subscribe(self.recipient, '500MG paracetamol'), (first, False))
+
+    @override_settings(MEDICINE_SUBSCRIPTION_LIMIT=2)
+    def test_subscriptions_per_user_are_limited(self):
+        subscribe(self.recipient, 'paracetamol')
+        subscribe(self.recipient, 'ibuprofen')
+        with self.assertRaises(SubscriptionError):
+            subscribe(self.recipient, 'cetirizine')
+        with self.assertRaises(SubscriptionError):
+            subscribe(self.recipient, ' !? ')
+
+    def test_notifies_each_subscriber_once_except_the_donor(self):
+        subscribe(self.recipient, 'paracetamol')
+        subscribe(self.recipient, 'paracetamol 500mg')
+        subscribe(self.donor, 'paracetamol')
+        self.assertEqual(notify_subscribers(self.donation('Paracetamol 500mg Tablets')), 1)
+        self.assertEqual(
+            list(Notification.objects.filter(notification_type=Notification.Type.MEDICINE_AVAILABLE)
+                 .values_list('user', flat=True)),
+            [self.recipient.pk],
+        )
+        self.assertFalse(MedicineSubscription.objects.filter(user=self.recipient, last_notified_at=None).exists())
+        self.assertEqual(notify_subscribers(self.donation('Ibuprofen 200mg')), 0)
+
+
+class FakeResendClient:
+    """Stands in for ResendClient: rejects recipients @invalid.test by index, as permissive batch validation does"""
+
+    def __init__(self, fail_batches=False):
+        self.fail_batches = fail_batches
+        self.batches = []
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, params, idempotency_key=None):
+        self.sent.append((params, idempotency_key))
+        return {'id': 'single'}
+
+    def send_batch(self, params_list, idempotency_key=None):
+        with self.lock:
+            self.batches.append((params_list, idempotency_key))
+        if self.fail_batches:
+            raise ConnectionError('Resend unavailable')
+        errors = [{'index': i, 'message': 'Invalid `to` field.'}
+                  for i, params in enumerate(params_list) if params['to'][0].endswith('@invalid.test')]
+        return {'data': [{'id': str(i)} for i in range(len(params_list) - len(errors))], 'errors': errors}
+
+    def close(self):
+        pass
+
+
+@override_settings(RESEND_API_KEY='re_test', RESEND_BATCH_SIZE=100, RESEND_BATCH_CONCURRENCY=4)
+class ResendBatchTests(SimpleTestCase):
+    def send(self, messages, client=None, fail_silently=False):
+        backend = ResendEmailBackend(fail_silently=fail_silently)
+        backend.client = client or FakeResendClient()
+        return backend.send_messages(messages), backend.client
+
+    def messages(self, n, invalid_every=0, key=None):
+        return [
+            EmailMessage('Alert', 'Body', 'alerts@example.test',
+                         [f"user{i}@{'invalid' if invalid_every and i % invalid_every == 0 else 'example'}.test"],
+                         headers={'Idempotency-Key': f'{key}:{i}'} if key else None)
+            for i in range(n)
+        ]
+
+    def test_messages_go_out_in_chunks_of_100(self):
+        sent, client = self.send(self.messages(250, invalid_every=50))
+        self.assertEqual(sorted(len(params) for params, _ in client.batches), [50, 100, 100])
+        self.assertEqual(sent, 245)
+
+    def test_batch_key_is_derived_from_the_message_keys(self):
+        _, first = self.send(self.messages(3, key='digest'))
+        _, again = self.send(self.messages(3, key='digest'))
+        _, other = self.send(self.messages(3, key='other'))
+        self.assertTrue(first.batches[0][1].startswith('batch-'))
+        self.assertEqual(first.batches[0][1], again.batches[0][1])
+        self.assertNotEqual(first.batches[0][1], other.batches[0][1])
+        _, unkeyed = self.send(self.messages(3))
+        self.assertIsNone(unkeyed.batches[0][1])
+
+    def test_a_single_message_keeps_its_own_key(self):
+        sent, client = self.send(self.messages(1, key='welcome'))
+        self.assertEqual((sent, client.batches), (1, []))
+        self.assertEqual(client.sent[0][1], 'welcome:0')
+
+    def test_failed_batch_raises_unless_failing_silently(self):
+        with self.assertRaises(ConnectionError):
+            self.send(self.messages(5), FakeResendClient(fail_batches=True))
+        self.assertEqual(self.send(self.messages(5), FakeResendClient(fail_batches=True), fail_silently=True)[0], 0)
+
+
+class FlakyBackend(BaseEmailBackend):
+    """Fails every message whose first recipient starts with 'down'"""
+
+    def send_messages(self, email_messages):
+        if email_messages[0].to[0].startswith('down'):
+            raise ConnectionError('provider down')
+        mail.outbox.extend(email_messages)
+        return len(email_messages)
+
+
+@override_settings(EMAIL_OUTBOX_ENABLED=True, EMAIL_DELIVERY_BACKEND='notifications.tests.FlakyBackend')
+class OutboxWorkerTests(TestCase):
+    def setUp(self):
+        self.worker = OutboxWorker(rate=0, max_attempts=2, backoff_base=0, concurrency=2)
+        self.addCleanup(self.worker.close)
+
+    def test_sends_due_rows_with_their_idempotency_key(self):
+        email = enqueue_email('Welcome', 'Hello', ['up@example.test'], idempotency_key='welcome:1')
+        self.assertEqual(self.worker.run_once(), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.SENT)
+        self.assertEqual(mail.outbox[0].extra_headers[IDEMPOTENCY_HEADER], 'welcome:1')
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_failures_are_retried_then_given_up(self):
+        email = enqueue_email('Welcome', 'Hello', ['down@example.test'])
+        self.worker.run_once()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.PENDING, 1))
+        self.assertIn('provider down', email.last_error)
+
+        self.worker.run_once()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboundEmail.Status.FAILED, 2))
+        self.assertEqual(self.worker.run_once(), 0)
+
+    def test_rows_of_a_worker_that_died_are_sent_once_its_lease_runs_out(self):
+        email = enqueue_email('Welcome', 'Hello', ['up@example.test'])
+        OutboundEmail.objects.filter(pk=email.pk).update(
+            status=OutboundEmail.Status.SENDING, locked_until=timezone.now() + timedelta(minutes=5),
+        )
+        self.assertEqual(self.worker.run_once(), 0)
+        OutboundEmail.objects.filter(pk=email.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.worker.run_once(), 1)
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.Status.SENT)
+
+
+@override_settings(EMAIL_OUTBOX_ENABLED=True, EMAIL_DELIVERY_BACKEND='HealthBridge.resend_backend.ResendEmailBackend',
+                   RESEND_API_KEY='re_test', RESEND_BATCH_SIZE=100, RESEND_BATCH_CONCURRENCY=4)
+class OutboxWorkerBatchTests(TestCase):
+    def run_worker(self, client):
+        worker = OutboxWorker(batch_size=150, rate=0, max_attempts=2, backoff_base=0)
+        self.addCleanup(worker.close)
+        with mock.patch('HealthBridge.resend_backend.ResendClient', return_value=client):
+            return worker.run_once()
+
+    def test_a_claimed_batch_goes_out_through_the_batch_endpoint(self):
+        for i in range(150):
+            enqueue_email('Alert', 'Body', [f"user{i}@{'invalid' if i == 7 else 'example'}.test"])
+        client = FakeResendClient()
+        self.assertEqual(self.run_worker(client), 150)
+        self.assertEqual(sorted(len(params) for params, _ in client.batches), [50, 100])
+        self.assertEqual(client.sent, [])
+
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.Status.SENT).count(), 149)
+        rejected = OutboundEmail.objects.exclude(status=OutboundEmail.Status.SENT).get()
+        self.assertEqual((rejected.to, rejected.status, rejected.attempts),
+                         (['user7@invalid.test'], OutboundEmail.Status.PENDING, 1))
+        self.assertIn('Invalid', rejected.last_error)
+
+    def test_rows_of_a_failed_batch_call_are_retried(self):
+        for i in range(3):
+            enqueue_email('Alert', 'Body', [f'user{i}@example.test'])
+        self.run_worker(FakeResendClient(fail_batches=True))
+        self.assertEqual(
+            set(OutboundEmail.objects.values_list('status', 'last_error')),
+            {(OutboundEmail.Status.PENDING, 'Resend unavailable')},
+        )
@@ -8,6 +8,10 @@ urlpatterns = [
     path('api/<int:notification_id>/read/', views.mark_notification_read, name='mark_notification_read'),
     path('api/mark-all-read/', views.mark_all_read, name='mark_all_read'),
     
+    # Medicine subscriptions (saved searches)
+    path('subscriptions/', views.medicine_subscriptions, name='medicine_subscriptions'),
+    path('subscriptions/<int:subscription_id>/delete/', views.delete_medicine_subscription, name='delete_medicine_subscription'),
+    
     # Notification page
     path('', views.notifications_page, name='notifications_page'),
 ]
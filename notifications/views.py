@@ -4,12 +4,16 @@ Handles notification display, marking as read, and notification count
 """
 
 import logging
-from django.shortcuts import render
+from django.shortcuts import redirect, render
 from django.http import JsonResponse
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from .models import Notification
+from django.urls import reverse
+from django.utils.http import url_has_allowed_host_and_scheme
+from .models import MedicineSubscription, Notification
+from .subscriptions import SubscriptionError, subscribe
 
 logger = logging.getLogger(__name__)
 
@@ -133,3 +137,63 @@ def notifications_page(request):
     }
     
     return render(request, 'healthbridge_app/notifications.html', context)
+
+
+def _is_ajax(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+
+def _redirect_back(request):
+    next_url = request.POST.get('next', '')
+    if not url_has_allowed_host_and_scheme(next_url, allowed_hosts={request.get_host()}):
+        next_url = reverse('donations:medicine_search')
+    return redirect(next_url)
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def medicine_subscriptions(request):
+    """List the user's medicine subscriptions (GET) or subscribe to a medicine name (POST)"""
+    if request.method == 'GET':
+        subscriptions = MedicineSubscription.objects.filter(user=request.user)
+        return JsonResponse({
+            'success': True,
+            'subscriptions': [
+                {
+                    'id': sub.id,
+                    'query': sub.query,
+                    'created_at': sub.created_at.isoformat(),
+                    'last_notified_at': sub.last_notified_at.isoformat() if sub.last_notified_at else None,
+                }
+                for sub in subscriptions
+            ],
+        })
+    
+    try:
+        subscription, created = subscribe(request.user, request.POST.get('query', ''))
+    except SubscriptionError as e:
+        if _is_ajax(request):
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        messages.error(request, str(e))
+        return _redirect_back(request)
+    
+    message = (f'We will notify you when "{subscription.query}" is donated.' if created
+               else f'You are already following "{subscription.query}".')
+    if _is_ajax(request):
+        return JsonResponse({'success': True, 'id': subscription.id, 'created': created, 'message': message})
+    messages.success(request, message)
+    return _redirect_back(request)
+
+
+@login_required
+@require_http_methods(["POST"])
+def delete_medicine_subscription(request, subscription_id):
+    """Stop following a medicine"""
+    deleted, _ = MedicineSubscription.objects.filter(id=subscription_id, user=request.user).delete()
+    if _is_ajax(request):
+        if not deleted:
+            return JsonResponse({'success': False, 'error': 'Subscription not found'}, status=404)
+        return JsonResponse({'success': True, 'message': 'Subscription removed'})
+    if deleted:
+        messages.success(request, 'You will no longer be notified about this medicine.')
+    return _redirect_back(request)
@@ -17,7 +17,7 @@ def register(request):
         return redirect("landing:home")
     
     if request.method == "POST":
-        email = request.POST.get("email")
+        email = User.objects.normalize_email(request.POST.get("email"))
         password = request.POST.get("password")
         first_name = request.POST.get("first_name")
         last_name = request.POST.get("last_name")
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import MedicineRequest
+from .models import Allocation, MedicineRequest, ReservationPolicy
 
 
 @admin.register(MedicineRequest)
@@ -24,3 +24,20 @@ class MedicineRequestAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(ReservationPolicy)
+class ReservationPolicyAdmin(admin.ModelAdmin):
+    list_display = ['urgency', 'ttl_hours', 'on_expiry']
+    list_editable = ['ttl_hours', 'on_expiry']
+
+
+@admin.register(Allocation)
+class AllocationAdmin(admin.ModelAdmin):
+    list_display = ['donation', 'request', 'quantity', 'state', 'reserved_until', 'created_at']
+    list_filter = ['state']
+    # Ledger rows move with Donation.allocated_qty; only the deadline is safe to edit here
+    readonly_fields = ['donation', 'request', 'quantity', 'state', 'created_at', 'updated_at']
+
+    def has_add_permission(self, request):
+        return False
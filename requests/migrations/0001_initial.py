@@ -11,6 +11,8 @@ class Migration(migrations.Migration):
 
     dependencies = [
         ('donations', '0001_initial'),
+        # healthbridge_app.0006 drops the old table of this name; recreate it only afterwards
+        ('healthbridge_app', '0006_remove_donation_donor_and_more'),
         migrations.swappable_dependency(settings.AUTH_USER_MODEL),
     ]
 
@@ -0,0 +1,40 @@
+# Generated manually: per-urgency reservation TTLs
+
+from django.db import migrations, models
+
+DEFAULT_POLICIES = [
+    ('critical', 24),
+    ('high', 48),
+    ('medium', 72),
+    ('low', 120),
+]
+
+
+def create_default_policies(apps, schema_editor):
+    ReservationPolicy = apps.get_model('requests', 'ReservationPolicy')
+    ReservationPolicy.objects.bulk_create(
+        [ReservationPolicy(urgency=urgency, ttl_hours=hours) for urgency, hours in DEFAULT_POLICIES]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0004_set_all_to_pending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationPolicy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('urgency', models.CharField(choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')], max_length=10, unique=True)),
+                ('ttl_hours', models.PositiveIntegerField(help_text='Hours the donation stays reserved while the request awaits approval')),
+                ('on_expiry', models.CharField(choices=[('cancel', 'Cancel the request'), ('requeue', 'Return the request to pending, without a donation')], default='cancel', max_length=10)),
+            ],
+            options={
+                'verbose_name_plural': 'reservation policies',
+            },
+        ),
+        migrations.RunPython(create_default_policies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated manually: allocation ledger for partial reservations
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_allocations(apps, schema_editor):
+    """
+    One ACTIVE allocation per open request holding a reserved donation, for
+    the requested quantity (capped at what the donation has left). Reserved
+    donations that are not fully allocated become AVAILABLE again.
+    """
+    MedicineRequest = apps.get_model('requests', 'MedicineRequest')
+    Allocation = apps.get_model('requests', 'Allocation')
+    Donation = apps.get_model('donations', 'Donation')
+
+    holding = MedicineRequest.objects.filter(
+        status__in=['pending', 'matched'], matched_donation__status='reserved'
+    ).select_related('matched_donation').order_by('created_at')
+    allocations = []
+    allocated = defaultdict(int)
+    for medicine_request in holding.iterator():
+        donation = medicine_request.matched_donation
+        try:
+            quantity = int(medicine_request.quantity)
+        except (TypeError, ValueError):
+            quantity = donation.quantity
+        quantity = min(quantity, donation.quantity - allocated[donation.id])
+        if quantity <= 0:
+            continue
+        allocated[donation.id] += quantity
+        allocations.append(Allocation(
+            donation_id=donation.id,
+            request_id=medicine_request.id,
+            quantity=quantity,
+            state='active',
+            reserved_until=donation.reserved_until,
+        ))
+    Allocation.objects.bulk_create(allocations, batch_size=1000)
+
+    by_quantity = defaultdict(list)
+    for donation_id, quantity in allocated.items():
+        by_quantity[quantity].append(donation_id)
+    for quantity, donation_ids in by_quantity.items():
+        Donation.objects.filter(pk__in=donation_ids).update(allocated_qty=quantity)
+    Donation.objects.filter(status='reserved', allocated_qty__lt=models.F('quantity')).update(status='available')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0007_donation_allocated_qty'),
+        ('requests', '0005_reservationpolicy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Allocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('state', models.CharField(choices=[('active', 'Active'), ('delivered', 'Delivered'), ('released', 'Released')], default='active', max_length=10)),
+                ('reserved_until', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('donation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='donations.donation')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='requests.medicinerequest')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [
+                    models.Index(fields=['donation', 'state'], name='requests_al_donatio_3012cd_idx'),
+                    models.Index(condition=models.Q(('state', 'active')), fields=['reserved_until'], name='allocation_active_until_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_allocations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated manually: integer column for MedicineRequest.quantity, filled by 0008
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0006_allocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicinerequest',
+            name='quantity_units',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,104 @@
+# Generated manually: parse the varchar quantity into quantity_units
+
+import re
+
+from django.db import migrations, transaction
+from django.db.models import CharField, PositiveIntegerField
+from django.db.models.functions import Cast
+
+CHUNK_SIZE = 2000
+LEADING_NUMBER = re.compile(r'\s*(\d[\d,]*)', re.ASCII)
+MAX_UNITS = 2147483647  # PositiveIntegerField is a 32-bit integer column on PostgreSQL
+
+
+def parse_quantity(raw):
+    """
+    (units, exact) for a legacy quantity string. exact is False when text
+    around the number ("10 tablets", "1,000") was dropped; units is None when
+    there is no number to keep, or it is too large to store.
+    """
+    value = (raw or '').strip()
+    # str.isdigit() also accepts "²" and other digits int() cannot parse
+    if value.isascii() and value.isdigit():
+        units, exact = int(value), True
+    else:
+        match = LEADING_NUMBER.match(value)
+        if not match:
+            return None, False
+        units, exact = int(match.group(1).replace(',', '')), False
+    if units > MAX_UNITS:
+        return None, False
+    return units, exact
+
+
+def backfill_quantity(apps, schema_editor):
+    """
+    Fill quantity_units a primary-key range at a time, each range in its own
+    transaction: plain numbers of up to nine digits (always small enough for
+    the column) are cast in one UPDATE, anything else is parsed in Python.
+    Only rows still NULL are read, so an interrupted run picks up where it
+    stopped. Values that were not a plain number keep their original text in
+    `notes`; those without a usable number become 0 and are listed for a
+    person to correct (consistency_check keeps reporting them as
+    open requests with no quantity).
+    """
+    MedicineRequest = apps.get_model('requests', 'MedicineRequest')
+    remaining = MedicineRequest.objects.filter(quantity_units__isnull=True).order_by('pk')
+    last_pk = None
+    filled = 0
+    reworded = []
+    unparseable = []
+    while True:
+        page = remaining if last_pk is None else remaining.filter(pk__gt=last_pk)
+        upper = page.values_list('pk', flat=True)[CHUNK_SIZE - 1:CHUNK_SIZE].first()
+        chunk = page if upper is None else page.filter(pk__lte=upper)
+        with transaction.atomic():
+            filled += chunk.filter(quantity__regex=r'^[0-9]{1,9}$').update(
+                quantity_units=Cast('quantity', PositiveIntegerField())
+            )
+            rows = []
+            for pk, raw, tracking_code, notes in chunk.values_list('pk', 'quantity', 'tracking_code', 'notes'):
+                units, exact = parse_quantity(raw)
+                if units is None:
+                    unparseable.append((tracking_code, raw))
+                    units = 0
+                elif not exact:
+                    reworded.append((tracking_code, raw))
+                if not exact:
+                    notes = f"{notes}\n\nQuantity originally entered as: {raw!r}".lstrip()
+                rows.append(MedicineRequest(pk=pk, quantity_units=units, notes=notes))
+            MedicineRequest.objects.bulk_update(rows, ['quantity_units', 'notes'])
+            filled += len(rows)
+        if upper is None:
+            break
+        last_pk = upper
+
+    if filled:
+        print(f"\n  Converted {filled} request quantities", end='')
+    if reworded:
+        print(f"\n  {len(reworded)} had text around the number (kept in notes), e.g. "
+              + ', '.join(f"{code}={raw!r}" for code, raw in reworded[:5]), end='')
+    if unparseable:
+        print(f"\n  {len(unparseable)} had no number and were set to 0, fix them by hand: "
+              + ', '.join(f"{code}={raw!r}" for code, raw in unparseable[:50])
+              + (' ...' if len(unparseable) > 50 else ''), end='')
+
+
+def restore_quantity(apps, schema_editor):
+    MedicineRequest = apps.get_model('requests', 'MedicineRequest')
+    MedicineRequest.objects.filter(quantity_units__isnull=False).update(
+        quantity=Cast('quantity_units', CharField())
+    )
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits on its own so a large table is never locked in one transaction
+    atomic = False
+
+    dependencies = [
+        ('requests', '0007_medicinerequest_quantity_units'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_quantity, restore_quantity),
+    ]
@@ -0,0 +1,39 @@
+# Generated manually: replace the varchar quantity with the backfilled integer column
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+backfill = import_module('requests.migrations.0008_backfill_medicinerequest_quantity')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0008_backfill_medicinerequest_quantity'),
+    ]
+
+    operations = [
+        # Rows written by the previous release since 0008 ran
+        migrations.RunPython(backfill.backfill_quantity, migrations.RunPython.noop),
+        # A default, so that unapplying can add the varchar column back before 0008 refills it
+        migrations.AlterField(
+            model_name='medicinerequest',
+            name='quantity',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.RemoveField(
+            model_name='medicinerequest',
+            name='quantity',
+        ),
+        migrations.RenameField(
+            model_name='medicinerequest',
+            old_name='quantity_units',
+            new_name='quantity',
+        ),
+        migrations.AlterField(
+            model_name='medicinerequest',
+            name='quantity',
+            field=models.PositiveIntegerField(),
+        ),
+    ]
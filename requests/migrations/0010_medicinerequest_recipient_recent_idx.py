@@ -0,0 +1,17 @@
+# Generated manually: index for the keyset-paginated track_medicine_requests list
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('requests', '0009_medicinerequest_quantity_integer'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicinerequest',
+            index=models.Index(fields=['recipient', '-created_at', '-id'], name='request_recipient_recent_idx'),
+        ),
+    ]
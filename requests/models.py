@@ -1,10 +1,29 @@
+from datetime import timedelta
 from uuid import uuid4
 
+from django.apps import apps
 from django.conf import settings
 from django.db import models
 from django.utils import timezone
 
 
+class MedicineRequestQuerySet(models.QuerySet):
+    def with_stock(self):
+        """
+        Annotate `in_stock`: an approved, available donation of the same
+        medicine has at least `quantity` units nobody has allocated. One
+        EXISTS subquery, so it can be filtered and ordered on.
+        """
+        Donation = apps.get_model('donations', 'Donation')
+        fitting = Donation.objects.filter(
+            name__iexact=models.OuterRef('medicine_name'),
+            status=Donation.Status.AVAILABLE,
+            approval_status=Donation.ApprovalStatus.APPROVED,
+            quantity__gte=models.F('allocated_qty') + models.OuterRef('quantity'),
+        )
+        return self.annotate(in_stock=models.Exists(fitting))
+
+
 class MedicineRequest(models.Model):
     """Model for recipients to request medicines"""
     
@@ -34,7 +53,7 @@ class MedicineRequest(models.Model):
         db_column="recipient_id"
     )
     medicine_name = models.CharField(max_length=200)
-    quantity = models.CharField(max_length=200)  # varchar in DB
+    quantity = models.PositiveIntegerField()
     urgency = models.CharField(
         max_length=10,
         choices=Urgency.choices,
@@ -88,9 +107,15 @@ class MedicineRequest(models.Model):
         help_text="Date when medicine will be ready for claiming (set by admin)"
     )
     
+    objects = MedicineRequestQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         db_table = 'healthbridge_app_medicinerequest'
+        indexes = [
+            # track_medicine_requests pages by (created_at, id) within a recipient
+            models.Index(fields=['recipient', '-created_at', '-id'], name='request_recipient_recent_idx'),
+        ]
     
     def save(self, *args, **kwargs):
         if not self.tracking_code:
@@ -100,10 +125,7 @@ class MedicineRequest(models.Model):
     @property
     def quantity_needed(self):
         """Alias for quantity to maintain compatibility"""
-        try:
-            return int(self.quantity)
-        except (ValueError, TypeError):
-            return 0
+        return self.quantity
     
     @property
     def requester(self):
@@ -118,3 +140,62 @@ class MedicineRequest(models.Model):
     
     def __str__(self):
         return f"{self.medicine_name} - {self.get_status_display()} ({self.tracking_code})"
+
+
+class ReservationPolicy(models.Model):
+    """How long a request of a given urgency may hold its allocation, and what happens after"""
+
+    class OnExpiry(models.TextChoices):
+        CANCEL = "cancel", "Cancel the request"
+        REQUEUE = "requeue", "Return the request to pending, without a donation"
+
+    urgency = models.CharField(max_length=10, choices=MedicineRequest.Urgency.choices, unique=True)
+    ttl_hours = models.PositiveIntegerField(help_text="Hours the donation stays reserved while the request awaits approval")
+    on_expiry = models.CharField(max_length=10, choices=OnExpiry.choices, default=OnExpiry.CANCEL)
+
+    class Meta:
+        verbose_name_plural = "reservation policies"
+
+    @classmethod
+    def deadline_for(cls, urgency, now=None):
+        """Allocation.reserved_until for a reservation made now by a request of this urgency"""
+        policy = cls.objects.filter(urgency=urgency).first()
+        hours = policy.ttl_hours if policy else settings.RESERVATION_TTL_HOURS
+        return (now or timezone.now()) + timedelta(hours=hours)
+
+    def __str__(self):
+        return f"{self.get_urgency_display()}: {self.ttl_hours}h, then {self.get_on_expiry_display().lower()}"
+
+
+class Allocation(models.Model):
+    """
+    The reservation ledger: a slice of a donation's quantity held for one request.
+    Donation.allocated_qty is kept equal to the sum of its ACTIVE rows
+    (requests/reservations.py), so several requests can share a donation.
+    """
+
+    class State(models.TextChoices):
+        ACTIVE = "active", "Active"
+        DELIVERED = "delivered", "Delivered"
+        RELEASED = "released", "Released"
+
+    donation = models.ForeignKey('donations.Donation', on_delete=models.CASCADE, related_name="allocations")
+    request = models.ForeignKey(MedicineRequest, on_delete=models.CASCADE, related_name="allocations")
+    quantity = models.PositiveIntegerField()
+    state = models.CharField(max_length=10, choices=State.choices, default=State.ACTIVE)
+    # Past this the sweeper (release_reservations) hands the quantity back
+    reserved_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['donation', 'state']),
+            models.Index(
+                fields=['reserved_until'], condition=models.Q(state='active'), name='allocation_active_until_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} of donation {self.donation_id} for request {self.request_id} ({self.state})"
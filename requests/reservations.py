@@ -0,0 +1,181 @@
+"""
+Partial reservations through the allocation ledger
+
+A request reserves a slice of a donation: reserve() bumps
+Donation.allocated_qty with a single conditional UPDATE (``WHERE
+allocated_qty <= quantity - n``), so concurrent requests can never
+over-allocate a donation however they interleave, and records an Allocation
+row in the same transaction. Every later change goes through a delta on
+allocated_qty (never a value read earlier), and Donation.status follows from
+the numbers: RESERVED once everything left is allocated, DELIVERED once
+nothing is left.
+
+Allocations expire at reserved_until (from the request urgency's
+ReservationPolicy; approval extends it to the claim date).
+release_expired_reservations() finds them through a partial index and, a
+batch at a time, hands the quantity back, cancels or requeues the requests
+according to their policy and notifies the recipients.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from donations.models import Donation
+from healthbridge_app.events import log_event
+from notifications.models import Notification
+
+from .models import Allocation, MedicineRequest, ReservationPolicy
+
+OPEN_STATUSES = [MedicineRequest.Status.PENDING, MedicineRequest.Status.MATCHED]
+
+
+def claim_deadline(claim_ready_date):
+    """reserved_until for an approved request: the end of its claim date plus the grace period"""
+    last_day = claim_ready_date + timedelta(days=settings.RESERVATION_CLAIM_GRACE_DAYS)
+    return timezone.make_aware(datetime.combine(last_day, time.max))
+
+
+def reserve(donation_id, medicine_request, quantity, now=None):
+    """
+    Allocate `quantity` units of an available donation to a request.
+    Returns the Allocation, or None when fewer units than that are free.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        held = Donation.objects.filter(
+            pk=donation_id,
+            status=Donation.Status.AVAILABLE,
+            allocated_qty__lte=F('quantity') - quantity,
+        ).update(
+            allocated_qty=F('allocated_qty') + quantity,
+            # SET expressions see the row as it was before the update
+            status=Case(
+                When(quantity=F('allocated_qty') + quantity, then=Value(Donation.Status.RESERVED)),
+                default=Value(Donation.Status.AVAILABLE),
+            ),
+            last_update=now,
+        )
+        if not held:
+            return None
+        return Allocation.objects.create(
+            donation_id=donation_id,
+            request=medicine_request,
+            quantity=quantity,
+            reserved_until=ReservationPolicy.deadline_for(medicine_request.urgency, now),
+        )
+
+
+def release_allocations(allocations, state=Allocation.State.RELEASED, now=None):
+    """
+    Close the ACTIVE allocations in `allocations` and give their quantity
+    back to the donations. Returns the number of allocations closed.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        held = list(
+            allocations.filter(state=Allocation.State.ACTIVE)
+            .select_for_update()
+            .values_list('pk', 'donation_id', 'quantity')
+        )
+        if not held:
+            return 0
+        Allocation.objects.filter(pk__in=[pk for pk, _, _ in held]).update(state=state, updated_at=now)
+        returned = defaultdict(int)
+        for _, donation_id, quantity in held:
+            returned[donation_id] += quantity
+        donations = Donation.objects.filter(pk__in=returned)
+        donations.update(
+            allocated_qty=Greatest(
+                F('allocated_qty') - Case(
+                    *[When(pk=donation_id, then=Value(quantity)) for donation_id, quantity in returned.items()],
+                    default=Value(0),
+                ),
+                0,
+            ),
+            last_update=now,
+        )
+        Donation.objects.update_stock_status(donations)
+    return len(held)
+
+
+def deliver(medicine_request, now=None):
+    """
+    Take the units a request holds out of their donation.
+    Returns (delivered quantity, donation as updated), or None when the
+    request holds no ACTIVE allocation (released, expired or already delivered).
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        allocation = medicine_request.allocations.filter(state=Allocation.State.ACTIVE).select_for_update().first()
+        if allocation is None:
+            return None
+        donations = Donation.objects.filter(pk=allocation.donation_id)
+        donations.update(
+            quantity=Greatest(F('quantity') - allocation.quantity, 0),
+            allocated_qty=Greatest(F('allocated_qty') - allocation.quantity, 0),
+            last_update=now,
+        )
+        Allocation.objects.filter(pk=allocation.pk).update(state=Allocation.State.DELIVERED, updated_at=now)
+        Donation.objects.update_stock_status(donations)
+        return allocation.quantity, donations.get()
+
+
+def release_expired_reservations(now=None, batch_size=500, dry_run=False):
+    """
+    Release every allocation whose deadline has passed.
+    Returns {'released': n, 'cancelled': n, 'requeued': n}.
+    """
+    now = now or timezone.now()
+    totals = {'released': 0, 'cancelled': 0, 'requeued': 0}
+    requeue = list(ReservationPolicy.objects.filter(
+        on_expiry=ReservationPolicy.OnExpiry.REQUEUE
+    ).values_list('urgency', flat=True))
+    expired = Allocation.objects.filter(state=Allocation.State.ACTIVE, reserved_until__lte=now)
+    if dry_run:
+        holding = MedicineRequest.objects.filter(pk__in=expired.values('request_id'), status__in=OPEN_STATUSES)
+        totals['released'] = expired.count()
+        totals['cancelled'] = holding.exclude(urgency__in=requeue).count()
+        totals['requeued'] = holding.filter(urgency__in=requeue).count()
+        return totals
+
+    while True:
+        with transaction.atomic():
+            batch = list(expired.select_for_update(skip_locked=True).values_list('pk', 'request_id')[:batch_size])
+            if not batch:
+                break
+            totals['released'] += release_allocations(Allocation.objects.filter(pk__in=[pk for pk, _ in batch]), now=now)
+            holding = MedicineRequest.objects.filter(
+                pk__in=[request_id for _, request_id in batch], status__in=OPEN_STATUSES
+            )
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=recipient_id,
+                    notification_type=Notification.Type.RESERVATION_EXPIRED,
+                    title='Reservation Expired ⏰',
+                    message=(
+                        f'Your request for {quantity}x {medicine_name} ({tracking_code}) was not completed before '
+                        'its reservation expired, '
+                        + ('so it is back in the queue and the donation has been released.'
+                           if urgency in requeue else 'so it was cancelled and the donation has been released.')
+                    ),
+                    request_id=request_id,
+                )
+                for request_id, recipient_id, medicine_name, quantity, tracking_code, urgency in holding.values_list(
+                    'pk', 'recipient_id', 'medicine_name', 'quantity', 'tracking_code', 'urgency'
+                )
+            ])
+            totals['cancelled'] += holding.exclude(urgency__in=requeue).update(
+                status=MedicineRequest.Status.CANCELLED, updated_at=now
+            )
+            totals['requeued'] += holding.filter(urgency__in=requeue).update(
+                status=MedicineRequest.Status.PENDING, matched_donation=None, updated_at=now
+            )
+
+    if totals['released']:
+        log_event('reservations.released', **totals)
+    return totals
@@ -1,3 +1,182 @@
-from django.test import TestCase
+import importlib
+import random
+import threading
+import time
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from donations.models import Donation
+
+from .models import Allocation, MedicineRequest
+from .reservations import release_expired_reservations, reserve
+
+User = get_user_model()
+
+
+class DeliverMedicineTests(TestCase):
+    def setUp(self):
+        self.donor = User.objects.create_user(
+            username='donor', email='donor@example.test', password='pw', user_type=User.UserType.DONOR,
+        )
+        self.recipient = User.objects.create_user(
+            username='recipient', email='recipient@example.test', password='pw', user_type=User.UserType.RECIPIENT,
+        )
+        self.donation = Donation.objects.create(
+            name='Paracetamol', quantity=30, donor=self.donor,
+            expiry_date=date.today() + timedelta(days=365),
+            approval_status=Donation.ApprovalStatus.APPROVED,
+        )
+        self.client.force_login(self.donor)
+
+    def matched_request(self, quantity):
+        medicine_request = MedicineRequest.objects.create(
+            recipient=self.recipient, medicine_name='Paracetamol', quantity=quantity,
+            matched_donation=self.donation, status=MedicineRequest.Status.MATCHED,
+        )
+        self.assertIsNotNone(reserve(self.donation.pk, medicine_request, quantity))
+        return medicine_request
+
+    def deliver(self, medicine_request):
+        return self.client.post(reverse('requests:deliver_medicine', args=[medicine_request.pk]))
+
+    def test_deliver_takes_the_allocation_out_of_the_donation(self):
+        medicine_request = self.matched_request(10)
+        self.assertEqual(self.deliver(medicine_request).status_code, 200)
+
+        medicine_request.refresh_from_db()
+        self.donation.refresh_from_db()
+        self.assertEqual(medicine_request.status, MedicineRequest.Status.FULFILLED)
+        self.assertEqual((self.donation.quantity, self.donation.allocated_qty), (20, 0))
+        self.assertEqual(self.donation.status, Donation.Status.AVAILABLE)
+
+    def test_repeated_deliver_is_refused(self):
+        medicine_request = self.matched_request(10)
+        self.assertEqual(self.deliver(medicine_request).status_code, 200)
+        self.assertEqual(self.deliver(medicine_request).status_code, 400)
+        self.assertEqual(self.deliver(medicine_request).status_code, 400)
+
+        self.donation.refresh_from_db()
+        self.assertEqual(self.donation.quantity, 20)
+        self.assertEqual(medicine_request.allocations.get().state, Allocation.State.DELIVERED)
+
+    def test_request_cancelled_by_the_sweeper_is_not_delivered(self):
+        expired = self.matched_request(10)
+        other = self.matched_request(10)
+        expired.allocations.update(reserved_until=timezone.now() - timedelta(minutes=1))
+        release_expired_reservations()
+
+        response = self.deliver(expired)
+
+        self.assertEqual(response.status_code, 400)
+        expired.refresh_from_db()
+        self.donation.refresh_from_db()
+        self.assertEqual(expired.status, MedicineRequest.Status.CANCELLED)
+        self.assertEqual((self.donation.quantity, self.donation.allocated_qty), (30, 10))
+        self.assertEqual(self.donation.status, Donation.Status.AVAILABLE)
+        self.assertEqual(other.allocations.get().state, Allocation.State.ACTIVE)
+
+    def test_matched_request_without_allocation_is_not_delivered(self):
+        medicine_request = MedicineRequest.objects.create(
+            recipient=self.recipient, medicine_name='Paracetamol', quantity=10,
+            matched_donation=self.donation, status=MedicineRequest.Status.MATCHED,
+        )
+        self.assertEqual(self.deliver(medicine_request).status_code, 400)
+        self.donation.refresh_from_db()
+        self.assertEqual(self.donation.quantity, 30)
+
+    def test_only_the_donor_can_deliver(self):
+        medicine_request = self.matched_request(10)
+        self.client.force_login(self.recipient)
+        self.assertEqual(self.deliver(medicine_request).status_code, 403)
+
+
+class ConcurrentReserveTests(TransactionTestCase):
+    THREADS = 8
+    ATTEMPTS = 15
+
+    def setUp(self):
+        self.recipient = User.objects.create_user(
+            username='recipient', email='recipient@example.test', password='pw', user_type=User.UserType.RECIPIENT,
+        )
+        # Fewer units than the threads ask for in total, so the last ones are refused
+        self.donation = Donation.objects.create(
+            name='Paracetamol', quantity=100, expiry_date=date.today() + timedelta(days=365),
+            approval_status=Donation.ApprovalStatus.APPROVED,
+        )
+
+    def reserve_from_threads(self):
+        """Have every thread reserve random slices of the donation as create_request does; the number reserved"""
+        reserved = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(n):
+            rng = random.Random(n)
+            try:
+                barrier.wait()
+                for _ in range(self.ATTEMPTS):
+                    quantity = rng.randint(1, 3)
+                    while True:
+                        try:
+                            with transaction.atomic():
+                                medicine_request = MedicineRequest.objects.create(
+                                    recipient=self.recipient, medicine_name='Paracetamol', quantity=quantity,
+                                    matched_donation=self.donation, status=MedicineRequest.Status.MATCHED,
+                                )
+                                if reserve(self.donation.pk, medicine_request, quantity) is None:
+                                    transaction.set_rollback(True)
+                                else:
+                                    reserved.append(quantity)
+                            break
+                        except OperationalError:
+                            time.sleep(0.001)  # SQLite: database is locked, try again
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return reserved
+
+    def test_concurrent_reserves_keep_the_ledger_consistent(self):
+        reserved = self.reserve_from_threads()
+
+        self.donation.refresh_from_db()
+        active = Allocation.objects.filter(donation=self.donation, state=Allocation.State.ACTIVE)
+        self.assertEqual(self.donation.allocated_qty, active.aggregate(total=Sum('quantity'))['total'] or 0)
+        self.assertEqual(self.donation.allocated_qty, sum(reserved))
+        self.assertLessEqual(self.donation.allocated_qty, self.donation.quantity)
+        self.assertEqual(Allocation.objects.filter(donation=self.donation).count(), len(reserved))
+        expected = (Donation.Status.RESERVED if self.donation.allocated_qty == self.donation.quantity
+                    else Donation.Status.AVAILABLE)
+        self.assertEqual(self.donation.status, expected)
+
+
+class ParseQuantityTests(SimpleTestCase):
+    parse_quantity = staticmethod(
+        importlib.import_module('requests.migrations.0008_backfill_medicinerequest_quantity').parse_quantity
+    )
+
+    def test_plain_numbers_are_exact(self):
+        self.assertEqual(self.parse_quantity(' 12 '), (12, True))
+
+    def test_text_around_the_number_is_dropped(self):
+        self.assertEqual(self.parse_quantity('10 tablets'), (10, False))
+        self.assertEqual(self.parse_quantity('1,000'), (1000, False))
+        self.assertEqual(self.parse_quantity('5²'), (5, False))
+
+    def test_numbers_too_large_for_the_column_are_not_kept(self):
+        self.assertEqual(self.parse_quantity('2147483647'), (2147483647, True))
+        for raw in ('12345678901', '2147483648', '99,999,999,999 tablets'):
+            self.assertEqual(self.parse_quantity(raw), (None, False), raw)
+
+    def test_non_ascii_digits_are_not_numbers(self):
+        for raw in ('²', '٣', 'a few', '', None):
+            self.assertEqual(self.parse_quantity(raw), (None, False), raw)
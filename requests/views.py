@@ -2,11 +2,22 @@ from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
+from django.db import transaction
+from django.db.models.functions import Substr
+import logging
 
-from .models import MedicineRequest
+from healthbridge_app.events import log_event
+from healthbridge_app.pagination import paginate, status_counts
+
+from .models import Allocation, MedicineRequest
+from .reservations import deliver, release_allocations, reserve
 from donations.models import Donation
 from notifications.models import Notification
 
+# Columns the request list renders; the full reason, notes and rejection_reason stay in the database
+LIST_FIELDS = ['medicine_name', 'tracking_code', 'quantity', 'status', 'urgency', 'created_at', 'updated_at']
+REASON_PREVIEW_LENGTH = 200
+
 
 @login_required
 @require_http_methods(["POST"])
@@ -19,12 +30,10 @@ def create_request(request):
         reason = request.POST.get('reason', '').strip()
         donation_id = request.POST.get('donation_id', '').strip()
         
-        # Debug logging
-        print(f"=== CREATE REQUEST DEBUG ===")
-        print(f"Medicine: {medicine_name}")
-        print(f"Quantity: {quantity}")
-        print(f"Urgency: {urgency}")
-        print(f"Donation ID received: {donation_id}")
+        log_event(
+            'request.create.received', level=logging.DEBUG,
+            medicine=medicine_name, quantity=quantity, urgency=urgency, donation_id=donation_id or None,
+        )
         
         # Validation
         if not medicine_name or not quantity:
@@ -48,39 +57,49 @@ def create_request(request):
         if donation_id:
             try:
                 matched_donation = Donation.objects.get(id=donation_id, status=Donation.Status.AVAILABLE)
-                print(f"Found donation: ID={matched_donation.id}, Name={matched_donation.name}, Donor={matched_donation.donor.username}, Current Qty: {matched_donation.quantity}")
                 
-                # Check if enough quantity is available
-                if matched_donation.quantity < quantity_int:
+                # Check if enough quantity is available (reserve() re-checks atomically)
+                if matched_donation.available_quantity < quantity_int:
                     return JsonResponse({
                         'success': False,
-                        'message': f'Only {matched_donation.quantity} units available, but you requested {quantity_int}'
+                        'message': f'Only {matched_donation.available_quantity} units available, but you requested {quantity_int}'
                     }, status=400)
                 
-                # Don't subtract quantity yet - only when claimed
-                # Just mark as RESERVED to prevent others from requesting
-                matched_donation.status = Donation.Status.RESERVED
-                matched_donation.save()
-                print(f"Donation marked as RESERVED - quantity will be subtracted when claimed")
-                
             except Donation.DoesNotExist:
-                print(f"Donation ID {donation_id} not found or not available")
-        else:
-            print("No donation_id provided")
+                log_event('request.create.donation_unavailable', level=logging.WARNING, donation_id=donation_id)
         
-        # Create the request (set approval_status to PENDING for admin review)
-        medicine_request = MedicineRequest.objects.create(
-            recipient=request.user,
-            medicine_name=medicine_name,
-            quantity=str(quantity),
-            urgency=urgency,
-            reason=reason,
-            matched_donation=matched_donation,
-            status=MedicineRequest.Status.MATCHED if matched_donation else MedicineRequest.Status.PENDING,
-            approval_status=MedicineRequest.ApprovalStatus.PENDING  # Requires admin approval
-        )
+        with transaction.atomic():
+            # Create the request (set approval_status to PENDING for admin review)
+            medicine_request = MedicineRequest.objects.create(
+                recipient=request.user,
+                medicine_name=medicine_name,
+                quantity=quantity_int,
+                urgency=urgency,
+                reason=reason,
+                matched_donation=matched_donation,
+                status=MedicineRequest.Status.MATCHED if matched_donation else MedicineRequest.Status.PENDING,
+                approval_status=MedicineRequest.ApprovalStatus.PENDING  # Requires admin approval
+            )
+            
+            # Allocate the units now; the donation's quantity only goes down on delivery
+            if matched_donation and reserve(matched_donation.id, medicine_request, quantity_int) is None:
+                transaction.set_rollback(True)
+                medicine_request = None
         
-        print(f"Request created: ID={medicine_request.id}, Status={medicine_request.status}, Matched Donation={medicine_request.matched_donation_id}")
+        if medicine_request is None:
+            # Someone else reserved the units between the check above and the allocation
+            matched_donation.refresh_from_db()
+            log_event('request.create.allocation_failed', level=logging.WARNING, donation_id=matched_donation.id)
+            return JsonResponse({
+                'success': False,
+                'message': f'Only {matched_donation.available_quantity} units available, but you requested {quantity_int}'
+            }, status=400)
+        
+        log_event(
+            'request.created',
+            request_id=medicine_request.id, status=medicine_request.status,
+            donation_id=medicine_request.matched_donation_id, user_id=request.user.id,
+        )
         
         # Notify donor that someone has requested their medicine
         if matched_donation and matched_donation.donor:
@@ -105,7 +124,6 @@ def create_request(request):
                 ),
                 request_id=medicine_request.id
             )
-            print(f"Notification sent to donor: {matched_donation.donor.username}")
         
         return JsonResponse({
             'success': True,
@@ -114,9 +132,7 @@ def create_request(request):
         })
         
     except Exception as e:
-        print(f"ERROR in create_request: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log_event('request.create.failed', level=logging.ERROR, exc_info=True, user_id=request.user.id)
         return JsonResponse({
             'success': False,
             'message': str(e)
@@ -176,7 +192,7 @@ def request_medicine(request):
         medicine_request = MedicineRequest.objects.create(
             recipient=request.user,
             medicine_name=medicine_name,
-            quantity=str(quantity_needed),
+            quantity=quantity_int,
             urgency=urgency,
             reason=reason,
             approval_status=MedicineRequest.ApprovalStatus.PENDING  # Requires admin approval
@@ -193,9 +209,21 @@ def request_medicine(request):
 
 @login_required
 def track_medicine_requests(request):
-    """View all medicine requests made by the user"""
+    """View the user's medicine requests, newest first, a page at a time"""
     requests = MedicineRequest.objects.filter(recipient=request.user)
-    return render(request, 'requests/track_medicine_requests.html', {'requests': requests})
+    page = paginate(
+        request,
+        requests.only(*LIST_FIELDS).annotate(reason_preview=Substr('reason', 1, REASON_PREVIEW_LENGTH + 1)),
+        'created_at',
+    )
+    return render(request, 'requests/track_medicine_requests.html', {
+        'requests': page,
+        'page': page,
+        'status_counts': status_counts(
+            requests, MedicineRequest.Status, cache_key=f'request-status-counts:{request.user.pk}', fresh=page.is_first,
+        ),
+        'reason_preview_length': REASON_PREVIEW_LENGTH,
+    })
 
 
 @login_required
@@ -214,16 +242,9 @@ def delete_medicine_request(request, pk):
             medicine_request = get_object_or_404(MedicineRequest, pk=pk, recipient=request.user)
             medicine_name = medicine_request.medicine_name
             
-            # If the request was matched to a donation, restore it to AVAILABLE
-            # Only restore if NOT delivered yet (if delivered, quantity was already subtracted)
-            if medicine_request.matched_donation and medicine_request.status not in [MedicineRequest.Status.FULFILLED, MedicineRequest.Status.CLAIMED]:
-                donation = medicine_request.matched_donation
-                
-                # Set donation back to AVAILABLE (quantity was never subtracted unless delivered)
-                if donation.status == Donation.Status.RESERVED:
-                    donation.status = Donation.Status.AVAILABLE
-                    donation.save()
-                    print(f"✅ Restored donation to AVAILABLE: ID={donation.id}, Status={donation.status}")
+            # Give back any units still allocated to the request (delivered ones were already subtracted)
+            if release_allocations(medicine_request.allocations.all()):
+                log_event('request.delete.donation_released', request_id=medicine_request.id, donation_id=medicine_request.matched_donation_id)
             
             medicine_request.delete()
             
@@ -233,7 +254,7 @@ def delete_medicine_request(request, pk):
             
             return redirect('requests:track_medicine_requests')
         except Exception as e:
-            print(f"❌ Error deleting request: {str(e)}")
+            log_event('request.delete.failed', level=logging.ERROR, exc_info=True, request_id=pk)
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.content_type == 'application/json':
                 return JsonResponse({'success': False, 'error': str(e)})
             return redirect('requests:track_medicine_requests')
@@ -248,50 +269,50 @@ def delete_medicine_request(request, pk):
 def deliver_medicine(request, pk):
     """Mark a medicine request as fulfilled (donor delivers the medicine)"""
     try:
-        # Get the request and verify the donor owns the matched donation
-        medicine_request = get_object_or_404(MedicineRequest, pk=pk)
-        
-        # Verify the donor owns the matched donation
-        if not medicine_request.matched_donation or medicine_request.matched_donation.donor != request.user:
-            return JsonResponse({
-                'success': False,
-                'message': 'You do not have permission to deliver this medicine'
-            }, status=403)
-        
-        # Subtract quantity from donation NOW (when delivered)
-        if medicine_request.matched_donation:
-            donation = medicine_request.matched_donation
-            
-            try:
-                requested_qty = int(medicine_request.quantity)
-            except (ValueError, TypeError):
-                requested_qty = 0
-            
-            # Subtract the quantity
-            donation.quantity -= requested_qty
-            print(f"✅ Delivered! Subtracting {requested_qty} from donation. New quantity: {donation.quantity}")
-            
-            # Update donation status based on remaining quantity
-            if donation.quantity <= 0:
-                donation.status = Donation.Status.DELIVERED
-                print(f"Donation fully delivered (quantity 0) - marking as DELIVERED")
-            else:
-                donation.status = Donation.Status.AVAILABLE
-                print(f"Donation still has {donation.quantity} remaining - keeping as AVAILABLE")
-            
-            donation.save()
-        
-        # Update request status to fulfilled (delivered)
-        medicine_request.status = MedicineRequest.Status.FULFILLED
-        medicine_request.save()
-        
+        with transaction.atomic():
+            # Locked so a second click, or the reservation sweeper, can't act on the same request meanwhile;
+            # allocations first, then the request, the order release_expired_reservations() takes them in
+            list(Allocation.objects.filter(request_id=pk, state=Allocation.State.ACTIVE).select_for_update())
+            medicine_request = get_object_or_404(MedicineRequest.objects.select_for_update(), pk=pk)
+
+            # Verify the donor owns the matched donation
+            if not medicine_request.matched_donation or medicine_request.matched_donation.donor != request.user:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'You do not have permission to deliver this medicine'
+                }, status=403)
+
+            if medicine_request.status != MedicineRequest.Status.MATCHED:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'This request is not waiting for delivery'
+                }, status=400)
+
+            # Subtract the allocated quantity from the donation NOW (when delivered)
+            delivered = deliver(medicine_request)
+            if delivered is None:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'This request no longer holds a reservation on the donation'
+                }, status=400)
+            delivered_qty, donation = delivered
+
+            # Update request status to fulfilled (delivered)
+            medicine_request.status = MedicineRequest.Status.FULFILLED
+            medicine_request.save()
+
+        log_event(
+            'request.delivered',
+            request_id=medicine_request.id, donation_id=donation.id,
+            delivered_qty=delivered_qty, remaining_qty=donation.quantity, donation_status=donation.status,
+        )
         return JsonResponse({
             'success': True,
             'message': 'Medicine marked as delivered successfully'
         })
         
     except Exception as e:
-        print(f"❌ Error delivering medicine: {str(e)}")
+        log_event('request.deliver.failed', level=logging.ERROR, exc_info=True, request_id=pk)
         return JsonResponse({
             'success': False,
             'message': str(e)
@@ -323,7 +344,7 @@ def claim_medicine(request, pk):
         })
         
     except Exception as e:
-        print(f"❌ Error claiming medicine: {str(e)}")
+        log_event('request.claim.failed', level=logging.ERROR, exc_info=True, request_id=pk)
         return JsonResponse({
             'success': False,
             'message': str(e)
@@ -6,6 +6,7 @@ class MedicineAutocomplete {
     this.input = inputElement;
     this.container = null;
     this.suggestions = [];
+    this.didYouMean = null;
     this.selectedIndex = -1;
     this.debounceTimer = null;
     
@@ -79,6 +80,7 @@ class MedicineAutocomplete {
       const response = await fetch(`${this.apiUrl}?q=${encodeURIComponent(query)}`);
       const data = await response.json();
       this.suggestions = data.suggestions || [];
+      this.didYouMean = data.did_you_mean || null;
       this.display(query);
     } catch (error) {
       console.error('Autocomplete error:', error);
@@ -137,7 +139,18 @@ class MedicineAutocomplete {
 
   showEmpty() {
     this.container.innerHTML = '<div class="autocomplete-empty">No medicines found</div>';
+    if (this.didYouMean) {
+      this.container.innerHTML += `
+        <div class="autocomplete-item" data-index="0" data-value="${this.escapeHtml(this.didYouMean)}">
+          <span class="autocomplete-icon">✏️</span>
+          <span class="autocomplete-text">Did you mean <strong>${this.escapeHtml(this.didYouMean)}</strong>?</span>
+        </div>
+      `;
+      this.container.querySelector('.autocomplete-item')
+        .addEventListener('click', () => this.select(this.didYouMean));
+    }
     this.container.classList.add('active');
+    this.selectedIndex = -1;
   }
 
   hide() {
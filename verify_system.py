@@ -1,41 +0,0 @@
-import os
-import django
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HealthBridge.settings')
-django.setup()
-
-from requests.models import MedicineRequest
-from donations.models import Donation
-
-print("=" * 80)
-print("VERIFICATION REPORT")
-print("=" * 80)
-
-# Check available donations
-available = Donation.objects.filter(
-    status='available',
-    approval_status='approved',
-    quantity__gt=0
-).order_by('-donated_at')
-
-print(f"\n✅ AVAILABLE DONATIONS FOR RECIPIENTS TO REQUEST: {available.count()}")
-for d in available[:5]:
-    print(f"   - {d.name} (Qty: {d.quantity}) - {d.tracking_code}")
-
-# Check claimed requests (admin pickups)
-claimed = MedicineRequest.objects.filter(
-    status='claimed',
-    matched_donation__isnull=False
-).select_related('matched_donation')
-
-print(f"\n✅ COMPLETED PICKUPS (ADMIN DASHBOARD): {claimed.count()}")
-for r in claimed[:5]:
-    print(f"   - {r.medicine_name} by {r.recipient.get_full_name()}")
-    print(f"     Donation: {r.matched_donation.name} (Status: {r.matched_donation.status}, Qty: {r.matched_donation.quantity})")
-
-print(f"\n{'='*80}")
-print("SYSTEM STATUS:")
-print("✅ Donations with quantity > 0 are AVAILABLE for recipients")
-print("✅ Admin pickups show all CLAIMED requests (7 total)")
-print("✅ Recipients can request from available donations")
-print("=" * 80)